@@ -50,10 +50,10 @@ st.markdown("""
 # Helper functions for imports (Lazy loading to allow API Key input first)
 def get_backend_modules():
     try:
-        from backend.rag import answer_query
+        from backend.rag import stream_answer
         from backend.ingest import process_file_from_path
         from backend.vector_store import add_documents
-        return answer_query, process_file_from_path, add_documents
+        return stream_answer, process_file_from_path, add_documents
     except Exception as e:
         return None, None, None
 
@@ -72,7 +72,11 @@ with st.sidebar:
     # 1. API Key Setup
     api_key = st.text_input("OpenAI API Key", type="password", help="Required for GPT-4o & Whisper")
     if api_key:
-        os.environ["OPENAI_API_KEY"] = api_key
+        if os.environ.get("OPENAI_API_KEY") != api_key:
+            os.environ["OPENAI_API_KEY"] = api_key
+            # Rebuild pooled clients so they pick up the new key
+            from backend import resources
+            resources.shutdown()
         st.session_state.api_key_set = True
         st.success("System Online")
 
@@ -97,7 +101,7 @@ with st.sidebar:
                     f.write(uploaded_file.getbuffer())
                 
                 # Import Backend
-                answer_query, process_file_from_path, add_documents = get_backend_modules()
+                _, process_file_from_path, add_documents = get_backend_modules()
                 
                 # Process
                 status_container = st.status("Processing Data Streams...", expanded=True)
@@ -122,6 +126,17 @@ with st.sidebar:
     elif uploaded_file and not st.session_state.api_key_set:
         st.warning("Please enter OpenAI API Key first.")
 
+    st.divider()
+
+    # 3. Search Scope (applied inside the vector store)
+    st.header("🎯 Search Scope")
+    scope_types = st.multiselect(
+        "Modalities",
+        ["pdf", "text", "audio", "image", "video"],
+        help="Only search evidence of these types (all when empty)"
+    )
+    scope_sources = st.text_input("Sources", help="Comma-separated file names, e.g. meeting.mp3")
+
 # Main Layout: Split Screen
 col1, col2 = st.columns([1, 1])
 
@@ -146,37 +161,55 @@ with col1:
 
             # Generate Response
             with st.chat_message("assistant"):
-                answer_query, _, _ = get_backend_modules()
-                
+                stream_answer, _, _ = get_backend_modules()
+
                 # Animated Thinking Process
                 with st.status("Architecting Reasoning...", expanded=True) as status:
                     status.write("🧠 Intent Classification: Factual Inquiry")
-                    time.sleep(0.5)
-
-                    status.write("🔍 Retrieving Evidence (Vector Search)...")
-                    # This logic is actually inside `answer_query` but we simulate the feedback here
-                    # or better yet, `answer_query` runs fast.
-
-                    status.write("⚖️ Detecting Conflicts & Judging...")
-                    time.sleep(0.5)
+                    status.write("🔍 Retrieving Evidence (Hybrid Search)...")
 
                     try:
-                        result = answer_query(prompt)
-                        response_text = result["answer"]
-                        sources = result["sources"]
+                        filters = {
+                            "types": scope_types,
+                            "sources": [name.strip() for name in scope_sources.split(",") if name.strip()],
+                        }
+                        events = stream_answer(prompt, filters=filters)
+                        # Sources arrive as soon as retrieval finishes
+                        first = next(events)
+                        sources = first["sources"]
+                        st.session_state.evidence_log = sources
+                        status.write(f"📚 {len(sources)} pieces of evidence retrieved")
+                        status.write("⚖️ Detecting Conflicts & Judging...")
+                        status.update(label="Judging Evidence...", state="running", expanded=False)
+                    except Exception as e:
+                        events = None
+                        status.update(label="System Failure", state="error")
+                        st.error(f"Error: {str(e)}")
 
-                        status.update(label="Response Generated", state="complete", expanded=False)
+                if events is not None:
+                    summary = {}
 
-                        st.markdown(response_text)
+                    def answer_tokens():
+                        for event in events:
+                            if event["event"] == "token":
+                                yield event["text"]
+                            elif event["event"] == "done":
+                                summary.update(event)
 
-                        # Save to history
-                        st.session_state.messages.append({"role": "assistant", "content": response_text})
+                    try:
+                        # Render the answer as it is generated
+                        response_text = st.write_stream(answer_tokens())
+                        timings = summary.get("timings", {})
+                        if timings:
+                            context = summary.get("context")
+                            st.caption(f"Retrieval {timings['retrieval_ms']:.0f} ms · Total {timings['total_ms']:.0f} ms"
+                                       + (f" · Context {context['tokens_out']}/{context['tokens_in']} tokens" if context else "")
+                                       + (" · cached" if summary.get("cached") else ""))
 
-                        # Update Evidence Log
-                        st.session_state.evidence_log = sources
+                        # Save to history
+                        st.session_state.messages.append({"role": "assistant", "content": summary.get("answer", response_text)})
 
                     except Exception as e:
-                        status.update(label="System Failure", state="error")
                         st.error(f"Error: {str(e)}")
 
 # Right Column: Evidence Board (Explainability)
@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Two-level cache for answer_query results.
+# Level 1 matches the normalized query text exactly; level 2 matches queries
+# whose embedding is within a cosine-similarity threshold of a cached one
+# (paraphrases). Every entry records the corpus version it was computed
+# against, and all entries are dropped as soon as a lookup sees a newer
+# version, so an answer can never outlive the ingestion that changed the corpus.
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_SIMILARITY = 0.95
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    return _WHITESPACE.sub(" ", query.strip().lower()).rstrip("?!. ")
+
+
+def _key(query, scope):
+    # Answers to the same question under different retrieval filters differ
+    return f"{scope}\x00{normalize_query(query)}" if scope else normalize_query(query)
+
+
+class AnswerCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 similarity_threshold=DEFAULT_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # normalized query -> entry, least recently used first
+        self._version = None
+        self._matrix = None  # stacked unit embeddings, rebuilt lazily
+        self._matrix_keys = []
+        self._matrix_scopes = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _expired(self, entry):
+        return time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _result(self, entry):
+        return {"answer": entry["answer"], "sources": [dict(s) for s in entry["sources"]]}
+
+    def get_exact(self, query, version, scope=""):
+        key = _key(query, scope)
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return self._result(entry)
+
+    def get_similar(self, embedding, version, scope=""):
+        """
+        Best cached answer in the same scope whose query embedding is similar
+        enough, else None. Counts a miss when nothing matches.
+        """
+        with self._lock:
+            self._sync_version(version)
+            if self._entries and embedding is not None:
+                if self._matrix is None:
+                    self._matrix_keys = [k for k, e in self._entries.items() if e["embedding"] is not None]
+                    self._matrix = (np.stack([self._entries[k]["embedding"] for k in self._matrix_keys])
+                                    if self._matrix_keys else None)
+                    self._matrix_scopes = np.array([self._entries[k]["scope"] for k in self._matrix_keys], dtype=object)
+                if self._matrix is not None and self._matrix.shape[1] == len(embedding):
+                    # (a different width means the embedding provider changed)
+                    similarities = self._matrix @ _unit(embedding)
+                    similarities[self._matrix_scopes != scope] = -np.inf
+                    best = int(np.argmax(similarities))
+                    key = self._matrix_keys[best]
+                    entry = self._entries.get(key)
+                    if similarities[best] >= self.similarity_threshold and entry is not None:
+                        if self._expired(entry):
+                            self._drop(key)
+                        else:
+                            self._entries.move_to_end(key)
+                            self.semantic_hits += 1
+                            return self._result(entry)
+            self.misses += 1
+            return None
+
+    def put(self, query, embedding, version, result, scope=""):
+        key = _key(query, scope)
+        with self._lock:
+            if self._version is not None and version < self._version:
+                return  # computed against a corpus that has since changed
+            self._sync_version(version)
+            self._entries[key] = {
+                "answer": result["answer"],
+                "sources": [dict(s) for s in result["sources"]],
+                "embedding": _unit(embedding) if embedding is not None else None,
+                "scope": scope,
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "corpus_version": self._version,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
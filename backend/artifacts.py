@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from langchain_core.documents import Document
+from backend.telemetry import span
+
+# Persistent store of raw extraction output (Whisper transcripts, GPT-4o image
+# and frame descriptions, PDF page text), keyed by file content hash plus
+# extractor name and version. Re-chunking, switching embedding models or
+# rebuilding the vector store reads these instead of paying for extraction again.
+#
+# Layout: ARTIFACT_DIR/<hash[:2]>/<hash>/<extractor>-v<version>.json
+# ARTIFACT_DIR/latest/<sha256(file name)>.json points each file name at the
+# artifact it was most recently ingested from, so a re-upload of an older
+# version (a cache hit that writes nothing new) is what a reindex restores.
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "./backend/artifact_store")
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class PartialExtractionError(Exception):
+    """
+    Raised after the documents of an extraction that reported failures, so
+    add_documents keeps the source's older chunks instead of deleting them.
+    """
+
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _artifact_path(content_hash, extractor, version):
+    return os.path.join(ARTIFACT_DIR, content_hash[:2], content_hash, f"{extractor}-v{version}.json")
+
+
+def _latest_dir():
+    return os.path.join(ARTIFACT_DIR, "latest")
+
+
+def _pointer_path(file_name):
+    return os.path.join(_latest_dir(), hashlib.sha256(file_name.encode("utf-8")).hexdigest() + ".json")
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write-then-rename so a crash never leaves a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def mark_latest(file_name, content_hash, extractor, version):
+    """
+    Record that `file_name` was last ingested from this stored artifact.
+    """
+    _write_json(_pointer_path(file_name), {
+        "file_name": file_name,
+        "content_hash": content_hash,
+        "extractor": extractor,
+        "version": version,
+    })
+
+
+def _rename(docs, old_name, new_name):
+    """
+    Point stored documents at the name the content was uploaded under this time.
+    """
+    if old_name == new_name:
+        return docs
+    for doc in docs:
+        meta = doc.metadata
+        if meta.get("source") == old_name:
+            meta["source"] = new_name
+        if meta.get("media_url") == f"/static/{old_name}":
+            meta["media_url"] = f"/static/{new_name}"
+        ref = meta.get("citation_ref")
+        if isinstance(ref, str) and ref.startswith(old_name):
+            meta["citation_ref"] = new_name + ref[len(old_name):]
+    return docs
+
+
+def load(content_hash, extractor, version, file_name=None):
+    """
+    Return the stored Documents, or None if this extraction was never stored.
+    """
+    path = _artifact_path(content_hash, extractor, version)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+    docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in record["documents"]]
+    return _rename(docs, record["file_name"], file_name or record["file_name"])
+
+
+def save(content_hash, extractor, version, file_name, docs, extra=None):
+    record = {
+        "content_hash": content_hash,
+        "extractor": extractor,
+        "version": version,
+        "file_name": file_name,
+        "created_at": time.time(),
+        "documents": [{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+    }
+    if extra:
+        record.update(extra)
+    _write_json(_artifact_path(content_hash, extractor, version), record)
+    mark_latest(file_name, content_hash, extractor, version)
+
+
+def extract_cached(file_path, file_name, extractor, version, extract_fn, content_hash=None):
+    """
+    Run `extract_fn(file_path, file_name, failures)` unless its output for this
+    exact content is already stored. Output is only stored when the extractor
+    reported no failures, so partial results are retried next time; they are
+    returned as a generator that raises PartialExtractionError once exhausted.
+    """
+    try:
+        with span(f"extract.{extractor}") as s:
+            s["bytes"] = os.path.getsize(file_path)
+            content_hash = content_hash or file_hash(file_path)
+            docs = load(content_hash, extractor, version, file_name)
+            if docs is not None:
+                print(f"Reusing stored {extractor} extraction for {file_name}")
+                mark_latest(file_name, content_hash, extractor, version)
+                s["artifact_hits"] = 1
+                return docs
+
+            failures = []
+            docs = list(extract_fn(file_path, file_name, failures))
+            s.update(documents=len(docs), failures=len(failures))
+            if failures:
+                return _partial(docs, failures, extractor, file_name)
+            if docs:
+                save(content_hash, extractor, version, file_name, docs)
+            return docs
+    except Exception as e:
+        print(f"Error processing {extractor} {file_name}: {e}")
+        return []
+
+
+def _partial(docs, failures, extractor, file_name):
+    yield from docs
+    raise PartialExtractionError(
+        f"{len(failures)} part(s) of the {extractor} extraction of {file_name} failed "
+        f"(first error: {failures[0]}); earlier chunks were kept"
+    )
+
+
+def _read_pointers():
+    pointers = {}
+    if not os.path.isdir(_latest_dir()):
+        return pointers
+    for name in os.listdir(_latest_dir()):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(_latest_dir(), name), "r", encoding="utf-8") as f:
+                pointer = json.load(f)
+        except Exception as e:
+            print(f"Warning: Skipping unreadable artifact pointer {name}: {e}")
+            continue
+        pointers[pointer["file_name"]] = (pointer["content_hash"], pointer["extractor"], pointer["version"])
+    return pointers
+
+
+def iter_latest():
+    """
+    Yield one stored record per file name: the artifact it was last ingested
+    from, or (for artifacts stored before that was tracked) the newest one.
+    Records are dicts as written by save(), renamed to the file name.
+    """
+    if not os.path.isdir(ARTIFACT_DIR):
+        return
+    pointers = _read_pointers()
+    paths = {}  # (content_hash, extractor, version) -> artifact path
+    newest = {}  # file name -> ((created_at, version), artifact path)
+    for root, dirs, files in os.walk(ARTIFACT_DIR):
+        if root == ARTIFACT_DIR and "latest" in dirs:
+            dirs.remove("latest")
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except Exception as e:
+                print(f"Warning: Skipping unreadable artifact {path}: {e}")
+                continue
+            paths[(record["content_hash"], record["extractor"], record["version"])] = path
+            order = (record["created_at"], record["version"])
+            current = newest.get(record["file_name"])
+            if current is None or order > current[0]:
+                newest[record["file_name"]] = (order, path)
+
+    for file_name in sorted(set(newest) | set(pointers)):
+        path = paths.get(pointers.get(file_name))
+        if path is None:
+            if file_name not in newest:
+                continue  # the artifact it points at is gone
+            path = newest[file_name][1]
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        if record["file_name"] != file_name:
+            # Same content uploaded under another name
+            docs = load(record["content_hash"], record["extractor"], record["version"], file_name)
+            record["documents"] = [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+            record["file_name"] = file_name
+        yield record
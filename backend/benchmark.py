@@ -0,0 +1,269 @@
+"""
+Retrieval and ingestion benchmark on the WikiQA relevance labels.
+
+Usage:
+    python -m backend.benchmark --embedder hashing --questions 500
+    python -m backend.benchmark --embedder local --k 1,5,10 --output bench.json
+    python -m backend.benchmark --backend chroma milvus:HNSW milvus:IVF_FLAT
+    python -m backend.benchmark --backend chroma quantized:int8 quantized:binary
+
+Candidate sentences from Dataset/WikiQA-train.txt are ingested through
+add_documents into a throw-away collection, then every question with at least
+one correct sentence is replayed through query_documents. Reports recall@k,
+MRR, retrieval latency percentiles and ingestion throughput as JSON, so runs
+can be compared across changes to the retrieval stack.
+
+With several --backend values the same corpus is loaded into each vector
+backend in turn. Every run also measures the backend alone: nearest-neighbour
+latency and ANN recall (overlap of its top-k with an exact cosine search over
+the same vectors), which is what index parameters trade against each other,
+and the memory its index needs per million vectors. The comparison table
+shows each backend's recall change relative to the first one listed.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+from backend import resources
+from backend import vector_store
+from backend import vector_backends
+from backend.bulk_ingest import read_wikiqa
+
+WIKIQA_PATH = "Dataset/WikiQA-train.txt"
+DEFAULT_KS = (1, 5, 10)
+
+
+def load_wikiqa(path=WIKIQA_PATH, max_questions=None):
+    """
+    Returns (documents, questions) where questions maps each question with a
+    correct answer to the set of rows labelled relevant. With max_questions,
+    only the first N questions and their candidate sentences are kept.
+    """
+    documents, labels, order = [], {}, []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        # Read labels alongside the ingestion reader so row numbers match
+        raw_rows = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        for (row, docs), fields in zip(read_wikiqa(path, os.path.basename(path)), raw_rows):
+            if len(fields) < 3 or not docs:
+                continue
+            question = fields[0].strip()
+            if question not in labels:
+                if max_questions and len(order) >= max_questions:
+                    break
+                labels[question] = set()
+                order.append(question)
+            if fields[2].strip() == "1":
+                labels[question].add(row)
+            documents.extend(docs)
+    questions = {q: labels[q] for q in order if labels[q]}
+    return documents, questions
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    array = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(array, 50)), 3),
+        "p95": round(float(np.percentile(array, 95)), 3),
+        "p99": round(float(np.percentile(array, 99)), 3),
+        "mean": round(float(array.mean()), 3),
+    }
+
+
+def evaluate(questions, ks=DEFAULT_KS):
+    """
+    Replay questions through query_documents. Returns metrics and latencies.
+    """
+    max_k = max(ks)
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for question, relevant in questions.items():
+        started = time.perf_counter()
+        docs = vector_store.query_documents(question, k=max_k)
+        latencies.append(time.perf_counter() - started)
+
+        rows = [doc.metadata.get("row") for doc in docs]
+        for k in ks:
+            recalls[k].append(len(relevant.intersection(rows[:k])) / len(relevant))
+        rank = next((i + 1 for i, row in enumerate(rows) if row in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    metrics = {f"recall@{k}": round(float(np.mean(recalls[k])), 4) for k in ks}
+    metrics["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+    return metrics, latencies
+
+
+def evaluate_ann(documents, questions, k):
+    """
+    Vector backend alone: latency of a k-nearest search and its recall
+    against exact cosine search over the same (cached) embeddings.
+    """
+    unique = {vector_store.chunk_id(doc): doc for doc in documents}
+    ids = list(unique)
+    embeddings = vector_store.get_embeddings()
+    matrix = np.asarray(embeddings.embed_documents([unique[i].page_content for i in ids]), dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    backend = vector_store.get_vector_store()
+
+    recalls, latencies = [], []
+    for question in questions:
+        vector = embeddings.embed_query(question)
+        query = np.asarray(vector, dtype=np.float32)
+        exact = {ids[i] for i in np.argsort(-(matrix @ query))[:k]}
+        started = time.perf_counter()
+        found = backend.nearest(vector, k)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(exact.intersection(doc.id for doc, _ in found)) / len(exact))
+    return {f"recall@{k}": round(float(np.mean(recalls)), 4), "latency_ms": percentiles(latencies)}
+
+
+def memory_footprint(backend):
+    """
+    MB per million vectors of what every search scans (`index`) and of the
+    float32 vectors. Backends that do not report it hold float32 vectors in
+    their index; that size is used as a lower bound (graph links excluded).
+    """
+    dimension = backend.metadata()["embedding_dimension"]
+    usage = backend.memory_usage() or {"index": dimension * 4, "full_precision": dimension * 4}
+    return {f"{key}_mb_per_million": round(value * 1e6 / 2 ** 20, 1) for key, value in usage.items()}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _use_backend(spec):
+    """
+    Select a vector backend from "name", "milvus:INDEX_TYPE" or "quantized:MODE".
+    """
+    name, _, option = spec.partition(":")
+    if name not in vector_store.VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend {name!r}; expected one of {sorted(vector_store.VECTOR_BACKENDS)}")
+    vector_store.VECTOR_BACKEND = name
+    if option and name == "milvus":
+        vector_backends.MILVUS_INDEX_TYPE = option.upper()
+    elif option and name == "quantized":
+        vector_backends.QUANTIZED_MODE = option.lower()
+    elif option:
+        raise ValueError(f"Vector backend {name!r} takes no options")
+
+
+def run(embedder=None, max_questions=None, ks=DEFAULT_KS, hybrid=None, path=WIKIQA_PATH, store_dir=None,
+        backend=None):
+    """
+    Ingest + evaluate in an isolated collection. Returns the result dict.
+    """
+    original_settings = (vector_store.EMBEDDING_PROVIDER, vector_store.HYBRID_SEARCH, vector_store.VECTOR_BACKEND,
+                         vector_backends.MILVUS_INDEX_TYPE, vector_backends.QUANTIZED_MODE)
+    original_dir = vector_store.PERSIST_DIRECTORY
+    temp_dir = store_dir or tempfile.mkdtemp(prefix="rag-benchmark-")
+    try:
+        if embedder:
+            vector_store.EMBEDDING_PROVIDER = embedder
+        if hybrid is not None:
+            vector_store.HYBRID_SEARCH = hybrid
+        if backend:
+            _use_backend(backend)
+        embedder, hybrid = vector_store.EMBEDDING_PROVIDER, vector_store.HYBRID_SEARCH
+        backend = backend or vector_store.VECTOR_BACKEND
+
+        # Fresh store, fresh embedding cache: ingestion timings include embedding
+        resources.shutdown()
+        vector_store.PERSIST_DIRECTORY = temp_dir
+
+        documents, questions = load_wikiqa(path, max_questions)
+
+        started = time.perf_counter()
+        chunks = vector_store.add_documents(documents)
+        ingest_seconds = time.perf_counter() - started
+
+        # Warm-up query so one-time setup is not counted as retrieval latency
+        vector_store.query_documents("warm up", k=max(ks))
+        metrics, latencies = evaluate(questions, ks)
+        ann = evaluate_ann(documents, questions, max(ks))
+        memory = memory_footprint(vector_store.get_vector_store())
+    finally:
+        resources.shutdown()
+        vector_store.PERSIST_DIRECTORY = original_dir
+        (vector_store.EMBEDDING_PROVIDER, vector_store.HYBRID_SEARCH, vector_store.VECTOR_BACKEND,
+         vector_backends.MILVUS_INDEX_TYPE, vector_backends.QUANTIZED_MODE) = original_settings
+        if store_dir is None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        "benchmark": "wikiqa",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "embedder": embedder,
+            "backend": backend,
+            "hybrid": hybrid,
+            "ks": list(ks),
+            "max_questions": max_questions,
+        },
+        "corpus": {"chunks": chunks, "questions": len(questions)},
+        "ingest": {
+            "seconds": round(ingest_seconds, 3),
+            "chunks_per_sec": round(chunks / ingest_seconds, 1) if ingest_seconds else None,
+        },
+        "retrieval": {**metrics, "latency_ms": percentiles(latencies)},
+        "ann": ann,
+        "memory": memory,
+    }
+
+
+def print_comparison(results):
+    k = max(results[0]["config"]["ks"])
+    baseline = results[0]["retrieval"][f"recall@{k}"]
+    print(f"{'backend':<20} {'chunks/s':>9} {f'recall@{k}':>10} {'change':>8} {'mrr':>7} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {f'ann recall@{k}':>15} {'ann p50':>8} {'ann p95':>8} {'MB/1M':>8}")
+    for result in results:
+        retrieval, ann = result["retrieval"], result["ann"]
+        print(f"{result['config']['backend']:<20} {result['ingest']['chunks_per_sec'] or 0:>9.0f} "
+              f"{retrieval[f'recall@{k}']:>10.4f} {retrieval[f'recall@{k}'] - baseline:>+8.4f} "
+              f"{retrieval['mrr']:>7.4f} {retrieval['latency_ms']['p50']:>8.2f} {retrieval['latency_ms']['p95']:>8.2f} "
+              f"{ann[f'recall@{k}']:>15.4f} {ann['latency_ms']['p50']:>8.2f} {ann['latency_ms']['p95']:>8.2f} "
+              f"{result['memory']['index_mb_per_million']:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--embedder", choices=sorted(vector_store.EMBEDDING_PROVIDERS),
+                        help="Embedding provider (default: EMBEDDING_PROVIDER)")
+    parser.add_argument("--questions", type=int, help="Only use the first N questions")
+    parser.add_argument("--k", default=",".join(map(str, DEFAULT_KS)), help="Comma-separated cutoffs")
+    parser.add_argument("--hybrid", choices=["on", "off"], help="Override HYBRID_SEARCH")
+    parser.add_argument("--dataset", default=WIKIQA_PATH)
+    parser.add_argument("--backend", nargs="+",
+                        help="Vector backends to compare, e.g. chroma milvus:HNSW quantized:int8 quantized:binary "
+                             "(default: VECTOR_BACKEND)")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    results = [run(
+        embedder=args.embedder,
+        max_questions=args.questions,
+        ks=tuple(int(k) for k in args.k.split(",")),
+        hybrid=None if args.hybrid is None else args.hybrid == "on",
+        path=args.dataset,
+        backend=backend,
+    ) for backend in (args.backend or [None])]
+    if len(results) > 1:
+        print_comparison(results)
+    text = json.dumps(results[0] if len(results) == 1 else results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
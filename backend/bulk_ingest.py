@@ -0,0 +1,306 @@
+"""
+Bulk-load dataset files into the vector store.
+
+Usage:
+    python -m backend.bulk_ingest                      # everything under Dataset/
+    python -m backend.bulk_ingest Dataset/WikiQA-train.txt --workers 8
+    python -m backend.bulk_ingest --restart            # ignore saved checkpoints
+
+Each supported file is read by a streaming, format-specific reader:
+WikiQA-style TSV (question / sentence / label), delimited CSV records (e.g.
+the semicolon-separated Mozilla bug export), sectioned JSON manuals, PDFs and
+plain text. Rows are grouped into batches that are embedded on a worker pool
+and upserted in large writes. Progress is checkpointed after every batch, so
+an interrupted run resumes from the last written row. Once a file is complete,
+chunks that an earlier version of it produced are deleted.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from langchain_core.documents import Document
+from backend.chunking import chunk_documents
+from backend.frames import map_bounded
+from backend.ingest import process_pdf, process_text
+from backend.vector_store import chunk_id, get_embeddings, get_vector_store, remove_stale_chunks, upsert_embedded
+from utils.json_stream import iter_json_items
+
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "4"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "512"))  # chunks per embedding call
+CHECKPOINT_PATH = os.getenv("BULK_CHECKPOINT_PATH", "./backend/bulk_ingest_checkpoint.json")
+PROGRESS_INTERVAL_SEC = 5
+
+# Column names of the Mozilla Bugzilla export
+BUG_COLUMNS = {
+    "bugID": "Bug", "sd": "Summary", "ct": "Created", "dt": "Last changed",
+    "cl": "Classification", "pd": "Product", "co": "Component", "rp": "Platform",
+    "os": "OS", "bs": "Status", "rs": "Resolution", "pr": "Priority",
+    "bsr": "Severity", "re": "Reporter", "at": "Assignee",
+}
+SECTION_NOISE = {"See ."}
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def read_wikiqa(file_path, file_name):
+    """
+    question<TAB>sentence<TAB>label rows; each candidate sentence is a chunk.
+    """
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        for row, fields in enumerate(csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE), start=1):
+            if len(fields) < 2 or not fields[1].strip():
+                yield row, []
+                continue
+            yield row, [Document(
+                page_content=fields[1].strip(),
+                metadata={
+                    "source": file_name,
+                    "type": "text",
+                    "row": row,
+                    "citation_ref": f"{file_name} row {row}",
+                }
+            )]
+
+
+def read_delimited(file_path, file_name):
+    """
+    Header + records CSV with any common delimiter; each record is a chunk.
+    """
+    with open(file_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row, record in enumerate(csv.DictReader(f, dialect=dialect), start=1):
+            fields = [(BUG_COLUMNS.get(key, key), (value or "").strip())
+                      for key, value in record.items() if key is not None]
+            fields = [(label, value) for label, value in fields if value]
+            if not fields:
+                yield row, []
+                continue
+            bug_id = (record.get("bugID") or "").strip()
+            if bug_id:
+                summary = (record.get("sd") or "").strip()
+                lines = [f"Bug {bug_id}: {summary}"]
+                lines += [f"{label}: {value}" for label, value in fields if label not in ("Bug", "Summary")]
+                citation = f"{file_name} Bug {bug_id}"
+            else:
+                lines = [f"{label}: {value}" for label, value in fields]
+                citation = f"{file_name} row {row}"
+            yield row, [Document(
+                page_content="\n".join(lines),
+                metadata={"source": file_name, "type": "text", "row": row, "citation_ref": citation}
+            )]
+
+
+def read_json_sections(file_path, file_name):
+    """
+    Top-level JSON object or array, streamed item by item. Manual sections
+    ({"title", "text": [...], "section_url"}) are chunked by tokens; other
+    items are chunked as pretty-printed JSON.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for row, (key, item) in enumerate(iter_json_items(f), start=1):
+            if isinstance(item, dict) and isinstance(item.get("text"), list):
+                title = str(item.get("title") or key)
+                lines = []
+                for line in item["text"]:
+                    line = str(line).strip()
+                    if line and line not in SECTION_NOISE and (not lines or lines[-1] != line):
+                        lines.append(line)
+                text = "\n".join(lines)
+                metadata = {"title": title, "citation_ref": f"{file_name} § {title}"}
+                if item.get("section_url"):
+                    metadata["section_url"] = str(item["section_url"])
+            else:
+                text = json.dumps(item, indent=2, ensure_ascii=False)
+                metadata = {"citation_ref": f"{file_name} item {key}"}
+            metadata.update({"source": file_name, "type": "text", "row": row, "section": str(key)})
+            yield row, list(chunk_documents([Document(page_content=text, metadata=metadata)]))
+
+
+def _read_chunks(chunks):
+    for row, doc in enumerate(chunks, start=1):
+        yield row, [doc]
+
+
+def _is_wikiqa(file_path):
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        fields = f.readline().rstrip("\n").split("\t")
+    return len(fields) == 3 and fields[2].strip() in ("0", "1")
+
+
+def reader_for(file_path):
+    """
+    Streaming reader for a file, or None if the format is not supported.
+    Readers yield (row_number, [Document, ...]).
+    """
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in (".txt", ".tsv") and _is_wikiqa(file_path):
+        return read_wikiqa
+    if suffix in (".csv", ".tsv"):
+        return read_delimited
+    if suffix == ".json":
+        return read_json_sections
+    if suffix == ".pdf":
+        return lambda path, name: _read_chunks(process_pdf(path, name))
+    if suffix in (".txt", ".md"):
+        return lambda path, name: _read_chunks(process_text(path, name))
+    return None
+
+
+def load_checkpoints(path=CHECKPOINT_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoints(checkpoints, path=CHECKPOINT_PATH):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(checkpoints, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _batches(rows, batch_size):
+    """
+    Group (row, docs) into (last_row, rows_in_batch, docs) with about
+    `batch_size` chunks; a row's chunks never straddle two batches.
+    """
+    docs, count, last_row = [], 0, None
+    for row, row_docs in rows:
+        docs.extend(row_docs)
+        count += 1
+        last_row = row
+        if len(docs) >= batch_size:
+            yield last_row, count, docs
+            docs, count = [], 0
+    if count:
+        yield last_row, count, docs
+
+
+def _embed(batch):
+    _, _, docs = batch
+    if not docs:
+        return []
+    return get_embeddings().embed_documents([doc.page_content for doc in docs])
+
+
+def ingest_file(file_path, checkpoints, workers=None, batch_size=None, restart=False, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Stream one file into the store, resuming after its checkpointed row.
+    Returns {"rows", "chunks", "seconds"} for the rows processed in this run.
+    """
+    workers = workers or BULK_WORKERS
+    batch_size = batch_size or BULK_BATCH_SIZE
+    file_name = os.path.basename(file_path)
+    reader = reader_for(file_path)
+    if reader is None:
+        print(f"Skipping {file_name}: unsupported format")
+        return {"rows": 0, "chunks": 0, "seconds": 0.0}
+
+    key = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    signature = f"{stat.st_size}:{int(stat.st_mtime)}"
+    state = checkpoints.get(key)
+    if restart or state is None or state.get("signature") != signature:
+        state = {"signature": signature, "rows": 0, "chunks": 0, "complete": False}
+    if state["complete"]:
+        print(f"Skipping {file_name}: already ingested ({state['rows']} rows, {state['chunks']} chunks)")
+        return {"rows": 0, "chunks": 0, "seconds": 0.0}
+    if state["rows"]:
+        print(f"Resuming {file_name} after row {state['rows']}")
+
+    resume_after = state["rows"]
+    produced = set()  # IDs of every chunk the file yields, including rows written by earlier runs
+
+    def rows_to_ingest():
+        for row, docs in reader(file_path, file_name):
+            produced.update(chunk_id(doc) for doc in docs)
+            if row > resume_after:
+                yield row, docs
+
+    rows = rows_to_ingest()
+
+    started = last_report = time.perf_counter()
+    run_rows = run_chunks = 0
+    for (last_row, row_count, docs), vectors in map_bounded(_embed, _batches(rows, batch_size), workers):
+        if docs:
+            run_chunks += upsert_embedded(docs, vectors)
+        run_rows += row_count
+        state.update(rows=last_row, chunks=state["chunks"] + len(docs))
+        checkpoints[key] = state
+        save_checkpoints(checkpoints, checkpoint_path)
+
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL_SEC:
+            elapsed = now - started
+            print(f"  {file_name}: {run_rows} rows, {run_chunks} chunks "
+                  f"({run_rows / elapsed:.0f} rows/s, {run_chunks / elapsed:.0f} chunks/s)")
+            last_report = now
+
+    # The file is fully written: drop chunks an earlier version of it produced
+    removed = remove_stale_chunks(file_name, produced)
+    if removed:
+        print(f"Removed {removed} stale chunks of {file_name}")
+    get_vector_store().flush()
+    state["complete"] = True
+    checkpoints[key] = state
+    save_checkpoints(checkpoints, checkpoint_path)
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"Ingested {file_name}: {run_rows} rows, {run_chunks} chunks in {elapsed:.1f}s "
+          f"({run_rows / elapsed:.0f} rows/s, {run_chunks / elapsed:.0f} chunks/s)")
+    return {"rows": run_rows, "chunks": run_chunks, "seconds": elapsed}
+
+
+def _expand(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full = os.path.join(path, name)
+                if os.path.isfile(full):
+                    yield full
+        else:
+            yield path
+
+
+def bulk_ingest(paths, workers=None, batch_size=None, restart=False, checkpoint_path=CHECKPOINT_PATH):
+    checkpoints = {} if restart else load_checkpoints(checkpoint_path)
+    totals = {"files": 0, "rows": 0, "chunks": 0}
+    started = time.perf_counter()
+    for file_path in _expand(paths):
+        try:
+            result = ingest_file(file_path, checkpoints, workers, batch_size, restart, checkpoint_path)
+        except Exception as e:
+            print(f"Error ingesting {file_path}: {e} (progress so far is checkpointed)")
+            continue
+        if result["rows"]:
+            totals["files"] += 1
+            totals["rows"] += result["rows"]
+            totals["chunks"] += result["chunks"]
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    totals["seconds"] = elapsed
+    print(f"Bulk ingestion: {totals['files']} files, {totals['rows']} rows, {totals['chunks']} chunks in {elapsed:.1f}s "
+          f"({totals['rows'] / elapsed:.0f} rows/s, {totals['chunks'] / elapsed:.0f} chunks/s)")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=["Dataset"], help="Files or directories (default: Dataset)")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS, help="Concurrent embedding batches")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="Chunks per embedding batch")
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints and start every file over")
+    args = parser.parse_args()
+    bulk_ingest(args.paths, workers=args.workers, batch_size=args.batch_size, restart=args.restart)
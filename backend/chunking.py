@@ -0,0 +1,191 @@
+import hashlib
+import os
+import re
+from langchain_core.documents import Document
+
+# Streaming, token-aware chunker.
+# Text is read in fixed-size blocks and split into sentences lazily; sentences
+# are packed into chunks of at most CHUNK_MAX_TOKENS with CHUNK_OVERLAP_TOKENS
+# of trailing context carried into the next chunk. Chunks prefer to end on a
+# paragraph break, then on a sentence end, and only split inside a sentence
+# when a single sentence is larger than the budget.
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "60"))
+READ_BLOCK_CHARS = 64 * 1024
+
+# A sentence ends with ., ! or ? followed by whitespace, or at a paragraph break.
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Token count using the cl100k_base encoding when tiktoken is installed,
+    otherwise a ~4 characters per token estimate.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def iter_blocks(file_obj, block_size=READ_BLOCK_CHARS):
+    while True:
+        block = file_obj.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def iter_sentences(blocks):
+    """
+    Yield (sentence, start_offset, end_offset, ends_paragraph) from an iterable
+    of text blocks without ever joining the blocks into one string.
+    """
+    buffer = ""
+    offset = 0  # character offset of buffer[0] in the whole stream
+    for block in blocks:
+        buffer += block
+        last = 0
+        for match in _BOUNDARY.finditer(buffer):
+            # A boundary touching the end of the buffer may continue in the next block
+            if match.end() == len(buffer):
+                break
+            yield from _emit(buffer, last, match.start(), offset, bool(_PARAGRAPH.fullmatch(match.group())))
+            last = match.end()
+        else:
+            # No boundary in a very long run of text: cut at the last whitespace
+            if len(buffer) - last > 4 * READ_BLOCK_CHARS:
+                cut = buffer.rfind(" ", last, len(buffer) - 1)
+                if cut > last:
+                    yield from _emit(buffer, last, cut, offset, False)
+                    last = cut + 1
+        buffer = buffer[last:]
+        offset += last
+    yield from _emit(buffer, 0, len(buffer), offset, True)
+
+
+def _emit(buffer, start, end, offset, ends_paragraph):
+    raw = buffer[start:end]
+    text = raw.strip()
+    if text:
+        lead = len(raw) - len(raw.lstrip())
+        begin = offset + start + lead
+        yield text, begin, begin + len(text), ends_paragraph
+
+
+def split_long(sentence, start, max_tokens):
+    """
+    Split a sentence that alone exceeds the budget into token windows.
+    Yields (text, start_offset, end_offset, is_last_piece).
+    """
+    if _encoding:
+        tokens = _encoding.encode(sentence, disallowed_special=())
+        pieces = [_encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    else:
+        step = max_tokens * 4
+        pieces = [sentence[i:i + step] for i in range(0, len(sentence), step)]
+
+    cursor = start
+    for n, piece in enumerate(pieces):
+        text = piece.strip()
+        if text:
+            begin = cursor + len(piece) - len(piece.lstrip())
+            yield text, begin, begin + len(text), n == len(pieces) - 1
+        cursor += len(piece)
+
+
+def chunk_sentences(sentences, max_tokens=None, overlap_tokens=None):
+    """
+    Pack sentences into chunks. Yields (text, start_offset, end_offset).
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    current = []  # (text, start, end, tokens)
+    current_tokens = 0
+
+    def flush():
+        text = " ".join(item[0] for item in current)
+        return text, current[0][1], current[-1][2]
+
+    def carry_overlap():
+        kept, tokens = [], 0
+        for item in reversed(current):
+            if tokens + item[3] > overlap_tokens:
+                break
+            kept.insert(0, item)
+            tokens += item[3]
+        return kept, tokens
+
+    for sentence, start, end, ends_paragraph in sentences:
+        # Leading space: sentences are joined with spaces inside a chunk
+        tokens = count_tokens(" " + sentence)
+        pieces = [(sentence, start, end, ends_paragraph)]
+        if tokens > max_tokens:
+            pieces = list(split_long(sentence, start, max_tokens))
+
+        for text, p_start, p_end, p_ends_paragraph in pieces:
+            p_tokens = tokens if len(pieces) == 1 else count_tokens(" " + text)
+            if current and current_tokens + p_tokens > max_tokens:
+                yield flush()
+                current, current_tokens = carry_overlap()
+                # Overlap must never push a fresh chunk over budget
+                while current and current_tokens + p_tokens > max_tokens:
+                    current_tokens -= current.pop(0)[3]
+            current.append((text, p_start, p_end, p_tokens))
+            current_tokens += p_tokens
+
+            # Prefer to close chunks on paragraph breaks once they are half full
+            if p_ends_paragraph and current_tokens >= max_tokens // 2:
+                yield flush()
+                current, current_tokens = [], 0
+
+    if current:
+        yield flush()
+
+
+def occurrence(counts, text):
+    """
+    How many earlier chunks in `counts` (a dict kept per source) had exactly
+    this text: 0 for the first. Repeated text gets distinct chunk IDs this way.
+    """
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    seen = counts.get(key, 0)
+    counts[key] = seen + 1
+    return seen
+
+
+def chunk_text_stream(file_obj, max_tokens=None, overlap_tokens=None):
+    """
+    Lazily chunk an open text file. Yields (text, start_offset, end_offset).
+    """
+    return chunk_sentences(iter_sentences(iter_blocks(file_obj)), max_tokens, overlap_tokens)
+
+
+def chunk_documents(docs, max_tokens=None, overlap_tokens=None):
+    """
+    Split each Document (e.g. a PDF page) into token-bounded chunks that keep
+    the parent's metadata and citation_ref, plus the character offsets of the
+    chunk inside the parent.
+    """
+    for doc in docs:
+        counts = {}
+        sentences = iter_sentences([doc.page_content])
+        for text, start, end in chunk_sentences(sentences, max_tokens, overlap_tokens):
+            metadata = dict(doc.metadata)
+            metadata["offset_start"] = start
+            metadata["offset_end"] = end
+            repeat = occurrence(counts, text)
+            if repeat:
+                metadata["occurrence"] = repeat
+            yield Document(page_content=text, metadata=metadata)
@@ -0,0 +1,152 @@
+import math
+import os
+import re
+from backend.chunking import count_tokens, iter_sentences, split_long
+from backend.lexical_index import tokenize
+
+# Token-budgeted context packing for the Judge prompt.
+# Retrieved chunks are split into sentences; sentences repeated across chunks
+# (chunk overlap, the same page ingested twice, near-identical descriptions)
+# are kept once, and when the rest does not fit CONTEXT_MAX_TOKENS the
+# sentences sharing the most rare terms with the query win. Every retrieved
+# document keeps its header, so each citation_ref stays citable.
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+# Longer sentences (e.g. unpunctuated transcripts) are scored in pieces of this size
+MAX_SENTENCE_TOKENS = 80
+NEAR_DUPLICATE_JACCARD = 0.85
+GAP_MARKER = " … "
+DUPLICATE_NOTE = "[Same content as passages above]"
+OMITTED_NOTE = "[Omitted: context budget exhausted]"
+
+_NORMALIZE = re.compile(r"\W+")
+
+
+def _header(doc):
+    ref = doc.metadata.get("citation_ref", "Unknown Source")
+    return f"--- Document (Source: {ref}) ---\nContent: "
+
+
+def format_full(docs):
+    """
+    Every document in full, in the prompt's document format.
+    """
+    return "\n".join(f"{_header(doc)}{doc.page_content}\n" for doc in docs)
+
+
+def _sentences(text):
+    for sentence, start, _, _ in iter_sentences([text]):
+        if count_tokens(sentence) > MAX_SENTENCE_TOKENS:
+            for piece, _, _, _ in split_long(sentence, start, MAX_SENTENCE_TOKENS):
+                yield piece
+        else:
+            yield sentence
+
+
+def _is_near_duplicate(terms, kept_term_sets):
+    if len(terms) < 5:
+        return False
+    for other in kept_term_sets:
+        if len(terms & other) / len(terms | other) >= NEAR_DUPLICATE_JACCARD:
+            return True
+    return False
+
+
+def pack_context(docs, query, max_tokens=None):
+    """
+    Build the prompt context for `docs` within `max_tokens`.
+    Returns (context, stats) where stats has tokens_in (all documents in
+    full), tokens_out, duplicates_removed and sentences_kept / sentences_total.
+    """
+    max_tokens = max_tokens or CONTEXT_MAX_TOKENS
+    full = format_full(docs)
+    tokens_in = count_tokens(full)
+
+    # 1. Sentences per document, dropping exact and near duplicates
+    candidates = []  # (doc_rank, position, text, terms, tokens)
+    seen_text, kept_term_sets = set(), []
+    duplicates = 0
+    for rank, doc in enumerate(docs):
+        for position, sentence in enumerate(_sentences(doc.page_content)):
+            key = _NORMALIZE.sub(" ", sentence.lower()).strip()
+            terms = set(tokenize(sentence))
+            if key in seen_text or _is_near_duplicate(terms, kept_term_sets):
+                duplicates += 1
+                continue
+            seen_text.add(key)
+            kept_term_sets.append(terms)
+            candidates.append((rank, position, sentence, terms, count_tokens(" " + sentence)))
+
+    # Header plus the newlines around each document, and the note for
+    # documents whose every sentence already appeared in an earlier one
+    has_candidates = {c[0] for c in candidates}
+    reserved = sum(count_tokens(_header(doc)) + 2 for doc in docs)
+    reserved += count_tokens(DUPLICATE_NOTE) * (len(docs) - len(has_candidates))
+    budget = max_tokens - reserved
+    total = sum(c[4] for c in candidates)
+
+    if total <= budget:
+        selected = candidates
+    else:
+        # 2. Score sentences by the IDF of query terms they contain
+        df = {}
+        for c in candidates:
+            for term in c[3]:
+                df[term] = df.get(term, 0) + 1
+        n = len(candidates)
+        query_terms = set(tokenize(query or ""))
+
+        def score(c):
+            matched = sum(math.log(1 + n / df[t]) for t in query_terms & c[3])
+            return matched / (1 + math.log(1 + len(c[3])))
+
+        own = [score(c) for c in candidates]
+        # Neighbours of a relevant sentence inherit part of its score (context)
+        scores = {}
+        for i, c in enumerate(candidates):
+            near = [own[j] for j in (i - 1, i + 1)
+                    if 0 <= j < len(candidates) and candidates[j][0] == c[0]]
+            scores[id(c)] = own[i] + 0.3 * max(near, default=0.0)
+        chosen, used = set(), 0
+
+        def take(c):
+            nonlocal used
+            if id(c) not in chosen and used + c[4] <= budget:
+                chosen.add(id(c))
+                used += c[4]
+
+        # Best sentence of every document first, then the best of the rest
+        best_per_doc = {}
+        for c in candidates:
+            if c[0] not in best_per_doc or scores[id(c)] > scores[id(best_per_doc[c[0]])]:
+                best_per_doc[c[0]] = c
+        for rank in sorted(best_per_doc):
+            take(best_per_doc[rank])
+        for c in sorted(candidates, key=lambda c: (-scores[id(c)], c[0], c[1])):
+            take(c)
+        selected = [c for c in candidates if id(c) in chosen]
+
+    # 3. Re-assemble in document order, marking skipped passages
+    by_doc = {}
+    for c in selected:
+        by_doc.setdefault(c[0], []).append(c)
+    parts = []
+    for rank, doc in enumerate(docs):
+        content, last = "", None
+        for c in by_doc.get(rank, []):
+            if last is not None:
+                content += " " if c[1] == last + 1 else GAP_MARKER
+            content += c[2]
+            last = c[1]
+        if not content:
+            content = OMITTED_NOTE if rank in has_candidates else DUPLICATE_NOTE
+        parts.append(f"{_header(doc)}{content}\n")
+    context = "\n".join(parts)
+
+    return context, {
+        "tokens_in": tokens_in,
+        "tokens_out": count_tokens(context),
+        "duplicates_removed": duplicates,
+        "sentences_kept": len(selected),
+        "sentences_total": len(candidates) + duplicates,
+    }
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from langchain_core.embeddings import Embeddings
+from backend.telemetry import span
+
+# Content-addressed embedding cache.
+# Vectors are keyed by hash(model, dimension, kind, text) and stored as float32
+# blobs in SQLite, so re-ingesting a file only embeds chunks whose text changed.
+# Least-recently-used rows are evicted once the stored vectors exceed max_bytes.
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class EmbeddingCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(text, model, dimension, kind="document"):
+        payload = f"{model}\x00{dimension}\x00{kind}\x00{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Return {key: vector} for the keys present in the cache.
+        """
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items):
+        """
+        Store (key, vector) pairs, evicting least-recently-used rows if needed.
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items]
+        with self._lock:
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                replaced = self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})",
+                    [row[0] for row in batch],
+                ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", batch
+                )
+                self._total_bytes += sum(len(row[1]) for row in batch) - replaced
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC LIMIT 256"
+            ).fetchall()
+            if not victims:
+                self._total_bytes = 0
+                return
+            freed = 0
+            keys = []
+            for key, size in victims:
+                keys.append((key,))
+                freed += size
+                if self._total_bytes - freed <= self.max_bytes:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", keys)
+            self._total_bytes -= freed
+            self.evictions += len(keys)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends cache misses to the underlying provider.
+    """
+
+    def __init__(self, embeddings, cache, model_name=None, dimension=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.dimension = dimension or getattr(embeddings, "dimensions", None) or "default"
+
+    def _key(self, text, kind):
+        return EmbeddingCache.make_key(text, self.model_name, self.dimension, kind)
+
+    def _embed_many(self, texts, kind):
+        texts = list(texts)
+        keys = [self._key(text, kind) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            with span(f"embed.{kind}", texts=len(missing)):
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed_many(texts, "document")
+
+    def embed_queries(self, texts):
+        """
+        Embed many queries with a single provider call (cache misses only),
+        sharing cache entries with embed_query.
+        """
+        return self._embed_many(texts, "query")
+
+    def embed_query(self, text):
+        key = self._key(text, "query")
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        with span("embed.query", texts=1):
+            vector = self.embeddings.embed_query(text)
+        self.cache.put_many([(key, vector)])
+        return vector
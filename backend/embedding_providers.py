@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from backend.lexical_index import tokenize
+
+# Embedding providers that run without network access.
+#
+# LocalEmbeddings runs a sentence-transformers model (PyTorch or ONNX Runtime)
+# on the CPU. Texts are sorted by token length and packed into batches bounded
+# by a token budget, so short chunks are not padded to the length of the
+# longest chunk in a fixed-size batch and long chunks do not blow up memory.
+#
+# HashingEmbeddings maps tokens to a fixed number of signed hash buckets. It is
+# deterministic across processes and machines, needs no model, and is meant
+# for tests and smoke runs (it captures word overlap, not meaning).
+
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch")  # torch | onnx
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(os.cpu_count() or 4)))
+# Padded tokens per batch (batch size x longest text in the batch)
+LOCAL_EMBEDDING_BATCH_TOKENS = int(os.getenv("LOCAL_EMBEDDING_BATCH_TOKENS", "16384"))
+LOCAL_EMBEDDING_MAX_BATCH = int(os.getenv("LOCAL_EMBEDDING_MAX_BATCH", "128"))
+HASHING_DIMENSION = int(os.getenv("HASHING_EMBEDDING_DIMENSION", "384"))
+
+
+def length_buckets(lengths, max_tokens, max_batch):
+    """
+    Group indices into batches of similar length. Each batch keeps
+    len(batch) * max(length in batch) <= max_tokens (at least one text per batch).
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current, longest = [], [], 0
+    for i in order:
+        candidate = max(longest, lengths[i])
+        if current and (candidate * (len(current) + 1) > max_tokens or len(current) >= max_batch):
+            batches.append(current)
+            current, candidate = [], lengths[i]
+        current.append(i)
+        longest = candidate
+    if current:
+        batches.append(current)
+    return batches
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU sentence-transformers model with length-bucketed dynamic batching.
+    """
+
+    def __init__(self, model_name=None, backend=None, threads=None,
+                 batch_tokens=None, max_batch=None):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local needs sentence-transformers "
+                "(pip install sentence-transformers, plus onnxruntime for the ONNX backend)"
+            ) from e
+
+        self.model_name = model_name or LOCAL_EMBEDDING_MODEL
+        self.backend = backend or LOCAL_EMBEDDING_BACKEND
+        self.threads = threads or LOCAL_EMBEDDING_THREADS
+        self.batch_tokens = batch_tokens or LOCAL_EMBEDDING_BATCH_TOKENS
+        self.max_batch = max_batch or LOCAL_EMBEDDING_MAX_BATCH
+
+        try:
+            import torch
+            torch.set_num_threads(self.threads)
+        except ImportError:
+            pass
+        kwargs = {"device": "cpu"}
+        if self.backend == "onnx":
+            kwargs["backend"] = "onnx"
+            kwargs["model_kwargs"] = {"provider": "CPUExecutionProvider"}
+        self.model = SentenceTransformer(self.model_name, **kwargs)
+        get_dimension = (getattr(self.model, "get_embedding_dimension", None)
+                         or self.model.get_sentence_embedding_dimension)
+        self.dimension = get_dimension()
+        self.max_length = self.model.max_seq_length or 512
+        # One forward pass at a time; each already uses `threads` cores
+        self._lock = threading.Lock()
+
+    def _token_lengths(self, texts):
+        encoded = self.model.tokenizer(texts, add_special_tokens=True, truncation=True,
+                                       max_length=self.max_length)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = [None] * len(texts)
+        for batch in length_buckets(self._token_lengths(texts), self.batch_tokens, self.max_batch):
+            with self._lock:
+                encoded = self.model.encode(
+                    [texts[i] for i in batch], batch_size=len(batch),
+                    normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False,
+                )
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic signed feature hashing of word tokens and word bigrams.
+    """
+
+    def __init__(self, dimension=None):
+        self.dimension = dimension or HASHING_DIMENSION
+        self.model_name = f"hashing-{self.dimension}"
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimension] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
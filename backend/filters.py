@@ -0,0 +1,255 @@
+import json
+import re
+
+# Retrieval filters, expressed once and applied in two places: as a `where`
+# clause in Chroma's syntax (so the vector search only scans matching chunks;
+# other vector backends translate it, see to_expression and to_sql) and as a
+# predicate over the metadata kept in the lexical index.
+#
+# A filters dict may contain:
+#   types       modalities: "pdf", "text", "audio", "image", "video"
+#               (or the stored types "video_frame" / "video_audio")
+#   sources     file names
+#   page_range  (first, last) page, inclusive
+#   time_range  (from, to) in seconds or "mm:ss" / "hh:mm:ss"; either end may be None
+#   quotas      {modality: max results}, e.g. {"image": 1}
+
+MODALITY_TYPES = {
+    "pdf": ["pdf"],
+    "text": ["text"],
+    "audio": ["audio"],
+    "image": ["image"],
+    "video": ["video_frame", "video_audio"],
+    "video_frame": ["video_frame"],
+    "video_audio": ["video_audio"],
+}
+
+
+def parse_seconds(value):
+    """
+    Seconds from a number or a "mm:ss" / "hh:mm:ss" string (None passes through).
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    seconds = 0.0
+    for part in str(value).strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def normalize(filters):
+    """
+    Validated copy of `filters` with modalities expanded to stored types and
+    times in seconds. Returns None when nothing is filtered.
+    """
+    if not filters:
+        return None
+    result = {}
+    if filters.get("types"):
+        types = []
+        for modality in filters["types"]:
+            if modality not in MODALITY_TYPES:
+                raise ValueError(f"Unknown modality {modality!r}; expected one of {sorted(MODALITY_TYPES)}")
+            types.extend(t for t in MODALITY_TYPES[modality] if t not in types)
+        result["types"] = sorted(types)
+    if filters.get("sources"):
+        result["sources"] = sorted(set(filters["sources"]))
+    if filters.get("page_range"):
+        first, last = filters["page_range"]
+        result["page_range"] = [first, last]
+    if filters.get("time_range"):
+        start, end = (parse_seconds(v) for v in filters["time_range"])
+        if start is not None or end is not None:
+            result["time_range"] = [start, end]
+    if filters.get("quotas"):
+        quotas = {}
+        for modality, limit in filters["quotas"].items():
+            if modality not in MODALITY_TYPES:
+                raise ValueError(f"Unknown modality {modality!r} in quotas")
+            quotas[modality] = int(limit)
+        result["quotas"] = quotas
+    return result or None
+
+
+def cache_scope(filters):
+    """
+    Stable string identifying a normalized filter set (for cache keys).
+    """
+    return json.dumps(filters, sort_keys=True) if filters else ""
+
+
+def to_where(filters):
+    """
+    Chroma `where` clause for normalized filters, or None. Quotas are applied
+    after ranking and are not part of the clause.
+    """
+    if not filters:
+        return None
+    clauses = []
+    if "types" in filters:
+        clauses.append({"type": {"$in": filters["types"]}})
+    if "sources" in filters:
+        clauses.append({"source": {"$in": filters["sources"]}})
+    if "page_range" in filters:
+        first, last = filters["page_range"]
+        if first is not None:
+            clauses.append({"page": {"$gte": first}})
+        if last is not None:
+            clauses.append({"page": {"$lte": last}})
+    if "time_range" in filters:
+        # Segments overlapping the window (a segment ending exactly at its
+        # start does not count; a zero-length frame inside it does)
+        start, end = filters["time_range"]
+        if start is not None:
+            clauses.append({"$or": [{"end": {"$gt": start}}, {"start": {"$gte": start}}]})
+        if end is not None:
+            clauses.append({"start": {"$lt": end}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+_EXPRESSION_OPERATORS = {"$eq": "==", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def to_expression(where):
+    """
+    A Chroma-style `where` clause as a boolean expression over metadata
+    fields (Milvus filter syntax), e.g. 'type in ["pdf"] and page >= 2'.
+    """
+    if not where:
+        return ""
+    parts = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            joiner = " and " if key == "$and" else " or "
+            parts.append("(" + joiner.join(f"({to_expression(c)})" for c in condition) + ")")
+            continue
+        if not _FIELD_NAME.match(key):
+            raise ValueError(f"Unsupported metadata field name {key!r}")
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in ("$in", "$nin"):
+                values = ", ".join(json.dumps(v, ensure_ascii=False) for v in value)
+                parts.append(f"{key} {'in' if op == '$in' else 'not in'} [{values}]")
+            elif op in _EXPRESSION_OPERATORS:
+                parts.append(f"{key} {_EXPRESSION_OPERATORS[op]} {json.dumps(value, ensure_ascii=False)}")
+            else:
+                raise ValueError(f"Unsupported where operator {op!r}")
+    return " and ".join(parts)
+
+
+_SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def to_sql(where, column="metadata"):
+    """
+    A Chroma-style `where` clause as an SQLite condition over a JSON metadata
+    column. Returns (clause, params).
+    """
+    if not where:
+        return "1", []
+    parts, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            clauses = [to_sql(c, column) for c in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            parts.append("(" + joiner.join(f"({clause})" for clause, _ in clauses) + ")")
+            params.extend(p for _, clause_params in clauses for p in clause_params)
+            continue
+        if not _FIELD_NAME.match(key):
+            raise ValueError(f"Unsupported metadata field name {key!r}")
+        field = f"json_extract({column}, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in ("$in", "$nin"):
+                values = list(value)
+                if not values:
+                    parts.append("0" if op == "$in" else "1")
+                    continue
+                placeholders = ",".join("?" * len(values))
+                parts.append(f"{field} {'IN' if op == '$in' else 'NOT IN'} ({placeholders})")
+                params.extend(values)
+            elif op in _SQL_OPERATORS:
+                parts.append(f"{field} {_SQL_OPERATORS[op]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported where operator {op!r}")
+    return " AND ".join(parts), params
+
+
+def matches(metadata, filters):
+    """
+    Same semantics as to_where(), evaluated on a metadata dict.
+    """
+    if not filters:
+        return True
+    if "types" in filters and metadata.get("type") not in filters["types"]:
+        return False
+    if "sources" in filters and metadata.get("source") not in filters["sources"]:
+        return False
+    if "page_range" in filters:
+        page = metadata.get("page")
+        first, last = filters["page_range"]
+        if page is None or (first is not None and page < first) or (last is not None and page > last):
+            return False
+    if "time_range" in filters:
+        start, end = filters["time_range"]
+        if metadata.get("start") is None or metadata.get("end") is None:
+            return False
+        if start is not None and not (metadata["end"] > start or metadata["start"] >= start):
+            return False
+        if end is not None and not metadata["start"] < end:
+            return False
+    return True
+
+
+def exhausted_types(docs, quotas):
+    """
+    Stored types whose modality quota is already used up by `docs`.
+    """
+    types = set()
+    for modality, limit in (quotas or {}).items():
+        count = sum(1 for doc in docs if doc.metadata.get("type") in MODALITY_TYPES[modality])
+        if count >= limit:
+            types.update(MODALITY_TYPES[modality])
+    return sorted(types)
+
+
+def exclude_types(where, types):
+    """
+    `where` narrowed to chunks whose type is not in `types`.
+    """
+    clause = {"type": {"$nin": types}}
+    if where is None:
+        return clause
+    return {"$and": (where["$and"] if "$and" in where else [where]) + [clause]}
+
+
+def apply_quotas(docs, quotas, k):
+    """
+    First `k` of the ranked `docs`, keeping at most quotas[modality] per modality.
+    """
+    if not quotas:
+        return docs[:k]
+    counts = {modality: 0 for modality in quotas}
+    selected = []
+    seen = set()
+    for doc in docs:
+        key = id(doc) if doc.id is None else doc.id
+        if key in seen:
+            continue
+        seen.add(key)
+        doc_type = doc.metadata.get("type")
+        limited = [m for m in quotas if doc_type in MODALITY_TYPES[m]]
+        if any(counts[m] >= quotas[m] for m in limited):
+            continue
+        for m in limited:
+            counts[m] += 1
+        selected.append(doc)
+        if len(selected) >= k:
+            break
+    return selected
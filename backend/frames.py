@@ -0,0 +1,177 @@
+import os
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Keyframe sampling for process_video.
+# Frames between samples are skipped with cap.grab() (no colour conversion /
+# copy) or, for long gaps, by seeking, so we only fully decode the frames we
+# keep. With scene detection on, the video is probed every
+# FRAME_PROBE_INTERVAL_SEC and a frame is kept when it differs enough from
+# the last kept one, or when FRAME_INTERVAL_SEC has passed without a keep.
+
+FRAME_INTERVAL_SEC = float(os.getenv("FRAME_INTERVAL_SEC", "10"))
+FRAME_PROBE_INTERVAL_SEC = float(os.getenv("FRAME_PROBE_INTERVAL_SEC", "1"))
+SCENE_CHANGE_THRESHOLD = float(os.getenv("SCENE_CHANGE_THRESHOLD", "0.35"))
+SCENE_DETECTION = os.getenv("SCENE_DETECTION", "1") == "1"
+SEEK_MIN_GAP_SEC = 3.0  # gaps shorter than this are cheaper to grab() through
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "4"))
+# Frames whose 64-bit dHash is within this Hamming distance of the last kept
+# frame are dropped (negative disables near-duplicate suppression)
+FRAME_DEDUP_DISTANCE = int(os.getenv("FRAME_DEDUP_DISTANCE", "6"))
+
+
+class _FrameReader:
+    """
+    Positions a VideoCapture at increasing frame indices while decoding as
+    little as possible.
+    """
+
+    def __init__(self, cap, fps):
+        self.cap = cap
+        self.fps = fps
+        self.position = 0  # index of the next frame read() would return
+        self.can_seek = True
+
+    def read_at(self, index):
+        gap = index - self.position
+        if gap < 0:
+            return None
+        if self.can_seek and gap > self.fps * SEEK_MIN_GAP_SEC:
+            # OpenCV's FFmpeg backend seeks to the previous keyframe and decodes
+            # forward to the exact frame, which beats grabbing every frame in between
+            if self.cap.set(cv2.CAP_PROP_POS_FRAMES, index):
+                self.position = index
+                gap = 0
+            else:
+                self.can_seek = False
+
+        for _ in range(gap):
+            if not self.cap.grab():
+                return None
+            self.position += 1
+
+        success, frame = self.cap.read()
+        if not success:
+            return None
+        self.position += 1
+        return frame
+
+
+def _signature(frame):
+    small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (32, 32), interpolation=cv2.INTER_AREA)
+    hist = cv2.calcHist([small], [0], None, [32], [0, 256]).ravel()
+    return small.astype(np.float32) / 255.0, hist / max(hist.sum(), 1.0)
+
+
+def _scene_distance(a, b):
+    # Mix of pixel difference (layout changes) and histogram distance (lighting / content changes)
+    pixels = float(np.mean(np.abs(a[0] - b[0])))
+    histogram = 0.5 * float(np.abs(a[1] - b[1]).sum())
+    return max(pixels * 2.0, histogram)
+
+
+def sample_frames(file_path, interval_sec=None, scene_detection=None, threshold=None):
+    """
+    Yield (timestamp_sec, frame) for the frames worth analysing.
+    """
+    interval_sec = interval_sec or FRAME_INTERVAL_SEC
+    scene_detection = SCENE_DETECTION if scene_detection is None else scene_detection
+    threshold = SCENE_CHANGE_THRESHOLD if threshold is None else threshold
+
+    cap = cv2.VideoCapture(file_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        reader = _FrameReader(cap, fps)
+
+        step_sec = FRAME_PROBE_INTERVAL_SEC if scene_detection else interval_sec
+        step = max(1, int(round(fps * step_sec)))
+
+        last_kept_sig = None
+        last_kept_index = None
+        index = 0
+        while total <= 0 or index < total:
+            frame = reader.read_at(index)
+            if frame is None:
+                break
+
+            keep = True
+            if scene_detection:
+                sig = _signature(frame)
+                if last_kept_sig is not None:
+                    elapsed = (index - last_kept_index) / fps
+                    keep = elapsed >= interval_sec or _scene_distance(sig, last_kept_sig) >= threshold
+                if keep:
+                    last_kept_sig = sig
+
+            if keep:
+                last_kept_index = index
+                yield index / fps, frame
+            index += step
+    finally:
+        cap.release()
+
+
+def dhash(frame, size=8):
+    """
+    64-bit difference hash: compare horizontally adjacent pixels of a
+    (size+1) x size grayscale thumbnail.
+    """
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def dedupe_frames(samples, max_distance=None):
+    """
+    Collapse runs of near-identical frames.
+    Takes (timestamp_sec, frame) pairs and yields (start_sec, end_sec, frame)
+    where `frame` is the first frame of the run and end_sec is the timestamp of
+    the last near-duplicate folded into it. A run is only emitted once the next
+    distinct frame (or the end of the video) is seen.
+    """
+    max_distance = FRAME_DEDUP_DISTANCE if max_distance is None else max_distance
+    kept = None  # [start, end, frame, hash]
+    dropped = 0
+    for timestamp_sec, frame in samples:
+        if max_distance < 0:
+            yield timestamp_sec, timestamp_sec, frame
+            continue
+
+        frame_hash = dhash(frame)
+        if kept is not None and hamming(frame_hash, kept[3]) <= max_distance:
+            kept[1] = timestamp_sec
+            dropped += 1
+            continue
+
+        if kept is not None:
+            yield kept[0], kept[1], kept[2]
+        kept = [timestamp_sec, timestamp_sec, frame, frame_hash]
+
+    if kept is not None:
+        yield kept[0], kept[1], kept[2]
+    if dropped:
+        print(f"Dropped {dropped} near-duplicate frame(s)")
+
+
+def map_bounded(fn, items, max_in_flight=None):
+    """
+    Apply `fn` to a lazily produced sequence on a thread pool with at most
+    `max_in_flight` calls outstanding. Yields (item, result) in input order.
+    """
+    max_in_flight = max_in_flight or VISION_CONCURRENCY
+    pending = []
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for item in items:
+            pending.append((item, executor.submit(fn, item)))
+            if len(pending) >= max_in_flight:
+                head, future = pending.pop(0)
+                yield head, future.result()
+        for item, future in pending:
+            yield item, future.result()
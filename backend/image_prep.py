@@ -0,0 +1,109 @@
+import io
+import os
+import threading
+from PIL import Image, ImageOps, ImageStat
+
+# Image pre-processing before vision calls.
+# Images (uploads and video frames) are decoded once, skipped if they carry
+# almost no information (blank / near-uniform), downsized so the longest edge
+# is at most IMAGE_MAX_EDGE and re-encoded with a MIME type that matches the
+# bytes actually sent. GPT-4o downsamples large images anyway, so the extra
+# pixels only cost upload bytes and latency.
+
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1536"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Grayscale standard deviation (0-255) below which an image is treated as blank
+IMAGE_MIN_STDDEV = float(os.getenv("IMAGE_MIN_STDDEV", "3.0"))
+
+_PASSTHROUGH_MIME = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    return stats
+
+
+def is_low_information(image, min_stddev=None):
+    min_stddev = IMAGE_MIN_STDDEV if min_stddev is None else min_stddev
+    thumb = image.convert("L")
+    thumb.thumbnail((256, 256))
+    return ImageStat.Stat(thumb).stddev[0] < min_stddev
+
+
+def _encode(image, original_bytes=None, original_format=None):
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    buffer = io.BytesIO()
+    if has_alpha:
+        image.convert("RGBA").save(buffer, format="PNG", optimize=True)
+        encoded, mime = buffer.getvalue(), "image/png"
+    else:
+        image.convert("RGB").save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        encoded, mime = buffer.getvalue(), "image/jpeg"
+
+    # Never make an already-small, already-supported file bigger
+    if original_bytes is not None and original_format in _PASSTHROUGH_MIME and len(original_bytes) <= len(encoded):
+        return original_bytes, _PASSTHROUGH_MIME[original_format]
+    return encoded, mime
+
+
+def prepare_image(image, original_bytes=None, original_format=None, max_edge=None):
+    """
+    Downsize and re-encode a decoded PIL image.
+    Returns (bytes, mime_type), or None if the image is near-uniform.
+    """
+    max_edge = max_edge or IMAGE_MAX_EDGE
+    # Byte savings are only measurable against an encoded original
+    bytes_in = len(original_bytes) if original_bytes is not None else 0
+
+    if is_low_information(image):
+        _record(images=1, skipped=1, bytes_in=bytes_in)
+        return None
+
+    resized = max(image.size) > max_edge
+    if resized:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        original_bytes = None  # the original no longer matches what we send
+
+    encoded, mime = _encode(image, original_bytes, original_format)
+    _record(images=1, bytes_in=bytes_in, bytes_out=len(encoded) if bytes_in else 0)
+    return encoded, mime
+
+
+def prepare_image_bytes(image_bytes, max_edge=None):
+    """
+    Decode an encoded image file once and prepare it for the vision model.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    original_format = image.format
+    if getattr(image, "is_animated", False):
+        image.seek(0)  # only the first frame of an animated GIF/WebP is analysed
+        original_format = None
+    if image.getexif().get(0x0112, 1) != 1:
+        # Rotate per EXIF orientation; the original bytes can no longer be reused
+        image = ImageOps.exif_transpose(image)
+        original_format = None
+    return prepare_image(image, image_bytes, original_format, max_edge)
+
+
+def prepare_frame(frame, max_edge=None):
+    """
+    Prepare a BGR video frame (NumPy array from OpenCV) for the vision model.
+    """
+    image = Image.fromarray(frame[:, :, ::-1])
+    # Frames used to be sent as full-size JPEGs (cv2.imwrite's quality 95);
+    # that encoding is the baseline the bytes-saved metric is measured against
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95)
+    return prepare_image(image, buffer.getvalue(), "JPEG", max_edge)
@@ -8,211 +8,306 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from openai import OpenAI
 import traceback
-import cv2  # For video frame extraction
-from moviepy.editor import VideoFileClip # For audio extraction
-
-def process_pdf(file_path, file_name):
-    try:
-        loader = PyPDFLoader(file_path)
-        pages = loader.load()
-        docs = []
-        for i, page in enumerate(pages):
-            docs.append(Document(
-                page_content=page.page_content,
-                metadata={
-                    "source": file_name,
-                    "type": "pdf",
-                    "page": i + 1,
-                    "citation_ref": f"{file_name} Page {i+1}",
-                    "media_url": f"/static/{file_name}"
-                }
-            ))
-        return docs
-    except Exception as e:
-        print(f"Error processing PDF {file_name}: {e}")
-        return []
-
-def process_audio(file_path, file_name):
-    try:
-        # Using OpenAI Whisper API for best results
-        if not os.getenv("OPENAI_API_KEY"):
-             raise ValueError("OPENAI_API_KEY not set for Audio Processing")
-
-        client = OpenAI()
-
-        with open(file_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="verbose_json",
-                timestamp_granularities=["segment"]
-            )
-
-        docs = []
-        for segment in transcript.segments:
-            start_time = segment.start
-            end_time = segment.end
-            text = segment.text
-
-            minutes = int(start_time // 60)
-            seconds = int(start_time % 60)
-            timestamp_str = f"{minutes:02d}:{seconds:02d}"
-
-            docs.append(Document(
-                page_content=text,
-                metadata={
-                    "source": file_name,
-                    "type": "audio",
-                    "timestamp": timestamp_str,
-                    "start": start_time,
-                    "end": end_time,
-                    "citation_ref": f"{file_name} at {timestamp_str}",
-                    "media_url": f"/static/{file_name}"
-                }
-            ))
-        return docs
-    except Exception as e:
-        print(f"Error processing Audio {file_name}: {e}")
-        return []
-
-def process_image(file_path, file_name):
-    try:
-        if not os.getenv("OPENAI_API_KEY"):
-             raise ValueError("OPENAI_API_KEY not set for Image Processing")
-
-        client = ChatOpenAI(model="gpt-4o", max_tokens=1000)
+from backend import resources, artifacts
+from backend.artifacts import extract_cached
+from backend.chunking import chunk_documents, chunk_text_stream, occurrence
+from backend.frames import sample_frames, dedupe_frames, map_bounded
+from backend.image_prep import prepare_image_bytes, prepare_frame
+from backend.telemetry import span, traced_iter
+from utils.media_stream import iter_audio_windows, pcm_to_wav
+
+AUDIO_WINDOW_SEC = int(os.getenv("AUDIO_WINDOW_SEC", "60"))
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+
+# Bump an extractor's version when its output changes, so stored artifacts
+# from the old version are ignored and the file is extracted again
+EXTRACTOR_VERSIONS = {"pdf": 1, "text": 1, "audio": 1, "image": 1, "video": 1}
+
+def _format_timestamp(seconds):
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+def _extract_pdf(file_path, file_name, failures):
+    loader = PyPDFLoader(file_path)
+    for i, page in enumerate(loader.lazy_load()):
+        yield Document(
+            page_content=page.page_content,
+            metadata={
+                "source": file_name,
+                "type": "pdf",
+                "page": i + 1,
+                "citation_ref": f"{file_name} Page {i+1}",
+                "media_url": f"/static/{file_name}"
+            }
+        )
 
-        with open(file_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
+def process_pdf(file_path, file_name, content_hash=None):
+    """
+    Lazily yields token-bounded chunks of the (stored) page text.
+    Every chunk keeps its page's citation_ref.
+    """
+    pages = extract_cached(file_path, file_name, "pdf", EXTRACTOR_VERSIONS["pdf"], _extract_pdf, content_hash)
+    yield from traced_iter("chunk.pdf", chunk_documents(pages))
 
-        message = HumanMessage(
-            content=[
-                {"type": "text", "text": "Analyze this image in detail. If it's a chart or diagram, extract all data points and trends. If it's a document, read the text. Provide a comprehensive description."},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_string}"}}
-            ]
+def process_text(file_path, file_name, record_artifact=True, content_hash=None):
+    """
+    Lazily yields token-bounded chunks of a .txt/.md file without reading it
+    into memory as one string. Citations point at the chunk's character range.
+    Read errors propagate to the consumer: a stream that ended early would make
+    add_documents delete the chunks after the failure point as stale.
+    """
+    if record_artifact:
+        # The file itself is the extraction output; remember where it lives
+        artifacts.save(content_hash or artifacts.file_hash(file_path), "text", EXTRACTOR_VERSIONS["text"],
+                       file_name, [], extra={"path": os.path.abspath(file_path)})
+
+    counts = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        chunks = traced_iter("extract.text", chunk_text_stream(f), bytes=os.path.getsize(file_path))
+        for text, start, end in chunks:
+            metadata = {
+                "source": file_name,
+                "type": "text",
+                "offset_start": start,
+                "offset_end": end,
+                "citation_ref": f"{file_name} chars {start}-{end}",
+                "media_url": f"/static/{file_name}"
+            }
+            repeat = occurrence(counts, text)
+            if repeat:
+                metadata["occurrence"] = repeat
+            yield Document(page_content=text, metadata=metadata)
+
+def _upload_size(audio_file):
+    data = audio_file[1] if isinstance(audio_file, tuple) else audio_file
+    if hasattr(data, "getbuffer"):
+        return data.getbuffer().nbytes
+    return os.fstat(data.fileno()).st_size
+
+def _transcribe(audio_file):
+    """
+    Whisper segments for an open audio file (or a (filename, file) tuple).
+    """
+    client = resources.get("openai_client")
+    with span("extract.whisper", bytes=_upload_size(audio_file)) as s:
+        transcript = client.audio.transcriptions.create(
+            model="whisper-1",
+            file=audio_file,
+            response_format="verbose_json",
+            timestamp_granularities=["segment"]
         )
+        s["segments"] = len(transcript.segments or [])
+    return transcript.segments
 
-        response = client.invoke([message])
-        description = response.content
+def _segment_docs(segments, file_name, doc_type="audio", label=None, offset=0.0):
+    docs = []
+    for segment in segments:
+        start_time = segment.start + offset
+        end_time = segment.end + offset
+        text = segment.text
 
-        return [Document(
-            page_content=description,
+        timestamp_str = _format_timestamp(start_time)
+
+        docs.append(Document(
+            page_content=text,
             metadata={
                 "source": file_name,
-                "type": "image",
-                "citation_ref": f"{file_name} (Image Analysis)",
+                "type": doc_type,
+                "timestamp": timestamp_str,
+                "start": start_time,
+                "end": end_time,
+                "citation_ref": f"{label or file_name} at {timestamp_str}",
                 "media_url": f"/static/{file_name}"
             }
-        )]
-    except Exception as e:
-        print(f"Error processing Image {file_name}: {e}")
-        return []
+        ))
+    return docs
+
+def _extract_audio(file_path, file_name, failures):
+    # Using OpenAI Whisper API for best results
+    if not os.getenv("OPENAI_API_KEY"):
+         raise ValueError("OPENAI_API_KEY not set for Audio Processing")
+
+    with open(file_path, "rb") as audio_file:
+        segments = _transcribe(audio_file)
+
+    return _segment_docs(segments, file_name)
+
+def process_audio(file_path, file_name, content_hash=None):
+    return extract_cached(file_path, file_name, "audio", EXTRACTOR_VERSIONS["audio"], _extract_audio, content_hash)
 
-def process_video(file_path, file_name):
+def _build_vision_llm():
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY not set for Image Processing")
+    return ChatOpenAI(model="gpt-4o", max_tokens=1000, http_client=resources.get("http_client"))
+
+def _build_openai_client():
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY not set for Audio Processing")
+    return OpenAI(http_client=resources.get("http_client"))
+
+resources.register("vision_llm", _build_vision_llm)
+resources.register("openai_client", _build_openai_client)
+
+def analyze_image(image_bytes, mime_type="image/jpeg"):
     """
-    Process Video:
-    1. Extract Audio -> Transcribe (Whisper)
-    2. Extract Key Frames (e.g., every 10s) -> Analyze (GPT-4o)
+    Describe an in-memory image with GPT-4o.
     """
-    docs = []
+    encoded_string = base64.b64encode(image_bytes).decode("utf-8")
 
-    # 1. Audio Processing
-    try:
-        print(f"Extracting audio from {file_name}...")
-        clip = VideoFileClip(file_path)
+    message = HumanMessage(
+        content=[
+            {"type": "text", "text": "Analyze this image in detail. If it's a chart or diagram, extract all data points and trends. If it's a document, read the text. Provide a comprehensive description."},
+            {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded_string}"}}
+        ]
+    )
 
-        # Temp audio file
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_audio:
-            temp_audio_path = temp_audio.name
+    with span("extract.vision", bytes=len(image_bytes)):
+        response = resources.get("vision_llm").invoke([message])
+    return response.content
 
-        clip.audio.write_audiofile(temp_audio_path, verbose=False, logger=None)
+def _extract_image(file_path, file_name, failures):
+    with open(file_path, "rb") as image_file:
+        prepared = prepare_image_bytes(image_file.read())
 
-        # Transcribe
-        audio_docs = process_audio(temp_audio_path, file_name)
-        # Update metadata to reflect it's from video
-        for doc in audio_docs:
-            doc.metadata["type"] = "video_audio"
-            doc.metadata["citation_ref"] = f"{file_name} (Audio) at {doc.metadata.get('timestamp')}"
+    if prepared is None:
+        print(f"Skipping near-uniform image {file_name}")
+        return []
 
-        docs.extend(audio_docs)
-        os.remove(temp_audio_path)
+    description = analyze_image(*prepared)
 
-    except Exception as e:
-        print(f"Error extracting/processing audio from video {file_name}: {e}")
+    return [Document(
+        page_content=description,
+        metadata={
+            "source": file_name,
+            "type": "image",
+            "citation_ref": f"{file_name} (Image Analysis)",
+            "media_url": f"/static/{file_name}"
+        }
+    )]
 
-    # 2. Visual Processing (Sample frames)
-    try:
-        print(f"Extracting frames from {file_name}...")
-        cap = cv2.VideoCapture(file_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(fps * 10) # Every 10 seconds
+def process_image(file_path, file_name, content_hash=None):
+    return extract_cached(file_path, file_name, "image", EXTRACTOR_VERSIONS["image"], _extract_image, content_hash)
 
-        frame_count = 0
-        success = True
+def process_video(file_path, file_name, content_hash=None):
+    return extract_cached(file_path, file_name, "video", EXTRACTOR_VERSIONS["video"], _extract_video, content_hash)
 
-        while success:
-            success, frame = cap.read()
-            if not success:
-                break
+def _extract_video(file_path, file_name, failures):
+    """
+    Process Video:
+    1. Stream audio windows -> Transcribe (Whisper)
+    2. Sample key frames (scene changes, at least every 10s) -> Analyze (GPT-4o)
+    """
+    docs = []
 
-            if frame_count % frame_interval == 0:
-                # Save frame to temp
-                with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_frame:
-                    cv2.imwrite(temp_frame.name, frame)
-                    temp_frame_path = temp_frame.name
+    # 1. Audio Processing (streamed from the container in windows; early windows
+    #    are transcribed while ffmpeg is still decoding later ones)
+    try:
+        print(f"Extracting audio from {file_name}...")
 
-                # Process as image
-                image_docs = process_image(temp_frame_path, file_name)
+        def transcribe_window(window):
+            start_sec, end_sec, pcm = window
+            try:
+                return _transcribe((f"{start_sec:.0f}.wav", pcm_to_wav(pcm)))
+            except Exception as e:
+                print(f"Error transcribing {file_name} audio at {start_sec:.1f}s-{end_sec:.1f}s: {e}")
+                failures.append(e)
+                return []
 
-                # Update metadata
-                timestamp_sec = frame_count / fps
-                minutes = int(timestamp_sec // 60)
-                seconds = int(timestamp_sec % 60)
-                timestamp_str = f"{minutes:02d}:{seconds:02d}"
+        windows = traced_iter("extract.decode_audio", iter_audio_windows(file_path, AUDIO_WINDOW_SEC))
+        for (start_sec, _, _), segments in map_bounded(transcribe_window, windows, TRANSCRIBE_CONCURRENCY):
+            docs.extend(_segment_docs(segments, file_name, "video_audio", f"{file_name} (Audio)", offset=start_sec))
 
-                for doc in image_docs:
-                    doc.metadata["type"] = "video_frame"
-                    doc.metadata["timestamp"] = timestamp_str
-                    doc.metadata["citation_ref"] = f"{file_name} (Visual) at {timestamp_str}"
+    except Exception as e:
+        print(f"Error extracting/processing audio from video {file_name}: {e}")
+        failures.append(e)
 
-                docs.extend(image_docs)
-                os.remove(temp_frame_path)
+    # 2. Visual Processing (keyframes decoded selectively, analysed concurrently in memory)
+    try:
+        print(f"Extracting frames from {file_name}...")
 
-            frame_count += 1
+        def describe(sample):
+            start_sec, _, frame = sample
+            try:
+                prepared = prepare_frame(frame)
+                if prepared is None:
+                    return None  # blank / near-uniform frame
+                return analyze_image(*prepared)
+            except Exception as e:
+                print(f"Error analysing frame at {start_sec:.1f}s of {file_name}: {e}")
+                failures.append(e)
+                return None
+
+        # Near-identical consecutive frames are folded into one Document whose
+        # start/end span every timestamp they appeared at
+        samples = dedupe_frames(traced_iter("extract.decode_frames", sample_frames(file_path)))
+        for (start_sec, end_sec, _), description in map_bounded(describe, samples):
+            if description is None:
+                continue
+
+            timestamp_str = _format_timestamp(start_sec)
 
-        cap.release()
+            docs.append(Document(
+                page_content=description,
+                metadata={
+                    "source": file_name,
+                    "type": "video_frame",
+                    "timestamp": timestamp_str,
+                    "timestamp_end": _format_timestamp(end_sec),
+                    "start": start_sec,
+                    "end": end_sec,
+                    "citation_ref": f"{file_name} (Visual) at {timestamp_str}",
+                    "media_url": f"/static/{file_name}"
+                }
+            ))
 
     except Exception as e:
         print(f"Error processing video frames for {file_name}: {e}")
+        failures.append(e)
 
     return docs
 
-def process_file_from_path(file_path, file_name):
+def process_file_from_path(file_path, file_name, content_hash=None):
     """
     Process a file that is already saved on disk.
+    PDF and text files return generators, so chunks are produced lazily as
+    `add_documents` consumes them. Pass `content_hash` when it is already
+    known (uploads are hashed while they are received) to skip re-hashing.
     """
     try:
         suffix = os.path.splitext(file_name)[1].lower()
 
         if suffix == ".pdf":
-            return process_pdf(file_path, file_name)
+            return process_pdf(file_path, file_name, content_hash)
         elif suffix in [".mp3", ".wav", ".m4a", ".mpga", ".webm"]: # Pure Audio
-            return process_audio(file_path, file_name)
+            return process_audio(file_path, file_name, content_hash)
         elif suffix in [".jpg", ".jpeg", ".png", ".webp", ".gif"]:
-            return process_image(file_path, file_name)
+            return process_image(file_path, file_name, content_hash)
         elif suffix in [".mp4", ".mpeg", ".mov", ".avi"]: # Video
-            return process_video(file_path, file_name)
+            return process_video(file_path, file_name, content_hash)
         else:
             # Fallback for text files
             if suffix in [".txt", ".md"]:
-                 with open(file_path, "r", encoding="utf-8") as f:
-                     content = f.read()
-                 return [Document(page_content=content, metadata={"source": file_name, "citation_ref": file_name})]
+                return process_text(file_path, file_name, content_hash=content_hash)
             return []
     except Exception as e:
         print(f"Error in main processing loop for {file_name}: {e}")
         return []
 
+def documents_from_artifact(record):
+    """
+    Rebuild indexable Documents from a stored artifact record (see backend.reindex).
+    """
+    file_name = record["file_name"]
+    if record["extractor"] == "text":
+        if not os.path.exists(record["path"]):
+            print(f"Warning: Text source {record['path']} for {file_name} no longer exists")
+            return []
+        return process_text(record["path"], file_name, record_artifact=False)
+
+    docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in record["documents"]]
+    if record["extractor"] == "pdf":
+        return chunk_documents(docs)
+    return docs
+
 def ingest_file(file, file_name):
     """
     Deprecated: Use process_file_from_path instead.
@@ -224,6 +319,7 @@ def ingest_file(file, file_name):
         tmp_path = tmp.name
 
     try:
-        return process_file_from_path(tmp_path, file_name)
+        # Materialize lazy chunk generators before the temp file is removed
+        return list(process_file_from_path(tmp_path, file_name))
     finally:
         os.remove(tmp_path)
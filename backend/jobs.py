@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Background ingestion queue.
+# Uploads are recorded in SQLite and handed to a bounded thread pool, so Whisper,
+# GPT-4o and embedding work never runs on the FastAPI event loop. Jobs that were
+# queued or running when the process stopped are picked up again on start().
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "./backend/jobs.sqlite3")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+PROGRESS_EVERY = 25  # chunks between progress writes
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class _Stopped(Exception):
+    """Raised inside a running job when the queue is stopping."""
+
+
+class JobQueue:
+    def __init__(self, db_path=JOBS_DB_PATH, workers=INGEST_WORKERS):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " file_name TEXT NOT NULL,"
+            " file_path TEXT NOT NULL,"
+            " content_hash TEXT,"
+            " status TEXT NOT NULL,"
+            " stage TEXT,"
+            " chunks_processed INTEGER DEFAULT 0,"
+            " chunks_added INTEGER,"
+            " timings TEXT DEFAULT '{}',"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "content_hash" not in columns:
+            # Databases created before uploads were hashed
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs(content_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_file_path ON jobs(file_path)")
+        self._conn.commit()
+        self._workers = workers
+        self._executor = None
+        self._active = set()
+        self._stopping = False
+
+    def start(self):
+        """
+        Start the worker pool and resume jobs left over from a previous run.
+        """
+        with self._lock:
+            self._stopping = False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="ingest")
+            pending = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall() if row[0] not in self._active]
+        for job_id in pending:
+            self._dispatch(job_id)
+        if pending:
+            print(f"Resumed {len(pending)} ingestion job(s)")
+
+    def stop(self):
+        """
+        Stop accepting work and wait for running jobs to reach a stopping
+        point, so shared resources can be closed afterwards. Jobs that have
+        not started stay queued and interrupted ones stay running on disk;
+        both are resumed by start().
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._stopping = True
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            self._active.clear()  # cancelled jobs never reached _run
+
+    def submit(self, file_path, file_name, content_hash=None):
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, file_name, file_path, content_hash, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, file_name, file_path, content_hash, QUEUED, time.time())
+        )
+        self._dispatch(job_id)
+        return job_id
+
+    def _fetch(self, sql, params):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        job["timings"] = json.loads(job["timings"] or "{}")
+        return job
+
+    def get(self, job_id):
+        return self._fetch("SELECT * FROM jobs WHERE id = ?", (job_id,))
+
+    def find_by_hash(self, content_hash):
+        """
+        Most recent queued, running or finished job for this file content.
+        """
+        return self._fetch(
+            "SELECT * FROM jobs WHERE content_hash = ? AND status IN (?, ?, ?) ORDER BY created_at DESC LIMIT 1",
+            (content_hash, QUEUED, RUNNING, DONE)
+        )
+
+    def hash_of(self, file_path):
+        """
+        Content hash recorded by the most recent job for a stored file, or None.
+        """
+        job = self._fetch(
+            "SELECT * FROM jobs WHERE file_path = ? ORDER BY created_at DESC LIMIT 1", (file_path,)
+        )
+        return job["content_hash"] if job else None
+
+    def _dispatch(self, job_id):
+        with self._lock:
+            if self._executor is None or job_id in self._active:
+                return
+            self._active.add(job_id)
+            self._executor.submit(self._run, job_id)
+
+    def _execute(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def _update(self, job_id, **fields):
+        if "timings" in fields:
+            fields["timings"] = json.dumps(fields["timings"])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id):
+        from backend.ingest import process_file_from_path
+        from backend.vector_store import add_documents
+
+        job = self.get(job_id)
+        timings = {}
+        started = time.perf_counter()
+        try:
+            self._update(job_id, status=RUNNING, stage="extract", started_at=time.time(),
+                         chunks_processed=0, error=None)
+
+            extract_seconds = [0.0]
+            docs = process_file_from_path(job["file_path"], job["file_name"], job["content_hash"])
+            timings["extract"] = time.perf_counter() - started
+
+            def tracked(documents):
+                # Chunkers are lazy: time spent pulling the next chunk is extraction,
+                # the rest of add_documents is embedding + indexing.
+                iterator = iter(documents)
+                count = 0
+                while True:
+                    pulled = time.perf_counter()
+                    try:
+                        doc = next(iterator)
+                    except StopIteration:
+                        extract_seconds[0] += time.perf_counter() - pulled
+                        return
+                    extract_seconds[0] += time.perf_counter() - pulled
+                    if self._stopping:
+                        raise _Stopped()
+                    count += 1
+                    if count % PROGRESS_EVERY == 0:
+                        self._update(job_id, chunks_processed=count)
+                    yield doc
+
+            self._update(job_id, stage="index", timings=timings)
+            indexed = time.perf_counter()
+            count = add_documents(tracked(docs))
+            index_total = time.perf_counter() - indexed
+
+            timings["extract"] += extract_seconds[0]
+            timings["index"] = index_total - extract_seconds[0]
+            timings["total"] = time.perf_counter() - started
+            self._update(job_id, status=DONE, stage=None, chunks_processed=count, chunks_added=count,
+                         timings=timings, finished_at=time.time())
+        except Exception as e:
+            if self._stopping:
+                # Left running on disk: start() picks it up again
+                print(f"Ingestion job {job_id} interrupted by shutdown")
+                return
+            traceback.print_exc()
+            timings["total"] = time.perf_counter() - started
+            self._update(job_id, status=FAILED, error=str(e), timings=timings, finished_at=time.time())
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
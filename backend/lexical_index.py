@@ -0,0 +1,217 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+
+# BM25 inverted index kept next to the Chroma collection.
+# Postings live in memory (term -> {doc: tf}) and are mirrored to SQLite so the
+# index survives restarts and is updated incrementally by add_documents. For
+# querying, each term's postings are frozen into NumPy arrays ordered by BM25
+# impact, so a query scores at most MAX_POSTINGS_PER_TERM entries per term
+# regardless of corpus size. Rare, exact tokens (bug IDs, model numbers) have
+# short postings and resolve in microseconds.
+
+K1 = 1.2
+B = 0.75
+MAX_POSTINGS_PER_TERM = 2000
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his how i if in into is it its
+me my no not of on or our she so than that the their them then there these they this
+to was we were what when where which who why will with you your do does did can could
+""".split())
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens. Compound tokens such as "sm-g973f" or "1600002.1"
+    are indexed whole and by their parts, so both exact and partial lookups match.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[._\-/]", token) if part and part not in _STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id TEXT PRIMARY KEY,"
+            " length INTEGER NOT NULL,"
+            " terms TEXT NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        self._ids = []  # slot -> doc id (None when freed)
+        self._slots = {}  # doc id -> slot
+        self._free = []
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._metadata = []  # slot -> metadata dict
+        self._postings = {}  # term -> {slot: tf}
+        self._frozen = {}  # term -> (slots, impacts) sorted by impact
+        self._total_length = 0
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute("SELECT id, length, terms, metadata FROM docs").fetchall()
+        self._lengths = np.zeros(max(len(rows), 16), dtype=np.float32)
+        for doc_id, length, terms, metadata in rows:
+            self._insert(doc_id, length, json.loads(terms), json.loads(metadata))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._slots
+
+    def _insert(self, doc_id, length, term_freqs, metadata):
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = doc_id
+            self._metadata[slot] = metadata
+        else:
+            slot = len(self._ids)
+            self._ids.append(doc_id)
+            self._metadata.append(metadata)
+            if slot >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros(max(16, len(self._lengths)), dtype=np.float32)])
+        self._slots[doc_id] = slot
+        self._lengths[slot] = length
+        self._total_length += length
+        for term, tf in term_freqs.items():
+            self._postings.setdefault(term, {})[slot] = tf
+            self._frozen.pop(term, None)
+
+    def _delete(self, doc_id, term_freqs):
+        slot = self._slots.pop(doc_id)
+        self._total_length -= int(self._lengths[slot])
+        self._lengths[slot] = 0
+        self._ids[slot] = None
+        self._metadata[slot] = None
+        self._free.append(slot)
+        for term in term_freqs:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slot, None)
+                if not postings:
+                    del self._postings[term]
+            self._frozen.pop(term, None)
+
+    def add(self, items):
+        """
+        Index (doc_id, text, metadata) triples, replacing documents with the same ID.
+        """
+        rows = []
+        with self._lock:
+            for doc_id, text, metadata in items:
+                tokens = tokenize(text)
+                term_freqs = {}
+                for token in tokens:
+                    term_freqs[token] = term_freqs.get(token, 0) + 1
+                if doc_id in self._slots:
+                    self._delete(doc_id, self._terms_of(doc_id))
+                self._insert(doc_id, len(tokens), term_freqs, metadata)
+                rows.append((doc_id, len(tokens), json.dumps(term_freqs), json.dumps(metadata)))
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO docs (id, length, terms, metadata) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.commit()
+
+    def _terms_of(self, doc_id):
+        row = self._conn.execute("SELECT terms FROM docs WHERE id = ?", (doc_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def remove(self, doc_ids):
+        with self._lock:
+            removed = [doc_id for doc_id in doc_ids if doc_id in self._slots]
+            for doc_id in removed:
+                self._delete(doc_id, self._terms_of(doc_id))
+            if removed:
+                self._conn.executemany("DELETE FROM docs WHERE id = ?", [(doc_id,) for doc_id in removed])
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+            self._ids, self._slots, self._free, self._metadata = [], {}, [], []
+            self._lengths = np.zeros(16, dtype=np.float32)
+            self._postings, self._frozen = {}, {}
+            self._total_length = 0
+
+    def _freeze(self, term, avg_length):
+        postings = self._postings[term]
+        slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+        tfs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+        norm = K1 * (1 - B + B * self._lengths[slots] / avg_length)
+        impacts = tfs * (K1 + 1) / (tfs + norm)
+        order = np.argsort(-impacts)[:MAX_POSTINGS_PER_TERM]
+        frozen = (slots[order], impacts[order], avg_length)
+        self._frozen[term] = frozen
+        return frozen
+
+    def search(self, query, k=10, predicate=None):
+        """
+        Return [(doc_id, score)] for the top-k BM25 matches.
+        `predicate(metadata) -> bool` optionally filters candidates.
+        """
+        with self._lock:
+            n_docs = len(self._slots)
+            if not n_docs:
+                return []
+            avg_length = max(self._total_length / n_docs, 1.0)
+
+            slot_parts, score_parts = [], []
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                frozen = self._frozen.get(term)
+                # Impacts depend on the average length; refresh when it drifts by >10%
+                if frozen is None or abs(frozen[2] - avg_length) > 0.1 * avg_length:
+                    frozen = self._freeze(term, avg_length)
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                slot_parts.append(frozen[0])
+                score_parts.append(frozen[1] * idf)
+            if not slot_parts:
+                return []
+
+            slots = np.concatenate(slot_parts)
+            scores = np.concatenate(score_parts)
+            unique, inverse = np.unique(slots, return_inverse=True)
+            totals = np.bincount(inverse, weights=scores)
+
+            results = []
+            for i in np.argsort(-totals):
+                slot = int(unique[i])
+                if predicate is not None and not predicate(self._metadata[slot]):
+                    continue
+                results.append((self._ids[slot], float(totals[i])))
+                if len(results) >= k:
+                    break
+            return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,68 +1,269 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional, Union
 import uvicorn
 import os
-import shutil
-from backend.ingest import ingest_file
-from backend.rag import answer_query
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from backend.rag import answer_query, stream_answer, answer_batch
+from backend import resources
+from backend import filters as retrieval_filters
+from backend import telemetry, image_prep
+from backend.jobs import get_job_queue, DONE
+from backend.uploads import receive_upload, store_upload, discard, UploadError
+from backend.vector_store import count_chunks
 
-app = FastAPI(title="Multimodal RAG System")
+# Clients built at startup so the first /query does not pay for them
+WARM_UP_RESOURCES = ["embeddings", "vector_store", "lexical_index", "rag_chain"]
+
+@asynccontextmanager
+async def lifespan(app):
+    errors = resources.warm_up(WARM_UP_RESOURCES)
+    for name, error in errors.items():
+        print(f"Warning: Could not warm up {name}: {error}")
+    get_job_queue().start()
+    yield
+    # Let running jobs stop before the clients they use are closed
+    await run_in_threadpool(get_job_queue().stop)
+    resources.shutdown()
+
+app = FastAPI(title="Multimodal RAG System", lifespan=lifespan)
+
+def _cache_metrics():
+    """
+    Statistics the caches already keep, exposed on /metrics. Caches that
+    have not been built yet are left out rather than built by a scrape.
+    """
+    samples = []
+    if resources.is_loaded("embedding_cache"):
+        stats = resources.get("embedding_cache").stats()
+        samples += [
+            ("embedding_cache_lookups_total", "counter", "Embedding cache lookups.", {"result": "hit"}, stats["hits"]),
+            ("embedding_cache_lookups_total", "counter", "Embedding cache lookups.", {"result": "miss"}, stats["misses"]),
+            ("embedding_cache_evictions_total", "counter", "Embeddings evicted from the cache.", {}, stats["evictions"]),
+            ("embedding_cache_bytes", "gauge", "Bytes of cached embeddings.", {}, stats["bytes"]),
+        ]
+    if resources.is_loaded("answer_cache"):
+        stats = resources.get("answer_cache").stats()
+        samples += [
+            ("answer_cache_lookups_total", "counter", "Answer cache lookups.", {"result": "exact_hit"}, stats["exact_hits"]),
+            ("answer_cache_lookups_total", "counter", "Answer cache lookups.", {"result": "semantic_hit"}, stats["semantic_hits"]),
+            ("answer_cache_lookups_total", "counter", "Answer cache lookups.", {"result": "miss"}, stats["misses"]),
+            ("answer_cache_evictions_total", "counter", "Answers evicted from the cache.", {}, stats["evictions"]),
+            ("answer_cache_entries", "gauge", "Cached answers.", {}, stats["entries"]),
+        ]
+    stats = image_prep.get_stats()
+    samples += [
+        ("image_prep_images_total", "counter", "Images prepared for the vision model.", {}, stats["images"]),
+        ("image_prep_skipped_total", "counter", "Near-uniform images skipped.", {}, stats["skipped"]),
+        ("image_prep_bytes_total", "counter", "Encoded image bytes before and after preparation.", {"direction": "in"}, stats["bytes_in"]),
+        ("image_prep_bytes_total", "counter", "Encoded image bytes before and after preparation.", {"direction": "out"}, stats["bytes_out"]),
+    ]
+    return samples
+
+telemetry.register_collector("caches", _cache_metrics)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (/jobs/{job_id}), not the raw path, to bound cardinality
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    # Streamed responses are timed until their headers are sent
+    telemetry.observe("http_request_duration_seconds", time.perf_counter() - started,
+                      "HTTP request latency by route.", method=request.method, route=path,
+                      status=str(response.status_code))
+    return response
 
 # Setup static directory for serving media files
 UPLOAD_DIR = "backend/data_store"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/static", StaticFiles(directory=UPLOAD_DIR), name="static")
 
+class QueryFilters(BaseModel):
+    types: Optional[List[str]] = None  # pdf, text, audio, image, video
+    sources: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    time_from: Optional[Union[float, str]] = None  # seconds or "mm:ss"
+    time_to: Optional[Union[float, str]] = None
+    quotas: Optional[Dict[str, int]] = None  # max results per modality
+
 class QueryRequest(BaseModel):
     query: str
+    filters: Optional[QueryFilters] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    concurrency: Optional[int] = None
+    filters: Optional[QueryFilters] = None
+
+def _retrieval_filters(request):
+    """
+    Normalized filters for a request; malformed filters are a 400, not a 500.
+    """
+    f = request.filters
+    if f is None:
+        return None
+    try:
+        return retrieval_filters.normalize({
+            "types": f.types,
+            "sources": f.sources,
+            "page_range": (f.page_from, f.page_to) if f.page_from is not None or f.page_to is not None else None,
+            "time_range": (f.time_from, f.time_to) if f.time_from is not None or f.time_to is not None else None,
+            "quotas": f.quotas,
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[dict]
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    try:
-        # Save file persistently for frontend access
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+# Serializes the duplicate check with storing + queueing, so two concurrent
+# uploads of the same content are not both ingested
+_upload_lock = asyncio.Lock()
+
+def _previous_ingestion(content_hash):
+    """
+    Job that already ingested (or is ingesting) this exact content, if its
+    file and chunks are still there.
+    """
+    job = get_job_queue().find_by_hash(content_hash)
+    if job is None:
+        return None
+    if job["status"] == DONE and (not os.path.exists(job["file_path"]) or count_chunks(job["file_name"]) == 0):
+        return None  # removed since (e.g. by a reindex --reset); ingest again
+    return job
 
-        # Re-open file for ingestion (since pointer moved)
-        with open(file_path, "rb") as f:
-            # Create a mock object that behaves like UploadFile for the ingest function
-            # Or better, update ingest to take a path.
-            # For now, let's adapt ingest to take the path directly or handle it there.
-            # But `ingest_file` expects a file-like object or UploadFile.
-            # Let's modify `ingest_file` to accept the path, or just pass the path.
+async def _queue_upload(partial_path, file_name, content_hash, size):
+    previous = await run_in_threadpool(_previous_ingestion, content_hash)
+    if previous is not None:
+        discard(partial_path)
+        if previous["status"] == DONE:
+            message = f"{file_name} was already ingested as {previous['file_name']} ({previous['chunks_added']} chunks)"
+        else:
+            message = f"{file_name} is already being ingested as {previous['file_name']} (job {previous['id']})"
+        return JSONResponse(status_code=200, content={
+            "message": message,
+            "duplicate": True,
+            "job_id": previous["id"],
+            "status_url": f"/jobs/{previous['id']}",
+            "chunks": previous["chunks_added"],
+            "url": f"/static/{previous['file_name']}"
+        })
 
-            # Actually, looking at `ingest_file` in `ingest.py`, it copies content to a temp file.
-            # We can optimize this by passing the path we just saved.
+    # Name clashes are resolved with hashes recorded by earlier jobs: re-hashing
+    # a large existing file here would hold up every other upload
+    stored_name = await run_in_threadpool(store_upload, partial_path, UPLOAD_DIR, file_name, content_hash,
+                                          get_job_queue().hash_of)
 
-            from backend.ingest import process_file_from_path
-            docs = process_file_from_path(file_path, file.filename)
+    # Extraction + embedding run on the ingestion worker pool, not the event loop
+    job_id = get_job_queue().submit(os.path.join(UPLOAD_DIR, stored_name), stored_name, content_hash)
 
-        if not docs:
-            return {"message": "File processed but no content extracted (or unsupported type)."}
+    return {
+        "message": f"Queued {stored_name} for ingestion (job {job_id})",
+        "duplicate": False,
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "bytes": size,
+        "url": f"/static/{stored_name}"
+    }
 
-        # Add to vector store
-        from backend.vector_store import add_documents
-        count = add_documents(docs)
+@app.post("/upload", status_code=202)
+async def upload_file(request: Request):
+    """
+    Upload a file as multipart form field `file`. The body is streamed to disk
+    and hashed as it arrives; uploads over MAX_UPLOAD_MB are rejected with 413.
+    Content that was already ingested is not processed again (200, with
+    `duplicate: true` and the existing job). A different file with the name
+    of an existing one is stored under "<name>-<hash prefix>" instead of
+    replacing it.
+    """
+    try:
+        partial_path, file_name, content_hash, size = await receive_upload(request, UPLOAD_DIR)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        return {"message": f"Successfully ingested {file.filename}", "chunks_added": count, "url": f"/static/{file.filename}"}
+    try:
+        async with _upload_lock:
+            return await _queue_upload(partial_path, file_name, content_hash, size)
     except Exception as e:
+        discard(partial_path)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+# Plain `def` so FastAPI runs retrieval + generation in its threadpool
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
+def query_endpoint(request: QueryRequest):
+    filters = _retrieval_filters(request)
     try:
-        result = answer_query(request.query)
+        result = answer_query(request.query, filters=filters)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _ndjson_events(query, filters):
+    try:
+        for event in stream_answer(query, filters=filters):
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band
+        yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+@app.post("/query/stream")
+def query_stream_endpoint(request: QueryRequest):
+    """
+    Same as /query, streamed as newline-delimited JSON events:
+    `sources` right after retrieval, then `token`s, then `done` with timings.
+    """
+    filters = _retrieval_filters(request)
+    return StreamingResponse(_ndjson_events(request.query, filters), media_type="application/x-ndjson")
+
+def _ndjson_batch(request, filters):
+    try:
+        for result in answer_batch(request.queries, request.concurrency, filters):
+            yield json.dumps(result) + "\n"
+    except Exception as e:
+        yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+@app.post("/query/batch")
+def query_batch_endpoint(request: BatchQueryRequest):
+    """
+    Answer many queries in one request. One NDJSON line per query, written as
+    soon as that query is answered; match lines to inputs by `index`.
+    """
+    filters = _retrieval_filters(request)
+    return StreamingResponse(_ndjson_batch(request, filters), media_type="application/x-ndjson")
+
+@app.post("/admin/reload")
+def reload_resources():
+    """
+    Drop and rebuild the shared clients (e.g. after rotating OPENAI_API_KEY).
+    """
+    errors = resources.reload(WARM_UP_RESOURCES)
+    return {"reloaded": [name for name in WARM_UP_RESOURCES if name not in errors], "errors": errors}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Stage latencies, stage counters (tokens, bytes, cache hits) and cache
+    statistics in the Prometheus text format.
+    """
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 def read_root():
     return {"message": "Multimodal RAG Backend is running"}
@@ -1,8 +1,23 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from backend.vector_store import query_documents
+from backend.vector_store import query_documents, get_embeddings, get_corpus_version
+from backend.answer_cache import AnswerCache, normalize_query
+from backend.context_packer import pack_context
+from backend import filters as retrieval_filters
+from backend import resources
+from backend.telemetry import span, record
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+import time
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Cosine similarity above which two questions are treated as the same question
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+# Concurrent retrieval + generation workers for /query/batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
 
 # The "Judge" Logic
 JUDGE_SYSTEM_PROMPT = """
@@ -34,45 +49,211 @@ Context:
 User Query: {question}
 """
 
-def format_docs_with_metadata(docs):
-    formatted = []
-    for doc in docs:
-        meta = doc.metadata
-        ref = meta.get("citation_ref", "Unknown Source")
-        formatted.append(f"--- Document (Source: {ref}) ---\nContent: {doc.page_content}\n")
-    return "\n".join(formatted)
+def format_docs_with_metadata(docs, query=None, max_tokens=None):
+    """
+    Judge context for `docs`: de-duplicated and, if needed, trimmed to the
+    sentences most relevant to `query` so it fits `max_tokens`.
+    """
+    context, _ = pack_context(docs, query, max_tokens)
+    return context
 
-def get_rag_chain():
+def _build_llm():
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY not set. Cannot initialize GPT-4o.")
 
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
+    return ChatOpenAI(model="gpt-4o", temperature=0, http_client=resources.get("http_client"))
+
+def _build_rag_chain():
     prompt = ChatPromptTemplate.from_template(JUDGE_SYSTEM_PROMPT)
 
-    chain = prompt | llm | StrOutputParser()
+    chain = prompt | resources.get("llm") | StrOutputParser()
     return chain
 
-def answer_query(query):
-    # 1. Retrieve
-    docs = query_documents(query, k=5)
+def _build_answer_cache():
+    return AnswerCache(
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL,
+        similarity_threshold=ANSWER_CACHE_SIMILARITY,
+    )
+
+resources.register("llm", _build_llm)
+resources.register("rag_chain", _build_rag_chain)
+resources.register("answer_cache", _build_answer_cache)
+
+def get_rag_chain():
+    """
+    Shared Judge chain. Swap in a local stand-in LLM with
+    `resources.override("llm", ...)`; the chain is rebuilt on top of it.
+    """
+    return resources.get("rag_chain")
+
+def get_answer_cache_stats():
+    """
+    Hit/miss counters of the in-process answer cache.
+    """
+    return resources.get("answer_cache").stats()
+
+NO_DOCUMENTS_ANSWER = "I could not find any relevant documents in the knowledge base."
+
+def _elapsed_ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
+def stream_answer(query, embedding=None, filters=None):
+    """
+    Answer a query as a stream of events, so callers can show evidence before
+    GPT-4o has finished writing:
+
+        {"event": "sources", "sources": [...]}      right after retrieval
+        {"event": "token", "text": "..."}           as the answer is generated
+        {"event": "done", "answer": "...", "cached": bool, "timings": {...},
+         "context": {"tokens_in": ..., "tokens_out": ..., ...}}  # context only when generated
+
+    Timings are in milliseconds. The answer is cached only once the stream
+    has run to completion. Pass `embedding` if the query is already embedded;
+    `filters` scope retrieval (see backend/filters.py).
+    """
+    started = time.perf_counter()
+    filters = retrieval_filters.normalize(filters)
+    scope = retrieval_filters.cache_scope(filters)
+
+    # 0. Repeated or paraphrased question against an unchanged corpus?
+    cache = resources.get("answer_cache")
+    version = get_corpus_version()
+    with span("query.cache_lookup") as s:
+        cached = cache.get_exact(query, version, scope)
+        s["exact_hits"] = int(cached is not None)
+    query_embedding = embedding
+    if cached is None:
+        if query_embedding is None:
+            with span("query.embed"):
+                query_embedding = get_embeddings().embed_query(query)
+        with span("query.cache_lookup") as s:
+            cached = cache.get_similar(query_embedding, version, scope)
+            s["semantic_hits"] = int(cached is not None)
+    if cached is not None:
+        yield {"event": "sources", "sources": cached["sources"]}
+        yield {"event": "token", "text": cached["answer"]}
+        yield {"event": "done", "answer": cached["answer"], "cached": True,
+               "timings": {"retrieval_ms": _elapsed_ms(started), "total_ms": _elapsed_ms(started)}}
+        record("query", time.perf_counter() - started, cached_answers=1)
+        return
+
+    # 1. Retrieve (reusing the query embedding)
+    with span("query.retrieve") as s:
+        docs = query_documents(query, k=5, embedding=query_embedding, filters=filters)
+        s["documents"] = len(docs)
+    retrieval_ms = _elapsed_ms(started)
+
+    # 2. Sources go out before generation starts ("Transparent Reasoning")
+    sources_summary = [d.metadata for d in docs]
+    yield {"event": "sources", "sources": sources_summary}
 
     if not docs:
-        return {
-            "answer": "I could not find any relevant documents in the knowledge base.",
-            "sources": []
-        }
+        yield {"event": "token", "text": NO_DOCUMENTS_ANSWER}
+        yield {"event": "done", "answer": NO_DOCUMENTS_ANSWER, "cached": False,
+               "timings": {"retrieval_ms": retrieval_ms, "total_ms": _elapsed_ms(started)}}
+        record("query", time.perf_counter() - started, empty_results=1)
+        return
 
-    # 2. Format Context
-    context_str = format_docs_with_metadata(docs)
+    # 3. Format Context (within the token budget)
+    with span("query.pack_context") as s:
+        context_str, context_stats = pack_context(docs, query)
+        s.update(tokens_in=context_stats["tokens_in"], tokens_out=context_stats["tokens_out"],
+                 duplicates_removed=context_stats["duplicates_removed"])
 
-    # 3. Generate Answer
+    # 4. Generate Answer, token by token
     chain = get_rag_chain()
-    response = chain.invoke({"context": context_str, "question": query})
+    parts = []
+    first_token_ms = None
+    # Includes the time the consumer takes to accept each token
+    with span("query.generate") as s:
+        for text in chain.stream({"context": context_str, "question": query}):
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = _elapsed_ms(started)
+            parts.append(text)
+            yield {"event": "token", "text": text}
+        s["stream_chunks"] = len(parts)
+    response = "".join(parts)
+    total_ms = _elapsed_ms(started)
 
-    # 4. Return result + sources for frontend to show "Transparent Reasoning"
-    sources_summary = [d.metadata for d in docs]
+    cache.put(query, query_embedding, version, {"answer": response, "sources": sources_summary}, scope)
+    record("query", time.perf_counter() - started)
+    yield {"event": "done", "answer": response, "cached": False, "timings": {
+        "retrieval_ms": retrieval_ms,
+        "first_token_ms": first_token_ms,
+        "generation_ms": round(total_ms - retrieval_ms, 1),
+        "total_ms": total_ms,
+    }, "context": context_stats}
+
+def answer_query(query, embedding=None, filters=None):
+    """
+    Non-streaming variant of stream_answer: returns {"answer", "sources"}.
+    """
+    result = {"answer": "", "sources": []}
+    for event in stream_answer(query, embedding=embedding, filters=filters):
+        if event["event"] == "sources":
+            result["sources"] = event["sources"]
+        elif event["event"] == "done":
+            result["answer"] = event["answer"]
+    return result
+
+def _embed_queries(queries):
+    embeddings = get_embeddings()
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(queries)
+    return embeddings.embed_documents(queries)
 
-    return {
-        "answer": response,
-        "sources": sources_summary
-    }
+def answer_batch(queries, concurrency=None, filters=None):
+    """
+    Answer many queries at once. Yields {"index", "query", "answer", "sources"}
+    (or {"index", "query", "error"}) in completion order, not input order.
+
+    Cache misses are embedded with one batched call; retrieval and generation
+    then run on `concurrency` worker threads, which bounds the number of
+    in-flight GPT-4o calls. Duplicate questions are answered once.
+    `filters` apply to every query in the batch.
+    """
+    concurrency = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    cache = resources.get("answer_cache")
+    version = get_corpus_version()
+    filters = retrieval_filters.normalize(filters)
+    scope = retrieval_filters.cache_scope(filters)
+
+    # Group duplicate questions so each distinct one is answered once
+    groups = {}
+    for index, query in enumerate(queries):
+        groups.setdefault(normalize_query(query), []).append(index)
+
+    pending = []
+    for indices in groups.values():
+        query = queries[indices[0]]
+        cached = cache.get_exact(query, version, scope)
+        if cached is not None:
+            for index in indices:
+                yield {"index": index, "query": queries[index], **cached}
+        else:
+            pending.append((query, indices))
+    if not pending:
+        return
+
+    vectors = _embed_queries([query for query, _ in pending])
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {
+            executor.submit(answer_query, query, vector, filters): indices
+            for (query, indices), vector in zip(pending, vectors)
+        }
+        for future in as_completed(futures):
+            indices = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"error": str(e)}
+            for index in indices:
+                yield {"index": index, "query": queries[index], **result}
+    finally:
+        # Stop queued work if the consumer (e.g. a disconnected client) goes away
+        executor.shutdown(wait=False, cancel_futures=True)
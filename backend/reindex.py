@@ -0,0 +1,44 @@
+"""
+Rebuild the vector store from stored extraction artifacts.
+
+Usage:
+    python -m backend.reindex            # sync every source with its latest artifact
+    python -m backend.reindex --reset    # drop the collection first
+
+No Whisper or GPT-4o calls are made: transcripts and image/frame descriptions
+come from backend/artifact_store. Chunks whose text is unchanged are served
+from the embedding cache, so only re-chunked text reaches the embedder.
+"""
+import argparse
+import time
+from backend import artifacts
+from backend.ingest import documents_from_artifact
+from backend.vector_store import add_documents, reset_collection
+
+
+def reindex(reset=False):
+    if reset:
+        reset_collection()
+        print("Collection reset")
+
+    started = time.perf_counter()
+    sources = chunks = 0
+    for record in artifacts.iter_latest():
+        try:
+            count = add_documents(documents_from_artifact(record))
+        except Exception as e:
+            print(f"Error reindexing {record['file_name']}: {e}")
+            continue
+        sources += 1
+        chunks += count
+
+    elapsed = time.perf_counter() - started
+    print(f"Reindexed {sources} sources / {chunks} chunks in {elapsed:.1f}s")
+    return {"sources": sources, "chunks": chunks, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reset", action="store_true", help="Drop the collection before rebuilding it")
+    args = parser.parse_args()
+    reindex(reset=args.reset)
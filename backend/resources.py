@@ -0,0 +1,140 @@
+import threading
+
+# Process-wide registry of expensive clients (embedder, vector store, LLM, chains).
+# Each resource is built lazily by its registered factory the first time it is
+# requested and then shared by every caller, so HTTP connection pools and the
+# Chroma client are reused across requests instead of being rebuilt per call.
+
+_lock = threading.RLock()
+_factories = {}
+_resources = {}
+_dependents = {}  # name -> names of resources whose factory used it
+_building = threading.local()
+
+
+def register(name, factory):
+    """
+    Register (or replace) the factory used to build a resource.
+    Replacing a factory drops the instance already built from the old one, and
+    everything built on top of it, which is how local stand-in embedders / LLMs
+    are swapped in offline.
+    """
+    with _lock:
+        _factories[name] = factory
+        _invalidate(name)
+
+
+def override(name, instance):
+    """
+    Pin an already-built instance for a resource (e.g. a fake embedder in tests).
+    """
+    with _lock:
+        register(name, lambda: instance)
+        _resources[name] = instance
+
+
+def get(name):
+    """
+    Return the shared instance for `name`, creating it on first use.
+    """
+    stack = getattr(_building, "stack", None)
+    if stack:
+        with _lock:
+            _dependents.setdefault(name, set()).add(stack[-1])
+
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+
+    with _lock:
+        resource = _resources.get(name)
+        if resource is None:
+            if name not in _factories:
+                raise KeyError(f"No factory registered for resource '{name}'")
+            if stack is None:
+                stack = _building.stack = []
+            stack.append(name)
+            try:
+                resource = _factories[name]()
+            finally:
+                stack.pop()
+            _resources[name] = resource
+        return resource
+
+
+def is_loaded(name):
+    return name in _resources
+
+
+def warm_up(names=None):
+    """
+    Eagerly build resources so the first request does not pay the setup cost.
+    Returns a dict of name -> error message for resources that failed to load.
+    """
+    errors = {}
+    for name in names or list(_factories):
+        try:
+            get(name)
+        except Exception as e:
+            errors[name] = str(e)
+    return errors
+
+
+def shutdown():
+    """
+    Close and drop every built resource. Factories stay registered, so the
+    next `get` transparently rebuilds them.
+    """
+    with _lock:
+        built = list(_resources.values())
+        _resources.clear()
+        _dependents.clear()
+    for resource in reversed(built):
+        _close(resource)
+
+
+def drop(name):
+    """
+    Close one resource (and everything built on top of it); it is rebuilt on
+    next use.
+    """
+    with _lock:
+        _invalidate(name)
+
+
+def reload(names=None):
+    """
+    Rebuild resources (e.g. after an API key or configuration change).
+    """
+    shutdown()
+    return warm_up(names)
+
+
+def _invalidate(name):
+    _close(_resources.pop(name, None))
+    for dependent in _dependents.pop(name, ()):
+        _invalidate(dependent)
+
+
+def _close(resource):
+    if resource is None:
+        return
+    closer = getattr(resource, "close", None)
+    if callable(closer):
+        try:
+            closer()
+        except Exception as e:
+            print(f"Warning: Could not close resource {type(resource).__name__}: {e}")
+
+
+def _build_http_client():
+    import httpx
+
+    # One pooled, keep-alive HTTP client shared by the OpenAI embedder and LLM.
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+
+register("http_client", _build_http_client)
@@ -0,0 +1,215 @@
+import bisect
+import os
+import threading
+import time
+
+# Lightweight in-process instrumentation.
+# Pipeline stages are wrapped in spans; each span feeds a latency histogram
+# and per-stage counters (calls, errors and whatever quantities the stage
+# reports, e.g. tokens, bytes or cache hits). Nothing is exported per event:
+# render() formats the aggregates in the Prometheus text format when /metrics
+# is scraped. A span costs two perf_counter() calls and one short lock, so
+# instrumentation stays on in production (set TELEMETRY=0 to disable it).
+#
+#     with span("query.retrieve") as s:
+#         docs = search(...)
+#         s["documents"] = len(docs)
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY", "1") == "1"
+METRIC_PREFIX = "rag"
+# Latency buckets in seconds, from a cache lookup up to a long Whisper call
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+_counters = {}    # (name, labels) -> value
+_help = {}        # name -> (type, help)
+_collectors = {}  # name -> callable returning samples
+
+
+def _describe(name, kind, text):
+    if name not in _help:
+        _help[name] = (kind, text)
+
+
+def observe(name, value, help_text="", **labels):
+    """
+    Add `value` to the histogram `name` (buckets: DURATION_BUCKETS).
+    """
+    if not TELEMETRY_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(DURATION_BUCKETS, value)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(DURATION_BUCKETS) + 1), 0.0, 0]
+            _describe(name, "histogram", help_text)
+        entry[0][index] += 1
+        entry[1] += value
+        entry[2] += 1
+
+
+def count(name, value=1, help_text="", **labels):
+    """
+    Increase the counter `name` by `value`.
+    """
+    if not TELEMETRY_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        if key not in _counters:
+            _describe(name, "counter", help_text)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def record(stage, seconds, error=False, **quantities):
+    """
+    Record one completed stage: its duration, an error if it failed, and
+    numeric quantities, each added to rag_stage_<quantity>_total.
+    """
+    if not TELEMETRY_ENABLED:
+        return
+    observe("stage_duration_seconds", seconds, "Time spent in each pipeline stage.", stage=stage)
+    if error:
+        count("stage_errors_total", 1, "Pipeline stages that raised.", stage=stage)
+    for quantity, value in quantities.items():
+        if value:
+            count(f"stage_{quantity}_total", value, f"{quantity.replace('_', ' ').capitalize()} per pipeline stage.",
+                  stage=stage)
+
+
+class span(dict):
+    """
+    Times a block as pipeline stage `stage`. Numeric items set on the span
+    are recorded as stage quantities when the block exits.
+    """
+
+    def __init__(self, stage, **quantities):
+        super().__init__(quantities)
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A generator closed mid-stream (GeneratorExit) is not a failure
+        failed = exc_type is not None and issubclass(exc_type, Exception)
+        record(self.stage, time.perf_counter() - self.started, failed, **self)
+        return False
+
+
+def traced_iter(stage, items, **quantities):
+    """
+    Iterate `items`, timing only the work done producing each item (lazy
+    extractors and chunkers), and record it once the iteration ends or is
+    abandoned. The number of items is recorded as `items`.
+    """
+    iterator = iter(items)
+    seconds = 0.0
+    produced = 0
+    failed = False
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds += time.perf_counter() - started
+                return
+            except Exception:
+                seconds += time.perf_counter() - started
+                failed = True
+                raise
+            seconds += time.perf_counter() - started
+            produced += 1
+            yield item
+    finally:
+        record(stage, seconds, failed, items=produced, **quantities)
+
+
+def register_collector(name, collect):
+    """
+    Add metrics computed at scrape time (e.g. cache statistics that a module
+    already keeps). `collect()` returns (metric, type, help, labels, value)
+    tuples; it is skipped if it raises.
+    """
+    _collectors[name] = collect
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    with _lock:
+        histograms = {key: (list(e[0]), e[1], e[2]) for key, e in _histograms.items()}
+        counters = dict(_counters)
+        described = dict(_help)
+
+    families = {}  # full name -> (type, help, [lines])
+
+    def family(name, kind, text):
+        full = f"{METRIC_PREFIX}_{name}"
+        if full not in families:
+            families[full] = (kind, text, [])
+        return full, families[full][2]
+
+    for (name, labels), (buckets, total, observations) in sorted(histograms.items()):
+        full, lines = family(name, "histogram", described[name][1])
+        cumulative = 0
+        for bound, bucket in zip(DURATION_BUCKETS + (float("inf"),), buckets):
+            cumulative += bucket
+            lines.append(f"{full}_bucket{_format_labels(labels, ('le', _format_value(float(bound))))} {cumulative}")
+        lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{full}_count{_format_labels(labels)} {observations}")
+
+    for (name, labels), value in sorted(counters.items()):
+        full, lines = family(name, "counter", described[name][1])
+        lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+
+    for collector_name, collect in sorted(_collectors.items()):
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"Warning: Metrics collector {collector_name} failed: {e}")
+            continue
+        for name, kind, text, labels, value in samples:
+            full, lines = family(name, kind, text)
+            lines.append(f"{full}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+
+    output = []
+    for full, (kind, text, lines) in families.items():
+        if text:
+            output.append(f"# HELP {full} {text}")
+        output.append(f"# TYPE {full} {kind}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
+
+
+def reset():
+    """
+    Forget recorded spans and counters (collectors stay registered).
+    """
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
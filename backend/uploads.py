@@ -0,0 +1,169 @@
+import hashlib
+import os
+import uuid
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+# Streaming upload handling for /upload.
+# The multipart body is parsed as it arrives (instead of being spooled to a
+# temporary file by the framework first), written to a partial file in
+# UPLOAD_CHUNK_SIZE blocks on a worker thread and hashed on the way, so the
+# content hash is known without reading the file back. Uploads over
+# MAX_UPLOAD_MB are rejected as soon as they cross the limit.
+
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "4096"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_FIELD = "file"
+PARTIAL_SUFFIX = ".part"
+
+
+class UploadError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _Receiver:
+    """
+    Multipart callbacks that collect the data of the upload field.
+    """
+
+    def __init__(self):
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+        self.file_name = None
+        self.in_file = False
+        self.done = False
+        self.pending = []
+        self.size = 0
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data, start, end):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = self.header_value = b""
+
+    def on_headers_finished(self):
+        _, params = parse_options_header(self.headers.get(b"content-disposition", b""))
+        name = params.get(b"name", b"").decode("utf-8", "replace")
+        file_name = params.get(b"filename")
+        self.in_file = name == UPLOAD_FIELD and file_name is not None and not self.done
+        if self.in_file:
+            self.file_name = file_name.decode("utf-8", "replace")
+
+    def on_part_data(self, data, start, end):
+        if self.in_file:
+            self.pending.append(data[start:end])
+            self.size += end - start
+
+    def on_part_end(self):
+        if self.in_file:
+            self.in_file = False
+            self.done = True
+
+    def callbacks(self):
+        return {name: getattr(self, name) for name in (
+            "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+            "on_headers_finished", "on_part_data", "on_part_end",
+        )}
+
+
+def _write_blocks(f, digest, blocks):
+    for block in blocks:
+        digest.update(block)
+        f.write(block)
+
+
+def safe_file_name(file_name):
+    """
+    Client-supplied file name reduced to a plain name inside the upload directory.
+    """
+    name = os.path.basename((file_name or "").replace("\\", "/")).strip()
+    if name in ("", ".", "..") or name.startswith("."):
+        raise UploadError(400, f"Invalid file name {file_name!r}")
+    return name
+
+
+async def receive_upload(request, directory, max_bytes=None):
+    """
+    Stream the `file` field of a multipart/form-data request into a partial
+    file in `directory`. Returns (partial_path, file_name, content_hash, size);
+    the caller renames or deletes the partial file. Raises UploadError.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_MB * 1024 * 1024
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError(400, "Expected a multipart/form-data upload")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + 64 * 1024:
+        # Reject before reading the body (the allowance covers multipart framing)
+        raise UploadError(413, f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+    receiver = _Receiver()
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+    digest = hashlib.sha256()
+    partial_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}{PARTIAL_SUFFIX}")
+    f = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        written = 0
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.size > max_bytes:
+                raise UploadError(413, f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            if receiver.size - written >= UPLOAD_CHUNK_SIZE:
+                blocks, receiver.pending, written = receiver.pending, [], receiver.size
+                await run_in_threadpool(_write_blocks, f, digest, blocks)
+        parser.finalize()
+        if receiver.pending:
+            await run_in_threadpool(_write_blocks, f, digest, receiver.pending)
+            receiver.pending = []
+        if receiver.file_name is None:
+            raise UploadError(400, f"No '{UPLOAD_FIELD}' file field in the upload")
+        file_name = safe_file_name(receiver.file_name)
+    except FormParserError as e:
+        await run_in_threadpool(f.close)
+        discard(partial_path)
+        raise UploadError(400, f"Malformed multipart upload: {e}")
+    except BaseException:
+        await run_in_threadpool(f.close)
+        discard(partial_path)
+        raise
+    await run_in_threadpool(f.close)
+    return partial_path, file_name, digest.hexdigest(), receiver.size
+
+
+def discard(partial_path):
+    try:
+        os.remove(partial_path)
+    except FileNotFoundError:
+        pass
+
+
+def store_upload(partial_path, directory, file_name, content_hash, stored_hash=None):
+    """
+    Move a received upload into place without overwriting different content
+    that already has the same name: the new file gets "<stem>-<hash prefix>".
+    `stored_hash(path)` returns the known content hash of an existing file (or
+    None); existing files are never re-read, so a name clash with an unknown
+    file is treated as different content.
+    Returns the stored file name (also its `source` in the vector store).
+    """
+    target = os.path.join(directory, file_name)
+    if os.path.exists(target):
+        same_size = os.path.getsize(target) == os.path.getsize(partial_path)
+        if not (same_size and stored_hash is not None and stored_hash(target) == content_hash):
+            stem, suffix = os.path.splitext(file_name)
+            file_name = f"{stem}-{content_hash[:12]}{suffix}"
+            target = os.path.join(directory, file_name)
+    os.replace(partial_path, target)
+    return file_name
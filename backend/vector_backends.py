@@ -0,0 +1,721 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+from backend import filters as retrieval_filters
+
+# Vector storage backends behind backend/vector_store.py.
+#
+# A backend stores (id, vector, text, metadata) rows in one collection and
+# answers nearest-neighbour queries, optionally narrowed by a `where` clause in
+# Chroma's syntax (see backend/filters.py). Embedding, chunk IDs, the lexical
+# index and per-source syncing stay in vector_store.py, so every backend gets
+# them for free. Pick one with VECTOR_BACKEND; add one with
+# vector_store.register_vector_backend.
+#
+#   chroma     Chroma persistent client (default)
+#   milvus     Milvus Lite (a local file) or a Milvus server (MILVUS_URI=http://...),
+#              with a configurable ANN index: HNSW, IVF_FLAT, IVF_SQ8 or FLAT
+#   quantized  int8 or binary codes scanned exhaustively, re-ranked with float32
+#              vectors (both in memory-mapped files)
+
+MILVUS_URI = os.getenv("MILVUS_URI")  # default: milvus_lite.db in the persist directory
+MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "HNSW")
+MILVUS_HNSW_M = int(os.getenv("MILVUS_HNSW_M", "16"))
+MILVUS_HNSW_EF_CONSTRUCTION = int(os.getenv("MILVUS_HNSW_EF_CONSTRUCTION", "200"))
+MILVUS_HNSW_EF = int(os.getenv("MILVUS_HNSW_EF", "64"))  # raised to the number of results if lower
+MILVUS_IVF_NLIST = int(os.getenv("MILVUS_IVF_NLIST", "1024"))
+MILVUS_IVF_NPROBE = int(os.getenv("MILVUS_IVF_NPROBE", "16"))
+# Session: a process sees its own writes without waiting for every write to
+# become visible everywhere (Strong adds ~100 ms per search right after ingestion)
+MILVUS_CONSISTENCY = os.getenv("MILVUS_CONSISTENCY", "Session")
+QUANTIZED_MODE = os.getenv("QUANTIZED_MODE", "int8")  # int8 | binary
+# Candidates re-ranked at full precision per requested result (0: the mode's default)
+QUANTIZED_OVERSAMPLE = int(os.getenv("QUANTIZED_OVERSAMPLE", "0"))
+QUANTIZED_DEFAULT_OVERSAMPLE = {"int8": 4, "binary": 16}
+QUANTIZED_MIN_CANDIDATES = 64
+QUANTIZED_INITIAL_CAPACITY = 1024
+# Scratch memory for scoring one block of codes (small enough to stay in cache)
+SCORE_BLOCK_BYTES = 1024 * 1024
+SCAN_BATCH_SIZE = 1024
+
+
+class VectorBackend:
+    """
+    Interface of a vector backend. Subclasses implement storage and nearest
+    neighbour search; MMR is built on top of `nearest`.
+    """
+
+    name = None
+
+    def open(self, signature):
+        """
+        Create the collection if it does not exist, recording `signature`
+        (embedding_model, embedding_dimension) in its metadata.
+        """
+        raise NotImplementedError
+
+    def metadata(self):
+        """
+        Collection metadata (the embedding signature once recorded).
+        """
+        raise NotImplementedError
+
+    def set_metadata(self, metadata):
+        raise NotImplementedError
+
+    def stored_dimension(self):
+        """
+        Dimension of the stored vectors, or None while the collection is empty.
+        """
+        raise NotImplementedError
+
+    def upsert(self, ids, vectors, texts, metadatas):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def ids(self, where):
+        """
+        IDs of every chunk matching `where`.
+        """
+        raise NotImplementedError
+
+    def get(self, ids):
+        """
+        Documents (with `id` set) for the IDs that exist.
+        """
+        raise NotImplementedError
+
+    def scan(self, batch_size=SCAN_BATCH_SIZE):
+        """
+        Yield every stored chunk as lists of Documents.
+        """
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def nearest(self, vector, k, where=None):
+        """
+        Up to `k` (Document, vector) pairs closest to `vector`, closest first.
+        """
+        raise NotImplementedError
+
+    def drop(self):
+        """
+        Delete the collection and everything in it.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Called after a batch of writes (one synced source, one bulk-loaded file).
+        """
+
+    def close(self):
+        pass
+
+    def memory_usage(self):
+        """
+        Bytes per stored vector, if the backend knows: {"index": scanned by
+        every search, "full_precision": read only for re-ranking}.
+        """
+        return None
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, filter=None):
+        """
+        Diverse top-k: MMR over the `fetch_k` nearest chunks. Selected chunks
+        are returned in similarity order (as LangChain's Chroma store does).
+        """
+        candidates = self.nearest(embedding, fetch_k, filter)
+        if not candidates:
+            return []
+        # One matrix up front: MMR re-reads the candidates on every step
+        selected = set(maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32),
+            np.asarray([vector for _, vector in candidates], dtype=np.float32),
+            k=k, lambda_mult=lambda_mult,
+        ))
+        return [doc for i, (doc, _) in enumerate(candidates) if i in selected]
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, persist_directory, collection_name):
+        import chromadb
+
+        self.collection_name = collection_name
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.collection = None
+
+    def open(self, signature):
+        # embedding_function=None: vectors are always computed by the caller
+        self.collection = self.client.get_or_create_collection(
+            self.collection_name, metadata=signature, embedding_function=None
+        )
+
+    def metadata(self):
+        return dict(self.collection.metadata or {})
+
+    def set_metadata(self, metadata):
+        self.collection.modify(metadata=metadata)
+
+    def stored_dimension(self):
+        vectors = self.collection.peek(limit=1).get("embeddings")
+        if vectors is None or not len(vectors):
+            return None
+        return len(vectors[0])
+
+    def upsert(self, ids, vectors, texts, metadatas):
+        self.collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def ids(self, where):
+        return self.collection.get(where=where, include=[])["ids"]
+
+    @staticmethod
+    def _documents(found):
+        return [
+            Document(id=doc_id, page_content=text or "", metadata=meta or {})
+            for doc_id, text, meta in zip(found["ids"], found["documents"], found["metadatas"])
+        ]
+
+    def get(self, ids):
+        if not ids:
+            return []
+        return self._documents(self.collection.get(ids=ids, include=["documents", "metadatas"]))
+
+    def scan(self, batch_size=SCAN_BATCH_SIZE):
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield self._documents(page)
+            offset += len(page["ids"])
+
+    def count(self):
+        return self.collection.count()
+
+    def nearest(self, vector, k, where=None):
+        found = self.collection.query(
+            query_embeddings=[vector], n_results=k, where=where,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        docs = self._documents({key: found[key][0] for key in ("ids", "documents", "metadatas")})
+        return list(zip(docs, found["embeddings"][0]))
+
+    def drop(self):
+        if self.collection_name in [getattr(c, "name", c) for c in self.client.list_collections()]:
+            self.client.delete_collection(self.collection_name)
+        self.collection = None
+
+
+class MilvusBackend(VectorBackend):
+    """
+    Milvus collection with an `id` primary key, a `vector` field, a `text`
+    field and chunk metadata as dynamic fields (so filters address them by
+    name). Changing the index type or build parameters rebuilds the index on
+    the next start; search parameters apply immediately.
+    """
+
+    name = "milvus"
+    RESERVED_FIELDS = ("id", "vector", "text")
+
+    def __init__(self, persist_directory, collection_name, uri=None, index_type=None, index_params=None,
+                 search_params=None):
+        from utils.milvus_client import connect
+
+        self.collection_name = collection_name
+        if uri is None:
+            uri = MILVUS_URI
+        if uri is None:
+            os.makedirs(persist_directory, exist_ok=True)
+            uri = os.path.join(persist_directory, "milvus_lite.db")
+        self.uri = uri
+        self.index_type = (index_type or MILVUS_INDEX_TYPE).upper()
+        self.index_params = index_params if index_params is not None else self._default_index_params()
+        self.search_params = search_params if search_params is not None else self._default_search_params()
+        self.client = connect(uri)
+
+    def _default_index_params(self):
+        if self.index_type == "HNSW":
+            return {"M": MILVUS_HNSW_M, "efConstruction": MILVUS_HNSW_EF_CONSTRUCTION}
+        if self.index_type.startswith("IVF"):
+            return {"nlist": MILVUS_IVF_NLIST}
+        return {}
+
+    def _default_search_params(self):
+        if self.index_type == "HNSW":
+            return {"ef": MILVUS_HNSW_EF}
+        if self.index_type.startswith("IVF"):
+            return {"nprobe": MILVUS_IVF_NPROBE}
+        return {}
+
+    def _index_description(self):
+        # Recorded as a collection property: Milvus Lite does not report index params
+        return json.dumps({"index_type": self.index_type, "params": self.index_params}, sort_keys=True)
+
+    def _index(self):
+        index = self.client.prepare_index_params()
+        index.add_index(field_name="vector", index_type=self.index_type, metric_type="COSINE",
+                        params=self.index_params)
+        return index
+
+    def open(self, signature):
+        from pymilvus import DataType, MilvusClient
+
+        if not self.client.has_collection(self.collection_name):
+            schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=True)
+            schema.add_field("id", DataType.VARCHAR, is_primary=True, max_length=64)
+            schema.add_field("vector", DataType.FLOAT_VECTOR, dim=signature["embedding_dimension"])
+            schema.add_field("text", DataType.VARCHAR, max_length=65535)
+            properties = {key: str(value) for key, value in signature.items()}
+            properties["vector_index"] = self._index_description()
+            self.client.create_collection(self.collection_name, schema=schema, index_params=self._index(),
+                                          properties=properties, consistency_level=MILVUS_CONSISTENCY)
+            return
+        current = self.metadata().get("vector_index")
+        if current != self._index_description():
+            print(f"Rebuilding Milvus index on {self.collection_name}: {current} -> {self._index_description()}")
+            self.client.release_collection(self.collection_name)
+            self.client.drop_index(self.collection_name, "vector")
+            self.client.create_index(self.collection_name, self._index())
+            self.set_metadata({"vector_index": self._index_description()})
+        self.client.load_collection(self.collection_name)
+
+    def metadata(self):
+        properties = dict(self.client.describe_collection(self.collection_name).get("properties") or {})
+        if "embedding_dimension" in properties:
+            properties["embedding_dimension"] = int(properties["embedding_dimension"])
+        return properties
+
+    def set_metadata(self, metadata):
+        self.client.alter_collection_properties(
+            self.collection_name, properties={key: str(value) for key, value in metadata.items()}
+        )
+
+    def stored_dimension(self):
+        for field in self.client.describe_collection(self.collection_name)["fields"]:
+            if field["name"] == "vector":
+                return int(field["params"]["dim"])
+        return None
+
+    def upsert(self, ids, vectors, texts, metadatas):
+        rows = []
+        for doc_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+            clashes = [key for key in (metadata or {}) if key in self.RESERVED_FIELDS]
+            if clashes:
+                raise ValueError(f"Metadata fields {clashes} clash with Milvus schema fields")
+            rows.append({**(metadata or {}), "id": doc_id, "vector": list(vector), "text": text})
+        self.client.upsert(self.collection_name, rows)
+
+    def delete(self, ids):
+        self.client.delete(self.collection_name, ids=list(ids))
+
+    def _iterate(self, expression, output_fields, batch_size=SCAN_BATCH_SIZE):
+        # query() caps results at 16384 rows; the iterator has no such limit
+        iterator = self.client.query_iterator(self.collection_name, batch_size=batch_size,
+                                              filter=expression, output_fields=output_fields,
+                                              consistency_level=MILVUS_CONSISTENCY)
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    return
+                yield rows
+        finally:
+            iterator.close()
+
+    def ids(self, where):
+        expression = retrieval_filters.to_expression(where)
+        return [row["id"] for rows in self._iterate(expression, ["id"]) for row in rows]
+
+    def _document(self, row):
+        metadata = {key: value for key, value in row.items() if key not in self.RESERVED_FIELDS}
+        return Document(id=row["id"], page_content=row.get("text") or "", metadata=metadata)
+
+    def get(self, ids):
+        if not ids:
+            return []
+        rows = self.client.get(self.collection_name, ids=list(ids), output_fields=["*"])
+        return [self._document(row) for row in rows]
+
+    def scan(self, batch_size=SCAN_BATCH_SIZE):
+        for rows in self._iterate("", ["*"], batch_size):
+            yield [self._document(row) for row in rows]
+
+    def count(self):
+        return int(self.client.get_collection_stats(self.collection_name)["row_count"])
+
+    def nearest(self, vector, k, where=None):
+        params = dict(self.search_params)
+        if "ef" in params:
+            params["ef"] = max(params["ef"], k)  # HNSW needs ef >= k
+        hits = self.client.search(
+            self.collection_name, [list(vector)], limit=k,
+            filter=retrieval_filters.to_expression(where),
+            output_fields=["*"], search_params={"metric_type": "COSINE", "params": params},
+            consistency_level=MILVUS_CONSISTENCY,
+        )[0]
+        return [(self._document(hit["entity"]), hit["entity"]["vector"]) for hit in hits]
+
+    def drop(self):
+        if self.client.has_collection(self.collection_name):
+            self.client.drop_collection(self.collection_name)
+
+    def flush(self):
+        # Seal and index fresh rows; searches over unsealed rows are brute force
+        self.client.flush(self.collection_name)
+
+    def close(self):
+        self.client.close()
+
+
+def _unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _quantize(vectors, mode):
+    """
+    (codes, scales) for unit vectors: int8 codes with a per-vector scale, or
+    sign bits packed eight per byte (scales is None).
+    """
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _hamming(codes, query_code):
+    differing = np.bitwise_xor(codes, query_code)
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(differing).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[differing].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedBackend(VectorBackend):
+    """
+    Exhaustive search over compact codes with a full-precision re-rank.
+
+    Searches scan int8 codes (one byte per dimension plus a scale, 4x smaller
+    than float32) or binary codes (one bit per dimension, 32x smaller, ranked
+    by Hamming distance). Codes and vectors are memory-mapped files; the
+    codes are read by every search and so stay in the OS page cache. The best
+    k * oversample candidates are then scored exactly against unit-normalized
+    float32 vectors, so only their rows are read. Text and metadata live in SQLite and `where`
+    clauses run as SQL over the JSON metadata. Changing QUANTIZED_MODE
+    re-encodes the codes from the float32 vectors on the next start.
+    """
+
+    name = "quantized"
+    MODES = ("int8", "binary")
+
+    def __init__(self, persist_directory, collection_name, mode=None, oversample=None):
+        self.mode = (mode or QUANTIZED_MODE).lower()
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown QUANTIZED_MODE {self.mode!r}; expected one of {list(self.MODES)}")
+        self.oversample = oversample or QUANTIZED_OVERSAMPLE or QUANTIZED_DEFAULT_OVERSAMPLE[self.mode]
+        self.directory = os.path.join(persist_directory, f"{collection_name}.quantized")
+        self.dimension = None
+        self.size = 0  # slots used so far, including freed ones
+        self._lock = threading.RLock()
+        self._conn = None
+        self._live = None
+        self._free = []
+        self._vectors = self._codes = self._scales = None
+
+    def _code_width(self):
+        return self.dimension if self.mode == "int8" else (self.dimension + 7) // 8
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _map(self, name, dtype, shape):
+        path = self._path(name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _map_files(self, capacity):
+        self._vectors = self._map("vectors.f32", np.float32, (capacity, self.dimension))
+        if self.mode == "int8":
+            self._codes = self._map("codes.int8", np.int8, (capacity, self._code_width()))
+            self._scales = self._map("scales.f32", np.float32, (capacity,))
+        else:
+            self._codes = self._map("codes.binary", np.uint8, (capacity, self._code_width()))
+            self._scales = None
+
+    def _flush_files(self):
+        for array in (self._vectors, self._codes, self._scales):
+            if array is not None:
+                array.flush()
+
+    def _ensure_capacity(self, slots):
+        capacity = len(self._live)
+        if slots <= capacity:
+            return
+        capacity = max(slots, capacity * 2)
+        self._flush_files()
+        self._map_files(capacity)
+        self._live = np.concatenate([self._live, np.zeros(capacity - len(self._live), dtype=bool)])
+
+    def _encode(self, slots, vectors):
+        codes, scales = _quantize(vectors, self.mode)
+        self._codes[slots] = codes
+        if scales is not None:
+            self._scales[slots] = scales
+
+    def open(self, signature):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(self._path("chunks.sqlite3"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " slot INTEGER PRIMARY KEY,"
+                " id TEXT NOT NULL UNIQUE,"
+                " text TEXT NOT NULL,"
+                " metadata TEXT NOT NULL)"
+            )
+            # Expression indexes for the common filters (sources, modality quotas)
+            for key in ("source", "type"):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_chunks_{key} ON chunks(json_extract(metadata, '$.{key}'))"
+                )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS properties (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+            if not self.metadata():
+                self.set_metadata(signature)
+            properties = self.metadata()
+            self.dimension = int(properties["embedding_dimension"])
+
+            slots = np.fromiter((row[0] for row in self._conn.execute("SELECT slot FROM chunks")), dtype=np.int64)
+            self.size = int(slots.max()) + 1 if len(slots) else 0
+            vectors_path = self._path("vectors.f32")
+            stored = os.path.getsize(vectors_path) // (self.dimension * 4) if os.path.exists(vectors_path) else 0
+            capacity = max(QUANTIZED_INITIAL_CAPACITY, self.size, stored)
+            codes_current = properties.get("quantization") == self.mode and os.path.exists(
+                self._path(f"codes.{self.mode}")
+            )
+            self._map_files(capacity)
+            self._live = np.zeros(capacity, dtype=bool)
+            self._live[slots] = True
+            self._free = np.flatnonzero(~self._live[:self.size]).tolist()
+
+            if not codes_current:
+                if self.size:
+                    print(f"Re-encoding {self.size} vectors as {self.mode} codes")
+                block = max(1, 32 * SCORE_BLOCK_BYTES // (self.dimension * 4))
+                for start in range(0, self.size, block):
+                    stop = min(start + block, self.size)
+                    self._encode(np.arange(start, stop), np.asarray(self._vectors[start:stop]))
+                self._flush_files()
+                self.set_metadata({"quantization": self.mode})
+
+    def metadata(self):
+        return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM properties")}
+
+    def set_metadata(self, metadata):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO properties (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in metadata.items()],
+            )
+            self._conn.commit()
+
+    def stored_dimension(self):
+        return self.dimension if self.count() else None
+
+    def _slots(self, ids):
+        found = {}
+        ids = list(dict.fromkeys(ids))
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            found.update(self._conn.execute(
+                f"SELECT id, slot FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return found
+
+    def upsert(self, ids, vectors, texts, metadatas):
+        if not ids:
+            return
+        vectors = _unit_rows(vectors)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dimensional vectors, got {vectors.shape[1]}")
+        with self._lock:
+            assigned = self._slots(ids)
+            slots = []
+            for doc_id in ids:
+                if doc_id not in assigned:
+                    if self._free:
+                        assigned[doc_id] = self._free.pop()
+                    else:
+                        assigned[doc_id] = self.size
+                        self.size += 1
+                slots.append(assigned[doc_id])
+            self._ensure_capacity(self.size)
+            slots = np.asarray(slots, dtype=np.int64)
+            # Vectors first: a row in SQLite always points at written data
+            self._vectors[slots] = vectors
+            self._encode(slots, vectors)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (slot, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(int(slot), doc_id, text or "", json.dumps(metadata or {}, ensure_ascii=False))
+                 for slot, doc_id, text, metadata in zip(slots, ids, texts, metadatas)],
+            )
+            self._conn.commit()
+            self._live[slots] = True
+
+    def delete(self, ids):
+        with self._lock:
+            slots = list(self._slots(ids).values())
+            if not slots:
+                return
+            for start in range(0, len(slots), 500):
+                batch = slots[start:start + 500]
+                self._conn.execute(f"DELETE FROM chunks WHERE slot IN ({','.join('?' * len(batch))})", batch)
+            self._conn.commit()
+            self._live[slots] = False
+            self._free.extend(slots)
+
+    def ids(self, where):
+        clause, params = retrieval_filters.to_sql(where)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT id FROM chunks WHERE {clause}", params)]
+
+    @staticmethod
+    def _document(doc_id, text, metadata):
+        return Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+
+    def get(self, ids):
+        if not ids:
+            return []
+        docs = []
+        ids = list(dict.fromkeys(ids))
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                docs.extend(self._document(*row) for row in rows)
+        return docs
+
+    def scan(self, batch_size=SCAN_BATCH_SIZE):
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT slot, id, text, metadata FROM chunks WHERE slot > ? ORDER BY slot LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield [self._document(*row[1:]) for row in rows]
+            last = rows[-1][0]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _candidates(self, query, n, allowed=None):
+        """
+        Slots of the (up to) `n` best codes, among `allowed` slots if given.
+        """
+        query_code = np.packbits(query > 0) if self.mode == "binary" else None
+        total = self.size if allowed is None else len(allowed)
+        # int8 codes are scored as float32; binary codes byte for byte
+        row_bytes = self.dimension * 4 if query_code is None else self._code_width()
+        block = max(1, SCORE_BLOCK_BYTES // row_bytes)
+        best_slots, best_scores = [], []
+        for start in range(0, total, block):
+            stop = min(start + block, total)
+            if allowed is None:
+                slots = np.arange(start, stop)
+                codes = self._codes[start:stop]
+            else:
+                slots = allowed[start:stop]
+                codes = self._codes[slots]
+            if query_code is not None:
+                scores = -_hamming(codes, query_code).astype(np.float32)
+            else:
+                scale = self._scales[start:stop] if allowed is None else self._scales[slots]
+                scores = (codes.astype(np.float32) @ query) * scale
+            if allowed is None:
+                scores[~self._live[start:stop]] = -np.inf
+            if len(scores) > n:
+                top = np.argpartition(-scores, n - 1)[:n]
+                slots, scores = slots[top], scores[top]
+            best_slots.append(slots)
+            best_scores.append(scores)
+        if not best_slots:
+            return np.zeros(0, dtype=np.int64)
+        slots, scores = np.concatenate(best_slots), np.concatenate(best_scores)
+        if len(scores) > n:
+            top = np.argpartition(-scores, n - 1)[:n]
+            slots, scores = slots[top], scores[top]
+        return slots[np.isfinite(scores)]
+
+    def nearest(self, vector, k, where=None):
+        query = _unit_rows([vector])[0]
+        with self._lock:
+            allowed = None
+            if where:
+                clause, params = retrieval_filters.to_sql(where)
+                allowed = np.fromiter(
+                    (row[0] for row in self._conn.execute(f"SELECT slot FROM chunks WHERE {clause} ORDER BY slot",
+                                                          params)),
+                    dtype=np.int64,
+                )
+            candidates = self._candidates(query, max(k * self.oversample, QUANTIZED_MIN_CANDIDATES), allowed)
+            if not len(candidates):
+                return []
+            # Full-precision re-rank: reads only the candidates' rows
+            candidates = np.sort(candidates)
+            vectors = np.asarray(self._vectors[candidates])
+            order = np.argsort(-(vectors @ query), kind="stable")[:k]
+            slots = [int(slot) for slot in candidates[order]]
+            rows = {row[0]: row[1:] for row in self._conn.execute(
+                f"SELECT slot, id, text, metadata FROM chunks WHERE slot IN ({','.join('?' * len(slots))})", slots
+            )}
+        return [(self._document(*rows[slot]), vectors[i])
+                for slot, i in zip(slots, order) if slot in rows]
+
+    def drop(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def flush(self):
+        with self._lock:
+            self._flush_files()
+
+    def close(self):
+        with self._lock:
+            self._flush_files()
+            self._vectors = self._codes = self._scales = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def memory_usage(self):
+        index = self._code_width() + (4 if self.mode == "int8" else 0)
+        return {"index": index, "full_precision": self.dimension * 4}
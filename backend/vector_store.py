@@ -1,59 +1,523 @@
-import chromadb
-from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 import os
-import shutil
+import hashlib
+import sqlite3
+import threading
+import time
+from backend import resources
+from backend import filters as retrieval_filters
+from backend.embedding_cache import EmbeddingCache, CachedEmbeddings
+from backend.lexical_index import LexicalIndex
+from backend.embedding_providers import LocalEmbeddings, HashingEmbeddings
+from backend.vector_backends import ChromaBackend, MilvusBackend, QuantizedBackend
+from backend.telemetry import span, record
 
 PERSIST_DIRECTORY = "./backend/chroma_db"
+COLLECTION_NAME = "hackathon_rag"
+EMBEDDING_MODEL = "text-embedding-3-small"
+# openai | local (sentence-transformers on CPU) | hashing (deterministic, for tests)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+# chroma | milvus | quantized (see backend/vector_backends.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+ADD_BATCH_SIZE = 256
+# Chunks per upsert for pre-embedded bulk writes (below Chroma's max batch)
+UPSERT_BATCH_SIZE = 2048
+# Metadata fields that locate a chunk inside its source
+# (`occurrence` numbers repeats of the same text within one source)
+LOCATOR_KEYS = ("type", "page", "timestamp", "start", "end", "frame", "row", "section", "occurrence")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+# Fuse BM25 results with dense MMR results (reciprocal rank fusion)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RRF_K = 60
+# Metadata kept in the lexical index for filtering
+LEXICAL_METADATA_KEYS = ("source", "type", "page", "start", "end")
 
-def get_embeddings():
+def _build_embedding_cache():
+    return EmbeddingCache(
+        os.path.join(PERSIST_DIRECTORY, "embedding_cache.sqlite3"),
+        max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+    )
+
+# Embedding providers: name -> factory returning a LangChain `Embeddings`.
+# Its model and dimension are read from `model_name`/`dimension` (or OpenAI's
+# `model`/`dimensions`). Add one with register_embedding_provider.
+_EMBEDDING_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+def _openai_embeddings():
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY environment variable is not set.")
-    return OpenAIEmbeddings(model="text-embedding-3-small")
+    # OpenAIEmbeddings is a pydantic model that rejects extra attributes
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL, http_client=resources.get("http_client"))
+
+EMBEDDING_PROVIDERS = {
+    "openai": _openai_embeddings,
+    "local": LocalEmbeddings,
+    "hashing": HashingEmbeddings,
+}
+
+def register_embedding_provider(name, factory):
+    EMBEDDING_PROVIDERS[name] = factory
+
+def _provider_identity(provider):
+    """
+    (model name, dimension) of a provider; dimension is None when unknown.
+    """
+    model_name = (getattr(provider, "model_name", None) or getattr(provider, "model", None)
+                  or type(provider).__name__)
+    dimension = (getattr(provider, "dimension", None) or getattr(provider, "dimensions", None)
+                 or _EMBEDDING_DIMENSIONS.get(model_name))
+    return model_name, dimension
+
+def _build_embeddings():
+    factory = EMBEDDING_PROVIDERS.get(EMBEDDING_PROVIDER)
+    if factory is None:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {EMBEDDING_PROVIDER!r}; expected one of {sorted(EMBEDDING_PROVIDERS)}")
+    provider = factory()
+    model_name, dimension = _provider_identity(provider)
+    # Only chunks whose text changed since the last ingest reach the provider
+    return CachedEmbeddings(
+        provider, resources.get("embedding_cache"),
+        model_name=f"{EMBEDDING_PROVIDER}:{model_name}", dimension=dimension
+    )
+
+def _embedding_signature(embeddings):
+    """
+    Collection metadata describing the vectors a collection holds.
+    """
+    dimension = getattr(embeddings, "dimension", None)
+    if not isinstance(dimension, int):
+        dimension = len(embeddings.embed_query("dimension probe"))
+    return {"embedding_model": str(getattr(embeddings, "model_name", type(embeddings).__name__)),
+            "embedding_dimension": dimension}
+
+# Vector backends: name -> class taking (persist_directory, collection_name).
+# Add one with register_vector_backend.
+VECTOR_BACKENDS = {
+    "chroma": ChromaBackend,
+    "milvus": MilvusBackend,
+    "quantized": QuantizedBackend,
+}
+
+def register_vector_backend(name, factory):
+    VECTOR_BACKENDS[name] = factory
+
+def _check_collection(backend, signature):
+    """
+    Refuse to mix vectors of different models / dimensions in one collection.
+    Collections created before this check are adopted if their vectors match.
+    """
+    metadata = backend.metadata()
+    stored_dimension = metadata.get("embedding_dimension")
+    if stored_dimension is None:
+        stored_dimension = backend.stored_dimension()
+        if stored_dimension is not None and stored_dimension != signature["embedding_dimension"]:
+            raise ValueError(
+                f"Collection {COLLECTION_NAME!r} holds {stored_dimension}-dimensional vectors but "
+                f"{signature['embedding_model']} produces {signature['embedding_dimension']}. "
+                "Run `python -m backend.reindex --reset` to re-embed with the new provider."
+            )
+        backend.set_metadata({**metadata, **signature})
+        return
+    if stored_dimension != signature["embedding_dimension"] or metadata.get("embedding_model") != signature["embedding_model"]:
+        raise ValueError(
+            f"Collection {COLLECTION_NAME!r} was built with {metadata.get('embedding_model')} "
+            f"({stored_dimension} dims) but the configured provider is {signature['embedding_model']} "
+            f"({signature['embedding_dimension']} dims). "
+            "Run `python -m backend.reindex --reset` to re-embed with the new provider."
+        )
+
+def _open_backend():
+    factory = VECTOR_BACKENDS.get(VECTOR_BACKEND)
+    if factory is None:
+        raise ValueError(f"Unknown VECTOR_BACKEND {VECTOR_BACKEND!r}; expected one of {sorted(VECTOR_BACKENDS)}")
+    os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+    return factory(PERSIST_DIRECTORY, COLLECTION_NAME)
+
+def _build_vector_store():
+    signature = _embedding_signature(get_embeddings())
+    backend = _open_backend()
+    try:
+        backend.open(signature)
+        _check_collection(backend, signature)
+    except Exception:
+        backend.close()
+        raise
+    return backend
+
+def _lexical_metadata(metadata):
+    return {key: metadata[key] for key in LEXICAL_METADATA_KEYS if metadata.get(key) is not None}
+
+def _build_lexical_index():
+    index = LexicalIndex(os.path.join(PERSIST_DIRECTORY, "lexical_index.sqlite3"))
+    if not len(index):
+        # First run against an existing collection: backfill from the vector store
+        count = 0
+        for docs in get_vector_store().scan(ADD_BATCH_SIZE * 4):
+            index.add((doc.id, doc.page_content, _lexical_metadata(doc.metadata)) for doc in docs)
+            count += len(docs)
+        if count:
+            print(f"Built lexical index for {count} existing chunks")
+    return index
+
+resources.register("embedding_cache", _build_embedding_cache)
+resources.register("embeddings", _build_embeddings)
+resources.register("vector_store", _build_vector_store)
+resources.register("lexical_index", _build_lexical_index)
+
+def get_embeddings():
+    """
+    Shared embedder. Swap in a local stand-in with
+    `resources.override("embeddings", ...)`.
+    """
+    return resources.get("embeddings")
 
 def get_vector_store():
-    # Ensure directory exists
+    """
+    Shared vector backend (VECTOR_BACKEND), built once per process and
+    reused by every call.
+    """
+    return resources.get("vector_store")
+
+def get_lexical_index():
+    """
+    Shared BM25 index, kept in sync with the collection by add_documents.
+    """
+    return resources.get("lexical_index")
+
+def get_embedding_cache_stats():
+    """
+    Hit/miss counters of the on-disk embedding cache.
+    """
+    return resources.get("embedding_cache").stats()
+
+def chunk_id(doc):
+    """
+    Stable chunk ID derived from source, locator (page, timestamp, frame, ...)
+    and a hash of the content. Re-ingesting identical content yields the same ID.
+    """
+    meta = doc.metadata
+    locator = "|".join(f"{key}={meta[key]}" for key in LOCATOR_KEYS if meta.get(key) is not None)
+    payload = f"{meta.get('source', '')}\x00{locator}\x00{doc.page_content}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+def _existing_ids(source):
+    try:
+        return set(get_vector_store().ids({"source": source}))
+    except Exception as e:
+        print(f"Warning: Could not list existing chunks for {source}: {e}")
+        return set()
+
+def count_chunks(source):
+    """
+    Number of chunks currently stored for a source file name.
+    """
+    return len(_existing_ids(source))
+
+_corpus_version_lock = threading.Lock()
+
+def _corpus_version_path():
+    return os.path.join(PERSIST_DIRECTORY, "corpus_version.sqlite3")
+
+def _read_legacy_corpus_version():
+    # Plain-text counter written by earlier versions; seeds the SQLite counter
+    try:
+        with open(os.path.join(PERSIST_DIRECTORY, "corpus_version"), "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def get_corpus_version():
+    """
+    Counter bumped by every ingestion that changes the collection. Stored on
+    disk so caches in other processes (Streamlit, API workers) see it too.
+    """
+    path = _corpus_version_path()
+    if not os.path.exists(path):
+        return _read_legacy_corpus_version()
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        row = conn.execute("SELECT v FROM corpus_version").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # created by a concurrent bump, table not there yet
+    finally:
+        conn.close()
+    return row[0] if row else _read_legacy_corpus_version()
+
+def _bump_corpus_version():
+    # Ingestion workers bump concurrently: the increment happens inside SQLite,
+    # so no bump is lost (a lost bump would keep stale cached answers alive)
     os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
-    return Chroma(
-        collection_name="hackathon_rag",
-        embedding_function=get_embeddings(),
-        persist_directory=PERSIST_DIRECTORY
-    )
+    with _corpus_version_lock:
+        conn = sqlite3.connect(_corpus_version_path(), timeout=30, isolation_level=None)
+        try:
+            # IMMEDIATE takes the write lock up front, across processes too
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("CREATE TABLE IF NOT EXISTS corpus_version (v INTEGER NOT NULL)")
+                if conn.execute("UPDATE corpus_version SET v = v + 1").rowcount == 0:
+                    conn.execute("INSERT INTO corpus_version (v) VALUES (?)", (_read_legacy_corpus_version() + 1,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
 
 def add_documents(documents):
+    """
+    Incrementally sync chunks into the store.
+    For every source seen in `documents`, identical chunks are left alone, new or
+    changed chunks are upserted, and chunks no longer produced are deleted only
+    after the new ones are written, so a source never has zero chunks mid-ingest.
+    Nothing is deleted when iterating `documents` raises: a partial extraction
+    keeps the chunks it did not reach.
+    Returns the number of chunks the sources now have.
+    """
     if not documents:
         return 0
 
     vector_store = get_vector_store()
+    lexical = get_lexical_index()
 
-    # 1. Idempotency Check: Remove existing chunks for these sources
-    sources = list(set(doc.metadata.get("source") for doc in documents if doc.metadata.get("source")))
+    existing = {}  # source -> chunk IDs stored before this ingest
+    seen = set()
+    unchanged = 0
+    batch_docs, batch_ids = [], []
+    stored_docs = []  # (id, doc) already stored; their metadata is compared in batches
+    written = 0
 
-    if sources:
-        try:
-            # Note: Chroma deletion by metadata
-            vector_store._collection.delete(where={"source": {"$in": sources}})
-            print(f"Removed existing chunks for sources: {sources}")
-        except Exception as e:
-            # Fallback for single source or older chroma versions
-            for source in sources:
-                try:
-                    vector_store._collection.delete(where={"source": source})
-                except Exception as ex:
-                    print(f"Warning: Could not delete existing chunks for {source}: {ex}")
-
-    # 2. Add new chunks
-    vector_store.add_documents(documents)
-    return len(documents)
-
-def query_documents(query, k=5):
+    diff_seconds = 0.0
+
+    def flush():
+        with span("index.embed_store", chunks=len(batch_docs)) as s:
+            s["bytes"] = sum(len(doc.page_content.encode("utf-8")) for doc in batch_docs)
+            texts = [doc.page_content for doc in batch_docs]
+            vector_store.upsert(batch_ids, get_embeddings().embed_documents(texts), texts,
+                                [doc.metadata for doc in batch_docs])
+        with span("index.lexical", chunks=len(batch_docs)):
+            lexical.add(
+                (doc_id, doc.page_content, _lexical_metadata(doc.metadata))
+                for doc_id, doc in zip(batch_ids, batch_docs)
+            )
+        return len(batch_docs)
+
+    def queue(doc_id, doc):
+        nonlocal batch_docs, batch_ids, written
+        batch_docs.append(doc)
+        batch_ids.append(doc_id)
+        if len(batch_docs) >= ADD_BATCH_SIZE:
+            written += flush()
+            batch_docs, batch_ids = [], []
+
+    def check_stored():
+        # Same text and locator, but offsets / citation_ref move when text is
+        # inserted earlier in the file: rewrite those (their vectors are cached)
+        nonlocal stored_docs, unchanged, diff_seconds
+        started = time.perf_counter()
+        stored = _get_by_ids([doc_id for doc_id, _ in stored_docs])
+        diff_seconds += time.perf_counter() - started
+        for doc_id, doc in stored_docs:
+            if doc_id in stored and stored[doc_id].metadata == doc.metadata:
+                unchanged += 1
+            else:
+                queue(doc_id, doc)
+        stored_docs = []
+
+    try:
+        for doc in documents:
+            source = doc.metadata.get("source")
+            if source and source not in existing:
+                started = time.perf_counter()
+                existing[source] = _existing_ids(source)
+                diff_seconds += time.perf_counter() - started
+
+            doc_id = chunk_id(doc)
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+
+            # Stored chunks are skipped unless the lexical index is missing them
+            # or their metadata changed
+            if source and doc_id in existing[source] and doc_id in lexical:
+                stored_docs.append((doc_id, doc))
+                if len(stored_docs) >= ADD_BATCH_SIZE:
+                    check_stored()
+                continue
+
+            queue(doc_id, doc)
+
+        if stored_docs:
+            check_stored()
+        if batch_docs:
+            written += flush()
+    except Exception:
+        # Extraction failed part-way: keep what was written, delete nothing
+        if written:
+            vector_store.flush()
+            _bump_corpus_version()
+        raise
+
+    started = time.perf_counter()
+    stale = [doc_id for ids in existing.values() for doc_id in ids if doc_id not in seen]
+    _delete_chunks(stale)
+    # Listing stored chunks and deleting the ones no longer produced
+    record("index.sync", diff_seconds + time.perf_counter() - started,
+           unchanged=unchanged, removed=len(stale))
+
+    if written or stale:
+        vector_store.flush()
+        _bump_corpus_version()
+
+    if existing:
+        print(f"Synced sources {list(existing)}: {written} upserted, {unchanged} unchanged, {len(stale)} removed")
+    return len(seen)
+
+def _delete_chunks(ids):
+    vector_store = get_vector_store()
+    lexical = get_lexical_index()
+    for i in range(0, len(ids), ADD_BATCH_SIZE):
+        vector_store.delete(ids[i:i + ADD_BATCH_SIZE])
+        lexical.remove(ids[i:i + ADD_BATCH_SIZE])
+
+def remove_stale_chunks(source, keep_ids):
+    """
+    Delete the chunks stored for `source` whose IDs are not in `keep_ids`
+    (bulk ingestion calls this once a file has been written completely).
+    Returns the number of chunks removed.
+    """
+    with span("index.sync") as s:
+        stale = [doc_id for doc_id in _existing_ids(source) if doc_id not in keep_ids]
+        _delete_chunks(stale)
+        s["removed"] = len(stale)
+    if stale:
+        get_vector_store().flush()
+        _bump_corpus_version()
+    return len(stale)
+
+def upsert_embedded(documents, vectors):
+    """
+    Write chunks whose embeddings the caller already computed (bulk ingestion
+    embeds on worker threads). Chunks are upserted by ID without per-source
+    diffing, so re-running over the same input is idempotent. Once the whole
+    input is written, call `remove_stale_chunks` for each source and
+    `get_vector_store().flush()`.
+    Returns the number of distinct chunks written.
+    """
+    unique = {}
+    for doc, vector in zip(documents, vectors):
+        unique.setdefault(chunk_id(doc), (doc, vector))
+    if not unique:
+        return 0
+
+    vector_store = get_vector_store()
+    items = list(unique.items())
+    with span("index.upsert", chunks=len(items)) as s:
+        s["bytes"] = sum(len(doc.page_content.encode("utf-8")) for _, (doc, _) in items)
+        for i in range(0, len(items), UPSERT_BATCH_SIZE):
+            batch = items[i:i + UPSERT_BATCH_SIZE]
+            vector_store.upsert(
+                [doc_id for doc_id, _ in batch],
+                [vector for _, (_, vector) in batch],
+                [doc.page_content for _, (doc, _) in batch],
+                [doc.metadata for _, (doc, _) in batch],
+            )
+    with span("index.lexical", chunks=len(items)):
+        get_lexical_index().add(
+            (doc_id, doc.page_content, _lexical_metadata(doc.metadata)) for doc_id, (doc, _) in items
+        )
+    _bump_corpus_version()
+    return len(items)
+
+def reset_collection():
+    """
+    Drop every chunk in the collection (used by a full reindex). The
+    collection is recreated for the configured embedding provider.
+    """
+    # Delete without the embedding check: after an embedding provider change
+    # the configured store refuses to open the old collection
+    resources.drop("vector_store")
+    backend = _open_backend()
+    try:
+        backend.drop()
+    finally:
+        backend.close()
+    get_lexical_index().clear()
+    _bump_corpus_version()
+
+def _get_by_ids(ids):
+    if not ids:
+        return {}
+    return {doc.id: doc for doc in get_vector_store().get(ids)}
+
+def fuse_rankings(rankings, k):
+    """
+    Reciprocal rank fusion of several ranked ID lists. Returns the top-k IDs.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+def query_documents(query, k=5, embedding=None, filters=None):
     """
     Retrieve documents relevant to the query.
+    Dense MMR results (diverse) are fused with BM25 results (exact tokens such
+    as bug IDs or model numbers) using reciprocal rank fusion.
+    Pass `embedding` when the query vector is already known to skip re-embedding it.
+    `filters` (see backend/filters.py) narrow both searches to matching chunks
+    and cap results per modality.
     """
+    filters = retrieval_filters.normalize(filters)
+    where = retrieval_filters.to_where(filters)
+    quotas = filters.get("quotas") if filters else None
+    # Quotas discard candidates, so rank a larger pool
+    pool = 3 * k if quotas else k
+
     vector_store = get_vector_store()
-    # Using MMR to get diverse results
-    retriever = vector_store.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": k, "fetch_k": 20}
-    )
-    return retriever.invoke(query)
+    if embedding is None:
+        with span("retrieve.embed"):
+            embedding = get_embeddings().embed_query(query)
+    if not HYBRID_SEARCH:
+        # Using MMR to get diverse results
+        with span("retrieve.dense"):
+            dense = vector_store.max_marginal_relevance_search_by_vector(
+                embedding, k=pool, fetch_k=max(20, 2 * pool), filter=where
+            )
+        results = retrieval_filters.apply_quotas(dense, quotas, k)
+        return _fill_quotas(results, embedding, where, quotas, k)
+
+    candidates = 2 * pool
+    with span("retrieve.dense"):
+        dense = vector_store.max_marginal_relevance_search_by_vector(
+            embedding, k=candidates, fetch_k=max(20, 2 * candidates), filter=where
+        )
+    predicate = (lambda meta: retrieval_filters.matches(meta, filters)) if where else None
+    with span("retrieve.lexical"):
+        lexical = get_lexical_index().search(query, k=candidates, predicate=predicate)
+
+    with span("retrieve.fuse") as s:
+        by_id = {doc.id or chunk_id(doc): doc for doc in dense}
+        fused = fuse_rankings([list(by_id), [doc_id for doc_id, _ in lexical]], pool)
+        missing = [doc_id for doc_id in fused if doc_id not in by_id]
+        by_id.update(_get_by_ids(missing))
+        ranked = [by_id[doc_id] for doc_id in fused if doc_id in by_id]
+        s["lexical_only"] = len(missing)
+    results = retrieval_filters.apply_quotas(ranked, quotas, k)
+    return _fill_quotas(results, embedding, where, quotas, k)
+
+def _fill_quotas(results, embedding, where, quotas, k):
+    """
+    When capped modalities crowded out the candidate pool, top up with a
+    dense search that excludes the modalities whose quota is used up.
+    """
+    if not quotas or len(results) >= k:
+        return results
+    full = retrieval_filters.exhausted_types(results, quotas)
+    if not full:
+        return results
+    with span("retrieve.fill_quotas"):
+        extra = get_vector_store().max_marginal_relevance_search_by_vector(
+            embedding, k=k, fetch_k=max(20, 2 * k), filter=retrieval_filters.exclude_types(where, full)
+        )
+    return retrieval_filters.apply_quotas(results + extra, quotas, k)
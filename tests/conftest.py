@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+# Tests import the app as `backend.*` / `utils.*` from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """
+    vector_store wired to a throw-away quantized collection and the hashing
+    embedder, so indexing runs offline.
+    """
+    pytest.importorskip("numpy")
+    pytest.importorskip("langchain_openai")
+    from backend import resources, vector_store
+
+    monkeypatch.setattr(vector_store, "PERSIST_DIRECTORY", str(tmp_path / "store"))
+    monkeypatch.setattr(vector_store, "EMBEDDING_PROVIDER", "hashing")
+    monkeypatch.setattr(vector_store, "VECTOR_BACKEND", "quantized")
+    names = ("embedding_cache", "embeddings", "vector_store", "lexical_index")
+    for name in names:
+        resources.drop(name)
+    yield vector_store
+    for name in names:
+        resources.drop(name)
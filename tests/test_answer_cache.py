@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from backend.answer_cache import AnswerCache
+
+RESULT = {"answer": "Paris", "sources": [{"citation_ref": "a.pdf Page 1"}]}
+
+
+def test_exact_and_paraphrase_hits():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put("What is the capital of France?", [1.0, 0.0, 0.1], 1, RESULT)
+
+    assert cache.get_exact("  what is the capital of france ", 1) == RESULT
+    assert cache.get_similar([1.0, 0.05, 0.1], 1) == RESULT
+    assert cache.get_similar([0.0, 1.0, 0.0], 1) is None
+    # Same question under a different filter scope is a different answer
+    assert cache.get_exact("What is the capital of France?", 1, scope="types=pdf") is None
+
+
+def test_new_corpus_version_drops_everything():
+    cache = AnswerCache()
+    cache.put("q", [1.0, 0.0], 1, RESULT)
+
+    assert cache.get_exact("q", 2) is None
+    assert cache.get_similar([1.0, 0.0], 2) is None
+    # An answer computed against the old corpus is not stored
+    cache.put("q", [1.0, 0.0], 1, RESULT)
+    assert cache.get_exact("q", 2) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2)
+    for query in ("a", "b"):
+        cache.put(query, None, 1, RESULT)
+    cache.get_exact("a", 1)
+    cache.put("c", None, 1, RESULT)
+
+    assert cache.get_exact("b", 1) is None
+    assert cache.get_exact("a", 1) == RESULT
@@ -0,0 +1,132 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+from backend import artifacts
+
+
+@pytest.fixture(autouse=True)
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+
+
+def _describe(text):
+    calls = []
+
+    def extract(file_path, file_name, failures):
+        calls.append(file_name)
+        return [Document(page_content=text, metadata={"source": file_name, "media_url": f"/static/{file_name}"})]
+
+    return extract, calls
+
+
+def test_saved_artifact_loads_under_the_new_name():
+    doc = Document(page_content="a chart", metadata={"source": "a.png", "media_url": "/static/a.png",
+                                                     "citation_ref": "a.png (Image Analysis)"})
+    artifacts.save("ab" * 32, "image", 1, "a.png", [doc])
+
+    loaded = artifacts.load("ab" * 32, "image", 1, "b.png")
+
+    assert [d.page_content for d in loaded] == ["a chart"]
+    assert loaded[0].metadata == {"source": "b.png", "media_url": "/static/b.png",
+                                  "citation_ref": "b.png (Image Analysis)"}
+    assert artifacts.load("ab" * 32, "image", 2) is None
+
+
+def test_stored_extraction_is_reused(tmp_path):
+    image = tmp_path / "a.png"
+    image.write_bytes(b"v1")
+    extract, calls = _describe("a chart")
+
+    first = artifacts.extract_cached(str(image), "a.png", "image", 1, extract)
+    second = artifacts.extract_cached(str(image), "a.png", "image", 1, extract)
+
+    assert calls == ["a.png"]
+    assert [d.page_content for d in second] == [d.page_content for d in first] == ["a chart"]
+
+
+def test_failed_extraction_is_not_stored(tmp_path):
+    image = tmp_path / "a.png"
+    image.write_bytes(b"v1")
+    calls = []
+
+    def extract(file_path, file_name, failures):
+        calls.append(file_name)
+        failures.append(RuntimeError("vision call failed"))
+        return [Document(page_content="partial", metadata={"source": file_name})]
+
+    for _ in range(2):
+        with pytest.raises(artifacts.PartialExtractionError, match="vision call failed"):
+            list(artifacts.extract_cached(str(image), "a.png", "image", 1, extract))
+
+    assert calls == ["a.png", "a.png"]
+    assert list(artifacts.iter_latest()) == []
+
+
+def test_latest_follows_the_most_recent_upload(tmp_path):
+    image = tmp_path / "report.png"
+    for version in ("v1", "v2", "v1"):
+        image.write_bytes(version.encode())
+        extract, _ = _describe(f"report {version}")
+        artifacts.extract_cached(str(image), "report.png", "image", 1, extract)
+
+    records = list(artifacts.iter_latest())
+
+    assert [r["file_name"] for r in records] == ["report.png"]
+    assert [d["page_content"] for d in records[0]["documents"]] == ["report v1"]
+
+
+def test_latest_renames_content_uploaded_under_another_name(tmp_path):
+    image = tmp_path / "upload"
+    image.write_bytes(b"same")
+    extract, calls = _describe("a chart")
+    artifacts.extract_cached(str(image), "a.png", "image", 1, extract)
+    artifacts.extract_cached(str(image), "b.png", "image", 1, extract)
+
+    records = {r["file_name"]: r for r in artifacts.iter_latest()}
+
+    assert calls == ["a.png"]
+    assert sorted(records) == ["a.png", "b.png"]
+    assert records["b.png"]["documents"][0]["metadata"]["source"] == "b.png"
+
+
+def test_reindex_restores_sources_from_artifacts(store, tmp_path):
+    from backend import reindex
+
+    notes = tmp_path / "notes.txt"
+    notes.write_text("quarterly revenue grew in the north region", encoding="utf-8")
+    artifacts.save(artifacts.file_hash(str(notes)), "text", 1, "notes.txt", [], extra={"path": str(notes)})
+    doc = Document(page_content="a bar chart of churn", metadata={"source": "chart.png", "type": "image"})
+    artifacts.save("cd" * 32, "image", 1, "chart.png", [doc])
+
+    result = reindex.reindex(reset=True)
+
+    assert result["sources"] == 2
+    assert store.count_chunks("notes.txt") == 1
+    assert store.count_chunks("chart.png") == 1
+
+
+def test_partial_extraction_keeps_earlier_chunks(store, tmp_path):
+    video = tmp_path / "talk.mp4"
+    video.write_bytes(b"v1")
+    full, _ = _describe("intro")
+
+    def extract(file_path, file_name, failures):
+        docs = full(file_path, file_name, failures)
+        docs.append(Document(page_content="closing remarks", metadata={"source": file_name}))
+        return docs
+
+    store.add_documents(artifacts.extract_cached(str(video), "talk.mp4", "video", 1, extract))
+    assert store.count_chunks("talk.mp4") == 2
+
+    def flaky(file_path, file_name, failures):
+        failures.append(RuntimeError("whisper timeout"))
+        return [Document(page_content="intro, re-transcribed", metadata={"source": file_name})]
+
+    video.write_bytes(b"v2")
+    with pytest.raises(artifacts.PartialExtractionError):
+        store.add_documents(artifacts.extract_cached(str(video), "talk.mp4", "video", 1, flaky))
+
+    assert store.count_chunks("talk.mp4") == 2
+    assert store.get_lexical_index().search("closing remarks", k=5)
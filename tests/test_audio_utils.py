@@ -0,0 +1,38 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pydub")
+pytest.importorskip("speech_recognition")
+
+from pydub import AudioSegment
+from utils.audio_utils import find_split_points
+
+RATE = 8000
+
+
+def _tone(ms):
+    t = np.arange(int(RATE * ms / 1000)) / RATE
+    return (np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16)
+
+
+def _audio(samples):
+    return AudioSegment(samples.tobytes(), frame_rate=RATE, sample_width=2, channels=1)
+
+
+def test_slices_are_cut_in_pauses():
+    # 8 s of speech, 0.5 s pause, 8 s of speech, 0.5 s pause, 8 s of speech
+    silence = np.zeros(RATE // 2, dtype=np.int16)
+    audio = _audio(np.concatenate([_tone(8000), silence, _tone(8000), silence, _tone(8000)]))
+
+    slices = find_split_points(audio, max_chunk_ms=10000, min_chunk_ms=5000)
+
+    assert slices[0][0] == 0 and slices[-1][1] == len(audio)
+    assert all(end - start <= 10000 for start, end in slices)
+    assert 8000 <= slices[0][1] <= 8500
+    assert 16500 <= slices[1][1] <= 17000
+
+
+def test_without_pauses_slices_use_the_full_length():
+    audio = _audio(_tone(25000))
+    assert find_split_points(audio, max_chunk_ms=10000) == [(0, 10000), (10000, 20000), (20000, 25000)]
+    assert find_split_points(_audio(_tone(3000)), max_chunk_ms=10000) == [(0, 3000)]
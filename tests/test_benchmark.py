@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+
+def test_run_restores_settings(store, tmp_path):
+    from backend import benchmark, vector_backends
+
+    data = tmp_path / "wikiqa.txt"
+    data.write_text(
+        "what is a cat\ta cat is a small animal\t1\n"
+        "what is a cat\tthe sky is blue\t0\n"
+        "where is paris\tparis is in france\t1\n",
+        encoding="utf-8",
+    )
+    before = (store.EMBEDDING_PROVIDER, store.HYBRID_SEARCH, store.VECTOR_BACKEND,
+              vector_backends.QUANTIZED_MODE, store.PERSIST_DIRECTORY)
+
+    result = benchmark.run(embedder="hashing", hybrid=not store.HYBRID_SEARCH, path=str(data),
+                           ks=(1, 2), backend="quantized:binary")
+
+    assert result["config"]["hybrid"] is not before[1]
+    assert result["config"]["backend"] == "quantized:binary"
+    assert (store.EMBEDDING_PROVIDER, store.HYBRID_SEARCH, store.VECTOR_BACKEND,
+            vector_backends.QUANTIZED_MODE, store.PERSIST_DIRECTORY) == before
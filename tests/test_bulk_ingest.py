@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+
+def _write_wikiqa(path, sentences):
+    path.write_text("".join(f"question\t{sentence}\t0\n" for sentence in sentences), encoding="utf-8")
+
+
+def test_changed_file_replaces_its_old_chunks(store, tmp_path):
+    from backend import bulk_ingest
+
+    data = tmp_path / "qa.txt"
+    checkpoint = str(tmp_path / "checkpoint.json")
+    _write_wikiqa(data, ["first answer", "second answer", "third answer"])
+    bulk_ingest.bulk_ingest([str(data)], workers=1, checkpoint_path=checkpoint)
+    assert store.count_chunks("qa.txt") == 3
+
+    _write_wikiqa(data, ["first answer", "a new second answer"])
+    bulk_ingest.bulk_ingest([str(data)], workers=1, restart=True, checkpoint_path=checkpoint)
+
+    assert store.count_chunks("qa.txt") == 2
+    assert not store.get_lexical_index().search("third", k=5)
+
+
+def test_resumed_file_keeps_rows_written_earlier(store, tmp_path):
+    from backend import bulk_ingest
+
+    data = tmp_path / "qa.txt"
+    checkpoint = str(tmp_path / "checkpoint.json")
+    _write_wikiqa(data, ["first answer", "second answer", "third answer"])
+    bulk_ingest.bulk_ingest([str(data)], workers=1, batch_size=1, checkpoint_path=checkpoint)
+
+    # Pretend the run stopped after row 2
+    checkpoints = bulk_ingest.load_checkpoints(checkpoint)
+    for state in checkpoints.values():
+        state.update(rows=2, complete=False)
+    bulk_ingest.save_checkpoints(checkpoints, checkpoint)
+    bulk_ingest.bulk_ingest([str(data)], workers=1, batch_size=1, checkpoint_path=checkpoint)
+
+    assert store.count_chunks("qa.txt") == 3
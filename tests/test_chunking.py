@@ -0,0 +1,16 @@
+from langchain_core.documents import Document
+from backend.chunking import chunk_documents, occurrence
+
+
+def test_occurrence_counts_repeats():
+    counts = {}
+    assert [occurrence(counts, text) for text in ["a", "b", "a", "a"]] == [0, 0, 1, 2]
+
+
+def test_repeated_text_in_one_document_is_numbered():
+    page = Document(page_content="Same line.\n\nOther line.\n\nSame line.", metadata={"source": "a.pdf", "page": 1})
+    chunks = list(chunk_documents([page], max_tokens=4, overlap_tokens=0))
+
+    repeats = [(c.page_content, c.metadata.get("occurrence")) for c in chunks]
+    assert repeats == [("Same line.", None), ("Other line.", None), ("Same line.", 1)]
+    assert chunks[0].metadata["offset_start"] != chunks[2].metadata["offset_start"]
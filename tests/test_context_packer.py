@@ -0,0 +1,32 @@
+from langchain_core.documents import Document
+from backend.chunking import count_tokens
+from backend.context_packer import pack_context, DUPLICATE_NOTE
+
+
+def _doc(text, ref):
+    return Document(page_content=text, metadata={"citation_ref": ref})
+
+
+def test_repeated_sentences_are_kept_once_and_every_source_stays_citable():
+    docs = [
+        _doc("The pump failed at noon. Operators restarted it.", "a.pdf Page 1"),
+        _doc("The pump failed at noon.", "a.pdf Page 1 (copy)"),
+    ]
+    context, stats = pack_context(docs, "pump", max_tokens=500)
+
+    assert context.count("The pump failed at noon.") == 1
+    assert DUPLICATE_NOTE in context
+    assert "a.pdf Page 1 (copy)" in context
+    assert stats["duplicates_removed"] == 1
+
+
+def test_budget_keeps_sentences_matching_the_query():
+    filler = " ".join(f"Filler sentence number {i} about nothing." for i in range(60))
+    docs = [_doc(filler + " The valve pressure limit is 40 bar. " + filler, "manual.pdf Page 3")]
+
+    context, stats = pack_context(docs, "valve pressure limit", max_tokens=120)
+
+    assert "The valve pressure limit is 40 bar." in context
+    assert "manual.pdf Page 3" in context
+    assert stats["tokens_out"] <= 120 + count_tokens(" … ") * 10
+    assert stats["tokens_out"] < stats["tokens_in"]
@@ -0,0 +1,36 @@
+import io
+import json
+import tracemalloc
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from utils.document_loaders import process_logs
+
+
+def test_json_lines_records_are_grouped():
+    data = io.BytesIO(b'{"level": "info", "id": 1}\n{"level": "error", "id": 2}\n{"level": "info", "id": 3}\n')
+
+    docs = list(process_logs(data, "application/x-ndjson", "app.jsonl", rows_per_document=2))
+
+    assert [(d.metadata["row_start"], d.metadata["row_end"]) for d in docs] == [(1, 2), (3, 3)]
+    assert json.loads(docs[1].page_content) == {"level": "info", "id": 3}
+
+
+def test_minified_array_is_not_read_whole(tmp_path):
+    path = tmp_path / "events.json"
+    items = [{"id": i, "message": "x" * 200} for i in range(60000)]
+    path.write_text(json.dumps(items, separators=(",", ":")), encoding="utf-8")  # ~13 MB, one line
+    del items
+
+    with open(path, "rb") as f:
+        tracemalloc.start()
+        try:
+            first = next(process_logs(f, "application/json", "events.json", rows_per_document=10))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    assert first.metadata["row_end"] == 10
+    assert json.loads(first.page_content.split("\n\n")[0])["id"] == 0
+    assert peak < 8 * 1024 * 1024
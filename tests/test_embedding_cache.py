@@ -0,0 +1,48 @@
+from langchain_core.embeddings import Embeddings
+from backend.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 0.0]
+
+
+def test_only_misses_reach_the_provider(tmp_path):
+    provider = CountingEmbeddings()
+    embeddings = CachedEmbeddings(provider, EmbeddingCache(str(tmp_path / "cache.sqlite3")), "m", 2)
+
+    assert embeddings.embed_documents(["ab", "abc"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert embeddings.embed_documents(["abc", "abcd", "abcd"]) == [[3.0, 1.0], [4.0, 1.0], [4.0, 1.0]]
+
+    assert provider.calls == [["ab", "abc"], ["abcd"]]
+
+
+def test_queries_and_documents_are_cached_separately(tmp_path):
+    provider = CountingEmbeddings()
+    embeddings = CachedEmbeddings(provider, EmbeddingCache(str(tmp_path / "cache.sqlite3")), "m", 2)
+
+    embeddings.embed_documents(["ab"])
+    assert embeddings.embed_query("ab") == [2.0, 0.0]
+    assert embeddings.embed_query("ab") == [2.0, 0.0]
+    assert provider.calls == [["ab"], ["ab"]]
+
+
+def test_cache_survives_reopen_and_evicts_lru(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, max_bytes=3 * 4 * 4)  # three 4-float vectors
+    cache.put_many([(f"k{i}", [float(i)] * 4) for i in range(3)])
+    cache.get_many(["k0"])  # k1 is now least recently used
+    cache.put_many([("k3", [3.0] * 4)])
+    cache.close()
+
+    reopened = EmbeddingCache(path, max_bytes=3 * 4 * 4)
+    assert sorted(reopened.get_many(["k0", "k1", "k2", "k3"])) == ["k0", "k2", "k3"]
+    assert reopened.stats()["bytes"] == 3 * 4 * 4
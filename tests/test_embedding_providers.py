@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("numpy")
+
+from backend import resources, vector_store
+from backend.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def embedding_cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache.sqlite3"), max_bytes=1024 * 1024)
+    resources.override("embedding_cache", cache)
+    yield cache
+    resources.drop("embedding_cache")
+    resources.register("embedding_cache", vector_store._build_embedding_cache)
+
+
+def test_openai_provider_builds(monkeypatch, embedding_cache):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(vector_store, "EMBEDDING_PROVIDER", "openai")
+
+    embeddings = vector_store._build_embeddings()
+
+    assert embeddings.model_name == f"openai:{vector_store.EMBEDDING_MODEL}"
+    assert embeddings.dimension == 1536
+    assert vector_store._embedding_signature(embeddings) == {
+        "embedding_model": f"openai:{vector_store.EMBEDDING_MODEL}",
+        "embedding_dimension": 1536,
+    }
+
+
+def test_hashing_provider_identity(monkeypatch, embedding_cache):
+    monkeypatch.setattr(vector_store, "EMBEDDING_PROVIDER", "hashing")
+
+    embeddings = vector_store._build_embeddings()
+
+    assert embeddings.model_name.startswith("hashing:hashing-")
+    assert len(embeddings.embed_query("hello world")) == embeddings.dimension
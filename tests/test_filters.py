@@ -0,0 +1,81 @@
+import json
+import sqlite3
+import pytest
+
+from backend import filters
+
+METADATA = [
+    {"source": "a.pdf", "type": "pdf", "page": 1},
+    {"source": "a.pdf", "type": "pdf", "page": 4},
+    {"source": "b.mp4", "type": "video_frame", "start": 5.0, "end": 5.0},
+    {"source": "b.mp4", "type": "video_audio", "start": 0.0, "end": 10.0},
+    {"source": "b.mp4", "type": "video_audio", "start": 10.0, "end": 20.0},
+    {"source": "c.mp3", "type": "audio", "start": 30.0, "end": 45.5},
+    {"source": "d.png", "type": "image"},
+]
+
+FILTERS = [
+    {"types": ["pdf"]},
+    {"types": ["video", "image"]},
+    {"sources": ["a.pdf", "c.mp3"]},
+    {"page_range": [2, 5]},
+    {"page_range": [None, 3]},
+    {"time_range": ["00:10", None]},
+    {"time_range": [None, 10]},
+    {"time_range": [5, "0:40"]},
+    {"types": ["audio", "video"], "sources": ["b.mp4"], "time_range": [0, 9]},
+]
+
+
+@pytest.mark.parametrize("raw", FILTERS, ids=json.dumps)
+def test_to_sql_matches_predicate(raw):
+    normalized = filters.normalize(raw)
+    clause, params = filters.to_sql(filters.to_where(normalized))
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE chunks (i INTEGER, metadata TEXT)")
+    conn.executemany("INSERT INTO chunks VALUES (?, ?)", [(i, json.dumps(m)) for i, m in enumerate(METADATA)])
+
+    selected = {row[0] for row in conn.execute(f"SELECT i FROM chunks WHERE {clause}", params)}
+
+    assert selected == {i for i, m in enumerate(METADATA) if filters.matches(m, normalized)}
+
+
+def _evaluate_expression(expression, metadata):
+    # Milvus filter syntax is close enough to Python for these operators
+    return bool(eval(expression or "True", {}, dict(metadata)))
+
+
+@pytest.mark.parametrize("raw", FILTERS, ids=json.dumps)
+def test_to_expression_matches_predicate(raw):
+    normalized = filters.normalize(raw)
+    expression = filters.to_expression(filters.to_where(normalized))
+    # Milvus treats missing dynamic fields as non-matching; compare on rows that have them
+    fields = {"type", "source"} | ({"page"} if "page_range" in normalized else set()) \
+        | ({"start", "end"} if "time_range" in normalized else set())
+    rows = [m for m in METADATA if fields <= set(m)]
+
+    for metadata in rows:
+        assert _evaluate_expression(expression, metadata) == filters.matches(metadata, normalized), metadata
+
+
+def test_to_sql_empty_in():
+    clause, params = filters.to_sql({"type": {"$in": []}})
+    assert (clause, params) == ("0", [])
+
+
+def test_normalize_expands_modalities_and_times():
+    normalized = filters.normalize({"types": ["video", "pdf"], "time_range": ["1:30", None], "quotas": {"image": "2"}})
+    assert normalized == {"types": ["pdf", "video_audio", "video_frame"], "time_range": [90.0, None],
+                          "quotas": {"image": 2}}
+    with pytest.raises(ValueError):
+        filters.normalize({"types": ["spreadsheet"]})
+
+
+def test_apply_quotas_caps_modalities():
+    from langchain_core.documents import Document
+
+    docs = [Document(id=str(i), page_content="", metadata={"type": t})
+            for i, t in enumerate(["image", "image", "pdf", "image", "pdf"])]
+    selected = filters.apply_quotas(docs, {"image": 1}, k=3)
+    assert [doc.id for doc in selected] == ["0", "2", "4"]
+    assert filters.exhausted_types(selected, {"image": 1}) == ["image"]
@@ -0,0 +1,61 @@
+import threading
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from backend.frames import map_bounded, sample_frames
+
+
+def test_map_bounded_keeps_order_and_limits_in_flight():
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, peak
+
+    def work(n):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.01 * (5 - n % 5))
+        with lock:
+            in_flight[0] -= 1
+        return n * n
+
+    results = list(map_bounded(work, iter(range(12)), max_in_flight=3))
+
+    assert results == [(n, n * n) for n in range(12)]
+    assert in_flight[1] <= 3
+
+
+def _write_video(path, colours, fps=5, seconds_each=4):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (64, 48))
+    for colour in colours:
+        for _ in range(fps * seconds_each):
+            writer.write(np.full((48, 64, 3), colour, dtype=np.uint8))
+    writer.release()
+
+
+def test_scene_changes_and_interval_select_frames(tmp_path):
+    video = tmp_path / "scenes.mp4"
+    _write_video(video, [(0, 0, 0), (255, 255, 255), (0, 0, 255)])
+
+    kept = [t for t, _ in sample_frames(str(video), interval_sec=100, scene_detection=True)]
+    assert kept == pytest.approx([0.0, 4.0, 8.0])
+
+    periodic = [t for t, _ in sample_frames(str(video), interval_sec=5, scene_detection=False)]
+    assert periodic == pytest.approx([0.0, 5.0, 10.0])
+
+
+def test_near_duplicate_frames_are_folded():
+    from backend.frames import dedupe_frames
+
+    dark = np.zeros((48, 64, 3), dtype=np.uint8)
+    dark[:, :32] = 40
+    noisy = dark.copy()
+    noisy[0, 0] = 41
+    ramp = np.tile(np.linspace(0, 255, 64, dtype=np.uint8), (48, 1))
+    bright = np.dstack([ramp] * 3)
+
+    runs = [(start, end) for start, end, _ in dedupe_frames([(0, dark), (1, noisy), (2, bright), (3, dark)], 6)]
+
+    assert runs == [(0, 1), (2, 2), (3, 3)]
@@ -0,0 +1,19 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from backend import image_prep
+
+
+def test_frames_count_toward_bytes_saved():
+    before = image_prep.get_stats()
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(1080, 1920, 3), dtype=np.uint8)
+
+    encoded, mime = image_prep.prepare_frame(frame, max_edge=512)
+
+    after = image_prep.get_stats()
+    assert mime == "image/jpeg"
+    assert after["bytes_out"] - before["bytes_out"] == len(encoded)
+    assert after["bytes_saved"] > before["bytes_saved"]
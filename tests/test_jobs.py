@@ -0,0 +1,89 @@
+import itertools
+import threading
+import time
+import pytest
+
+pytest.importorskip("cv2")
+
+from backend.jobs import JobQueue, DONE, FAILED, QUEUED, RUNNING
+
+
+@pytest.fixture
+def queue(tmp_path, store, monkeypatch):
+    from backend import artifacts
+
+    monkeypatch.setattr(artifacts, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    yield queue
+    queue.close()
+
+
+def _wait(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish: {queue.get(job_id)}")
+
+
+def test_jobs_queued_before_start_run_on_start(queue, tmp_path):
+    notes = tmp_path / "notes.txt"
+    notes.write_text("The pump failed at noon.\n\nOperators restarted it.", encoding="utf-8")
+
+    job_id = queue.submit(str(notes), "notes.txt", "hash-notes")
+    assert queue.get(job_id)["status"] == QUEUED
+
+    queue.start()
+    job = _wait(queue, job_id)
+
+    assert job["status"] == DONE
+    assert job["chunks_added"] >= 1
+    assert set(job["timings"]) >= {"extract", "index", "total"}
+    assert queue.find_by_hash("hash-notes")["id"] == job_id
+    assert queue.hash_of(str(notes)) == "hash-notes"
+
+
+def test_unreadable_file_fails_the_job(queue, tmp_path):
+    broken = tmp_path / "broken.txt"
+    broken.write_bytes(b"valid start. \xff\xfe not utf-8")
+    queue.start()
+
+    job = _wait(queue, queue.submit(str(broken), "broken.txt"))
+
+    assert job["status"] == FAILED
+    assert "utf-8" in job["error"]
+
+
+def test_job_interrupted_by_stop_resumes_on_start(queue, tmp_path, monkeypatch):
+    from backend import vector_store
+
+    notes = tmp_path / "notes.txt"
+    notes.write_text("\n\n".join(f"Shift {i}: the pump ran at {i * 7} rpm." * 40 for i in range(20)),
+                     encoding="utf-8")
+    add_documents = vector_store.add_documents
+    indexing = threading.Event()
+
+    def stalled(documents):
+        iterator = iter(documents)
+        first = next(iterator)
+        indexing.set()
+        while not queue._stopping:
+            time.sleep(0.01)
+        return add_documents(itertools.chain([first], iterator))
+
+    monkeypatch.setattr(vector_store, "add_documents", stalled)
+    queue.start()
+    job_id = queue.submit(str(notes), "notes.txt")
+    assert indexing.wait(10)
+    queue.stop()
+
+    assert queue.get(job_id)["status"] == RUNNING
+
+    monkeypatch.setattr(vector_store, "add_documents", add_documents)
+    queue.start()
+    job = _wait(queue, job_id)
+
+    assert job["status"] == DONE
+    assert job["chunks_added"] > 1
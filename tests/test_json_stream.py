@@ -0,0 +1,19 @@
+import io
+from utils.json_stream import iter_json_items, iter_json_lines
+
+
+def test_object_members_are_streamed_across_reads():
+    text = '{"intro": {"title": "Intro", "text": ["a", "b"]}, "escaped \\" key": [1, 2.5, null, true]}'
+    items = list(iter_json_items(io.StringIO(text), read_chars=7))
+    assert items == [("intro", {"title": "Intro", "text": ["a", "b"]}), ('escaped " key', [1, 2.5, None, True])]
+
+
+def test_arrays_scalars_and_empty_input():
+    assert list(iter_json_items(io.StringIO(' [ {"a": 1}, "x" ] '))) == [(0, {"a": 1}), (1, "x")]
+    assert list(iter_json_items(io.StringIO("[]"))) == []
+    assert list(iter_json_items(io.StringIO("42"))) == [(0, 42)]
+    assert list(iter_json_items(io.StringIO(""))) == []
+
+
+def test_json_lines_skip_blank_lines():
+    assert list(iter_json_lines(io.StringIO('{"a": 1}\n\n[2]\n'))) == [(1, {"a": 1}), (3, [2])]
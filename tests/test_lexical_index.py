@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from backend.lexical_index import LexicalIndex, tokenize
+
+
+def test_tokenize_keeps_compound_tokens_and_parts():
+    assert tokenize("Crash on SM-G973F in the app") == ["crash", "sm-g973f", "sm", "g973f", "app"]
+
+
+def test_exact_tokens_rank_first_and_survive_reopen(tmp_path):
+    path = str(tmp_path / "lexical.sqlite3")
+    index = LexicalIndex(path)
+    index.add([
+        ("a", "Bug 1600002 crashes the renderer", {"type": "text"}),
+        ("b", "the renderer is slow on large pages", {"type": "pdf"}),
+        ("c", "unrelated release notes", {"type": "text"}),
+    ])
+    assert index.search("bug 1600002", k=2)[0][0] == "a"
+    index.close()
+
+    reopened = LexicalIndex(path)
+    assert len(reopened) == 3
+    assert [doc_id for doc_id, _ in reopened.search("renderer", k=5)] in (["a", "b"], ["b", "a"])
+    assert [doc_id for doc_id, _ in reopened.search("renderer", k=5, predicate=lambda m: m["type"] == "pdf")] == ["b"]
+
+    reopened.remove(["a"])
+    assert "a" not in reopened
+    assert reopened.search("1600002") == []
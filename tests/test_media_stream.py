@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("imageio_ffmpeg")
+
+from utils.media_stream import iter_audio_windows
+
+
+def test_decode_failure_raises(tmp_path):
+    corrupt = tmp_path / "corrupt.mp4"
+    corrupt.write_bytes(b"not a media file" * 64)
+
+    with pytest.raises(RuntimeError, match="ffmpeg exited"):
+        list(iter_audio_windows(str(corrupt), window_seconds=1))
+
+
+def test_windows_cover_the_track(tmp_path):
+    import subprocess
+    from utils.media_stream import ffmpeg_binary
+
+    tone = tmp_path / "tone.wav"
+    subprocess.run([ffmpeg_binary(), "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=3",
+                    str(tone)], check=True)
+
+    windows = list(iter_audio_windows(str(tone), window_seconds=1))
+
+    assert len(windows) >= 3
+    assert windows[-1][1] == pytest.approx(3.0, abs=0.05)
+
+
+def test_video_without_audio_yields_nothing(tmp_path):
+    import subprocess
+    from utils.media_stream import ffmpeg_binary
+
+    silent = tmp_path / "silent.mp4"
+    subprocess.run([ffmpeg_binary(), "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=duration=2:size=64x64:rate=5",
+                    "-pix_fmt", "yuv420p", str(silent)], check=True)
+
+    assert list(iter_audio_windows(str(silent), window_seconds=1)) == []
@@ -0,0 +1,54 @@
+import pytest
+from langchain_core.documents import Document
+
+
+@pytest.fixture
+def rag(store):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from backend import rag, resources
+
+    llm = FakeListChatModel(responses=["The pump failed [Source: log.txt row 1]."])
+    resources.override("llm", llm)
+    resources.drop("answer_cache")
+    store.add_documents([
+        Document(page_content="The pump failed at noon.", metadata={
+            "source": "log.txt", "type": "text", "row": 1, "citation_ref": "log.txt row 1"}),
+    ])
+    yield rag
+    resources.register("llm", rag._build_llm)
+    resources.drop("answer_cache")
+
+
+def test_stream_sends_sources_then_tokens_then_done(rag):
+    events = list(rag.stream_answer("When did the pump fail?"))
+
+    assert events[0]["event"] == "sources"
+    assert events[0]["sources"][0]["citation_ref"] == "log.txt row 1"
+    assert {e["event"] for e in events[1:-1]} == {"token"}
+    assert len(events) > 3  # streamed in pieces
+    assert events[-1]["event"] == "done" and not events[-1]["cached"]
+    assert "".join(e["text"] for e in events[1:-1]) == events[-1]["answer"]
+    assert events[-1]["context"]["tokens_out"] > 0
+
+
+def test_cached_until_ingestion_changes_the_corpus(rag, store):
+    first = rag.answer_query("When did the pump fail?")
+    events = list(rag.stream_answer("when did the pump fail"))
+    assert events[-1]["cached"] and events[-1]["answer"] == first["answer"]
+
+    store.add_documents([Document(page_content="The pump was replaced.", metadata={
+        "source": "log.txt", "type": "text", "row": 2})])
+    assert not list(rag.stream_answer("When did the pump fail?"))[-1]["cached"]
+
+
+def test_batch_answers_duplicates_once_with_one_embedding_call(rag, store, monkeypatch):
+    calls = []
+    embeddings = store.get_embeddings()
+    original = embeddings.embed_queries
+    monkeypatch.setattr(embeddings, "embed_queries", lambda texts: calls.append(list(texts)) or original(texts))
+
+    results = list(rag.answer_batch(["When did the pump fail?", "when did the pump fail", "Who fixed it?"]))
+
+    assert sorted(r["index"] for r in results) == [0, 1, 2]
+    assert all("error" not in r for r in results)
+    assert calls == [["When did the pump fail?", "Who fixed it?"]]
@@ -0,0 +1,55 @@
+import pytest
+from backend import resources
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """
+    Register test resources in a copy of the registry, so later warm_up()
+    and reload() calls never build them.
+    """
+    monkeypatch.setattr(resources, "_factories", dict(resources._factories))
+    monkeypatch.setattr(resources, "_resources", dict(resources._resources))
+    monkeypatch.setattr(resources, "_dependents", {k: set(v) for k, v in resources._dependents.items()})
+
+
+class Closable:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_resources_are_shared_and_rebuilt_with_dependents():
+    built = []
+
+    def base():
+        built.append("base")
+        return Closable()
+
+    def dependent():
+        built.append("dependent")
+        return (resources.get("test_base"), Closable())
+
+    resources.register("test_base", base)
+    resources.register("test_dependent", dependent)
+    first = resources.get("test_dependent")
+    assert resources.get("test_dependent") is first
+    assert built == ["dependent", "base"]
+
+    replacement = Closable()
+    resources.override("test_base", replacement)
+    assert first[0].closed
+    assert not resources.is_loaded("test_dependent")
+    assert resources.get("test_dependent")[0] is replacement
+
+
+def test_warm_up_reports_failures():
+    def broken():
+        raise RuntimeError("no key")
+
+    resources.register("test_broken", broken)
+    assert resources.warm_up(["test_broken"]) == {"test_broken": "no key"}
+    assert not resources.is_loaded("test_broken")
+
@@ -0,0 +1,35 @@
+import pytest
+from backend import telemetry
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch):
+    monkeypatch.setattr(telemetry, "TELEMETRY_ENABLED", True)
+    telemetry.reset()
+    yield
+    telemetry.reset()
+
+
+def test_spans_record_durations_quantities_and_errors():
+    with telemetry.span("test.stage", chunks=3) as s:
+        s["bytes"] = 10
+    with pytest.raises(ValueError):
+        with telemetry.span("test.stage"):
+            raise ValueError("boom")
+
+    text = telemetry.render()
+    assert 'rag_stage_duration_seconds_count{stage="test.stage"} 2' in text
+    assert 'rag_stage_chunks_total{stage="test.stage"} 3' in text
+    assert 'rag_stage_bytes_total{stage="test.stage"} 10' in text
+    assert 'rag_stage_errors_total{stage="test.stage"} 1' in text
+    assert "# TYPE rag_stage_duration_seconds histogram" in text
+
+
+def test_traced_iter_counts_items_of_an_abandoned_stream():
+    items = telemetry.traced_iter("test.iter", iter(range(10)))
+    next(items)
+    next(items)
+    items.close()
+
+    assert 'rag_stage_items_total{stage="test.iter"} 2' in telemetry.render()
+    assert "rag_stage_errors_total" not in telemetry.render()
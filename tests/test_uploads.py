@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("python_multipart")
+pytest.importorskip("starlette")
+
+from backend.uploads import store_upload
+
+
+def _partial(directory, content):
+    path = directory / ".upload.part"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_same_content_reuses_name_without_rereading(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"hello")
+    looked_up = []
+
+    def stored_hash(path):
+        looked_up.append(path)
+        return "h1"
+
+    name = store_upload(_partial(tmp_path, b"world"), str(tmp_path), "a.txt", "h1", stored_hash)
+
+    assert name == "a.txt"
+    assert looked_up == [str(tmp_path / "a.txt")]
+    assert (tmp_path / "a.txt").read_bytes() == b"world"
+
+
+def test_unknown_existing_file_is_kept(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"hello")
+
+    name = store_upload(_partial(tmp_path, b"hello"), str(tmp_path), "a.txt", "abcdef0123456789", lambda path: None)
+
+    assert name == "a-abcdef012345.txt"
+    assert (tmp_path / "a.txt").read_bytes() == b"hello"
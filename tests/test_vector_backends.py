@@ -0,0 +1,157 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend import vector_backends
+from backend.vector_backends import QuantizedBackend
+
+DIMENSION = 8
+SIGNATURE = {"embedding_model": "test", "embedding_dimension": DIMENSION}
+
+
+def _vector(axis, noise=0.0):
+    vector = np.full(DIMENSION, noise, dtype=np.float32)
+    vector[axis] = 1.0
+    return vector.tolist()
+
+
+def _upsert(backend, rows):
+    """rows: (id, axis, type)"""
+    backend.upsert(
+        [doc_id for doc_id, _, _ in rows],
+        [_vector(axis, 0.01 * i) for i, (_, axis, _) in enumerate(rows)],
+        [f"text {doc_id}" for doc_id, _, _ in rows],
+        [{"source": "a.pdf", "type": doc_type, "page": axis + 1} for _, axis, doc_type in rows],
+    )
+
+
+def _chroma(path):
+    pytest.importorskip("chromadb")
+    return vector_backends.ChromaBackend(str(path), "test")
+
+
+def _milvus(path):
+    pytest.importorskip("milvus_lite")
+    return vector_backends.MilvusBackend(str(path), "test", index_type="FLAT")
+
+
+BACKENDS = {
+    "chroma": _chroma,
+    "milvus": _milvus,
+    "quantized-int8": lambda path: QuantizedBackend(str(path), "test", mode="int8"),
+    "quantized-binary": lambda path: QuantizedBackend(str(path), "test", mode="binary"),
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request, tmp_path):
+    backend = BACKENDS[request.param](tmp_path)
+    backend.open(SIGNATURE)
+    yield backend
+    backend.close()
+
+
+def test_open_records_signature(backend):
+    assert backend.metadata()["embedding_dimension"] == DIMENSION
+    assert backend.metadata()["embedding_model"] == "test"
+    assert backend.stored_dimension() in (None, DIMENSION)
+
+
+def test_upsert_get_delete(backend):
+    _upsert(backend, [("a", 0, "pdf"), ("b", 1, "pdf"), ("c", 2, "image")])
+    backend.flush()
+    assert backend.count() == 3
+    assert backend.stored_dimension() == DIMENSION
+
+    # Upserting an existing ID replaces it
+    _upsert(backend, [("a", 3, "audio")])
+    backend.flush()
+    assert backend.count() == 3
+    assert [doc.metadata["type"] for doc in backend.get(["a"])] == ["audio"]
+
+    backend.delete(["b"])
+    backend.flush()
+    assert backend.count() == 2
+    assert sorted(doc.id for doc in backend.get(["a", "b", "c"])) == ["a", "c"]
+    assert sorted(doc.id for docs in backend.scan(batch_size=1) for doc in docs) == ["a", "c"]
+
+
+def test_nearest_and_filters(backend):
+    _upsert(backend, [("a", 0, "pdf"), ("b", 1, "pdf"), ("c", 2, "image"), ("d", 3, "image")])
+    backend.flush()
+
+    hits = backend.nearest(_vector(2), k=2)
+    assert hits[0][0].id == "c"
+    assert len(hits) == 2
+    assert len(hits[0][1]) == DIMENSION
+
+    where = {"type": {"$in": ["pdf"]}}
+    assert [doc.id for doc, _ in backend.nearest(_vector(2), k=4, where=where)] in (["a", "b"], ["b", "a"])
+    assert sorted(backend.ids(where)) == ["a", "b"]
+    assert backend.nearest(_vector(0), k=3, where={"type": {"$in": ["video_frame"]}}) == []
+
+    mmr = backend.max_marginal_relevance_search_by_vector(_vector(1), k=2, fetch_k=4)
+    assert mmr[0].id == "b"
+
+
+def test_drop(backend):
+    _upsert(backend, [("a", 0, "pdf")])
+    backend.drop()
+    backend.open(SIGNATURE)
+    assert backend.count() == 0
+
+
+def test_quantized_reuses_freed_slots(tmp_path):
+    backend = QuantizedBackend(str(tmp_path), "test")
+    backend.open(SIGNATURE)
+    _upsert(backend, [("a", 0, "pdf"), ("b", 1, "pdf"), ("c", 2, "pdf")])
+    backend.delete(["b"])
+
+    _upsert(backend, [("d", 4, "pdf")])
+
+    assert backend.size == 3
+    assert [doc.id for doc, _ in backend.nearest(_vector(4), k=1)] == ["d"]
+    assert "b" not in [doc.id for doc, _ in backend.nearest(_vector(1), k=3)]
+    backend.close()
+
+
+def test_quantized_grows_and_persists(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_backends, "QUANTIZED_INITIAL_CAPACITY", 2)
+    backend = QuantizedBackend(str(tmp_path), "test")
+    backend.open(SIGNATURE)
+    rows = [(f"id{i}", i % DIMENSION, "pdf" if i % 2 else "image") for i in range(20)]
+    _upsert(backend, rows)
+    backend.delete(["id5"])
+    backend.close()
+
+    reopened = QuantizedBackend(str(tmp_path), "test")
+    reopened.open(SIGNATURE)
+    assert reopened.count() == 19
+    assert reopened._free == [5]
+    hits = reopened.nearest(_vector(3), k=2, where={"type": "pdf"})
+    assert {doc.id for doc, _ in hits} == {"id3", "id11"}
+    reopened.close()
+
+
+@pytest.mark.parametrize("first, second", [("int8", "binary"), ("binary", "int8")])
+def test_quantized_mode_switch_reencodes(tmp_path, first, second):
+    backend = QuantizedBackend(str(tmp_path), "test", mode=first)
+    backend.open(SIGNATURE)
+    _upsert(backend, [("a", 0, "pdf"), ("b", 1, "pdf"), ("c", 2, "image")])
+    backend.close()
+
+    switched = QuantizedBackend(str(tmp_path), "test", mode=second)
+    switched.open(SIGNATURE)
+
+    assert switched.metadata()["quantization"] == second
+    assert [doc.id for doc, _ in switched.nearest(_vector(1), k=1)] == ["b"]
+    assert [doc.id for doc, _ in switched.nearest(_vector(1), k=1, where={"type": "image"})] == ["c"]
+    switched.close()
+
+
+def test_quantized_rejects_wrong_dimension(tmp_path):
+    backend = QuantizedBackend(str(tmp_path), "test")
+    backend.open(SIGNATURE)
+    with pytest.raises(ValueError):
+        backend.upsert(["a"], [[1.0, 0.0]], ["text"], [{}])
+    backend.close()
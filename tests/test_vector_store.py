@@ -0,0 +1,89 @@
+from langchain_core.documents import Document
+
+
+def _chunks(source, texts):
+    return [Document(page_content=text, metadata={"source": source, "type": "text", "row": i})
+            for i, text in enumerate(texts)]
+
+
+def test_add_documents_removes_chunks_no_longer_produced(store):
+    store.add_documents(_chunks("notes.txt", ["alpha one", "beta two", "gamma three"]))
+    assert store.count_chunks("notes.txt") == 3
+
+    store.add_documents(_chunks("notes.txt", ["alpha one", "beta two"]))
+
+    assert store.count_chunks("notes.txt") == 2
+
+
+def test_failed_extraction_deletes_nothing(store):
+    store.add_documents(_chunks("notes.txt", ["alpha one", "beta two", "gamma three"]))
+
+    def truncated():
+        yield _chunks("notes.txt", ["alpha one changed"])[0]
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    try:
+        store.add_documents(truncated())
+    except UnicodeDecodeError:
+        pass
+    else:
+        raise AssertionError("extraction error was swallowed")
+
+    assert store.count_chunks("notes.txt") == 3
+
+
+def test_concurrent_corpus_version_bumps_are_not_lost(store):
+    from concurrent.futures import ThreadPoolExecutor
+
+    before = store.get_corpus_version()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: store._bump_corpus_version(), range(40)))
+
+    assert store.get_corpus_version() == before + 40
+
+
+def test_moved_chunks_get_fresh_citations(store):
+    doc = Document(page_content="alpha one", metadata={
+        "source": "notes.txt", "type": "text", "offset_start": 0, "offset_end": 9,
+        "citation_ref": "notes.txt chars 0-9",
+    })
+    store.add_documents([doc])
+
+    # Text inserted before the chunk: same ID, new offsets
+    moved = Document(page_content="alpha one", metadata={
+        "source": "notes.txt", "type": "text", "offset_start": 20, "offset_end": 29,
+        "citation_ref": "notes.txt chars 20-29",
+    })
+    store.add_documents([moved])
+
+    stored = store.get_vector_store().get([store.chunk_id(moved)])
+    assert [d.metadata["citation_ref"] for d in stored] == ["notes.txt chars 20-29"]
+
+
+def test_fuse_rankings_rewards_agreement(store):
+    # c: 1/63 + 1/61 edges out b: 1/62 + 1/62; both beat a single first place
+    assert store.fuse_rankings([["a", "b", "c"], ["c", "b", "d"]], k=3) == ["c", "b", "a"]
+
+
+def test_hybrid_query_finds_exact_tokens(store):
+    store.add_documents([
+        Document(page_content="Bug 1600002: renderer crash on startup", metadata={"source": "bugs.csv", "type": "text", "row": 1}),
+        Document(page_content="General notes about rendering performance", metadata={"source": "bugs.csv", "type": "text", "row": 2}),
+        Document(page_content="A picture of a cat", metadata={"source": "cat.png", "type": "image"}),
+    ])
+
+    results = store.query_documents("1600002", k=2)
+    assert results[0].metadata["row"] == 1
+
+
+def test_filters_and_quotas_are_pushed_into_retrieval(store):
+    store.add_documents(
+        [Document(page_content=f"cat photo {i}", metadata={"source": f"cat{i}.png", "type": "image"}) for i in range(3)]
+        + [Document(page_content="cat care manual", metadata={"source": "cats.pdf", "type": "pdf", "page": 2})]
+    )
+
+    images = store.query_documents("cat", k=5, filters={"types": ["image"]})
+    assert {doc.metadata["type"] for doc in images} == {"image"}
+
+    capped = store.query_documents("cat", k=3, filters={"quotas": {"image": 1}})
+    assert sorted(doc.metadata["type"] for doc in capped) == ["image", "pdf"]
@@ -1,11 +1,21 @@
-import tempfile
-import os
+import io
+import numpy as np
 import speech_recognition as sr
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
 
 recognizer = sr.Recognizer()
 
+TRANSCRIBE_WORKERS = 4
+MIN_CHUNK_SECONDS = 5  # never cut a slice shorter than this
+ANALYSIS_WINDOW_MS = 20  # resolution of the silence search
+SILENCE_RATIO = 0.1  # a pause is at least 20 dB quieter than the slice's median energy
+
+
 def transcribe_audio(file_path):
+    """
+    Transcribe a WAV file. `file_path` may also be a file-like object (e.g. BytesIO).
+    """
     with sr.AudioFile(file_path) as source:
         audio = recognizer.record(source)
     try:
@@ -15,24 +25,76 @@ def transcribe_audio(file_path):
     except sr.RequestError:
         return "Could not request results from Google Speech Recognition service."
 
+
+def find_split_points(audio, max_chunk_ms, min_chunk_ms=MIN_CHUNK_SECONDS * 1000, window_ms=ANALYSIS_WINDOW_MS):
+    """
+    Return (start_ms, end_ms) slices no longer than max_chunk_ms, each cut at the
+    quietest point (lowest RMS energy) found in the allowed range, so words are not
+    cut in half. Energy is computed from the PCM samples with NumPy. Without a
+    pause in range the slice is cut at max_chunk_ms.
+    """
+    duration_ms = len(audio)
+    if duration_ms <= max_chunk_ms:
+        return [(0, duration_ms)] if duration_ms else []
+
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    if audio.channels > 1:
+        samples = samples.reshape(-1, audio.channels).mean(axis=1)
+
+    per_window = max(1, int(audio.frame_rate * window_ms / 1000))
+    n_windows = len(samples) // per_window
+    windows = samples[:n_windows * per_window].reshape(n_windows, per_window)
+    rms = np.sqrt(np.mean(windows * windows, axis=1))
+
+    min_chunk_ms = min(min_chunk_ms, max_chunk_ms)
+    slices = []
+    start = 0
+    while duration_ms - start > max_chunk_ms:
+        lo = (start + min_chunk_ms) // window_ms
+        hi = min((start + max_chunk_ms) // window_ms, n_windows)
+        span = rms[lo:hi]
+        if hi <= lo or span.min() > SILENCE_RATIO * np.median(rms[start // window_ms:hi]):
+            # No real pause in range: take the longest slice allowed
+            cut = start + max_chunk_ms
+        else:
+            # Latest of the quietest windows, so slices stay as long as possible
+            quiet = np.flatnonzero(span <= span.min() * 1.1 + 1e-6)
+            cut = (lo + int(quiet[-1])) * window_ms + window_ms // 2
+        slices.append((start, cut))
+        start = cut
+    slices.append((start, duration_ms))
+    return slices
+
+
+def _to_wav_buffer(segment):
+    buffer = io.BytesIO()
+    segment.export(buffer, format="wav")
+    buffer.seek(0)
+    return buffer
+
+
+def extract_audio_segments(uploaded_audio, chunk_duration=30, workers=TRANSCRIBE_WORKERS):
+    """
+    Split audio at silences into slices of at most `chunk_duration` seconds and
+    transcribe them concurrently. Slices never touch the disk.
+    Returns [{"start": sec, "end": sec, "text": str}] in playback order.
+    """
+    audio = AudioSegment.from_file(uploaded_audio)
+    slices = find_split_points(audio, chunk_duration * 1000)
+
+    def transcribe_slice(bounds):
+        start_ms, end_ms = bounds
+        return transcribe_audio(_to_wav_buffer(audio[start_ms:end_ms]))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        texts = list(executor.map(transcribe_slice, slices))
+
+    return [
+        {"start": start_ms / 1000, "end": end_ms / 1000, "text": text}
+        for (start_ms, end_ms), text in zip(slices, texts)
+    ]
+
+
 def extract_audio_text(uploaded_audio, chunk_duration=30):
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-        temp_audio.write(uploaded_audio.read())
-        temp_audio_path = temp_audio.name
-
-    audio = AudioSegment.from_file(temp_audio_path)
-    duration_seconds = len(audio) // 1000
-
-    chunks = [audio[start * 1000:(start + chunk_duration) * 1000]
-              for start in range(0, duration_seconds, chunk_duration)]
-
-    full_text = []
-    for chunk in chunks:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as chunk_file:
-            chunk.export(chunk_file.name, format="wav")
-            text = transcribe_audio(chunk_file.name)
-            full_text.append(text)
-            os.remove(chunk_file.name)
-
-    os.remove(temp_audio_path)
-    return " ".join(full_text)
+    segments = extract_audio_segments(uploaded_audio, chunk_duration)
+    return " ".join(segment["text"] for segment in segments)
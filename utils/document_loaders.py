@@ -1,56 +1,146 @@
 import pandas as pd
 import yaml
 import json
+import csv
+import io
+import itertools
 import tempfile
 import os
-from pathlib import Path
+import sys
 from langchain_core.documents import Document
+from utils.json_stream import iter_json_items, iter_json_lines
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.document_loaders.csv_loader import CSVLoader
 from langchain_community.document_loaders import UnstructuredWordDocumentLoader, Docx2txtLoader
 
 
-def process_logs(uploaded_log, file_type, file_name):
-    """Process logs in CSV, JSON, or YAML format."""
-    documents = []
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(uploaded_log.read())
-        temp_file_path = temp_file.name
-
+LOG_ROWS_PER_DOCUMENT = int(os.getenv("LOG_ROWS_PER_DOCUMENT", "50"))
+JSON_LINES_MAX_LINE = 1024 * 1024  # chars read to tell JSON-lines from one JSON document
+
+CSV_TYPES = ["application/vnd.ms-excel", "text/csv"]
+JSON_TYPES = ["application/json", "application/x-ndjson", "application/jsonl"]
+YAML_TYPES = ["application/x-yaml", "application/yaml", "text/yaml"]
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+class _PrefixedReader:
+    """Text reader that replays already-consumed text before the rest of a stream."""
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        if self.prefix:
+            if size is None or size < 0:
+                data, self.prefix = self.prefix + self.stream.read(), ""
+                return data
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            return data
+        return self.stream.read(size)
+
+
+def _csv_rows(stream):
+    for row, record in enumerate(csv.DictReader(stream), start=1):
+        yield row, "\n".join(f"{key}: {value}" for key, value in record.items() if key is not None)
+
+
+def _json_rows(stream):
+    """
+    JSON array items, top-level object members, or JSON-lines records (one compact line each).
+    The format is detected from the first JSON_LINES_MAX_LINE chars, so a minified
+    one-line document is never read whole.
+    """
+    first_line = stream.readline(JSON_LINES_MAX_LINE)
+    rest = _PrefixedReader(first_line, stream)
+    stripped = first_line.strip()
+    complete = first_line.endswith("\n") or len(first_line) < JSON_LINES_MAX_LINE
+    is_json_lines = False
+    if complete and stripped.startswith("{"):
+        try:
+            json.loads(stripped)
+            is_json_lines = True
+        except ValueError:
+            pass
+    if is_json_lines:
+        for row, value in iter_json_lines(itertools.chain([first_line], stream)):
+            yield row, json.dumps(value, ensure_ascii=False)
+        return
+    for row, (key, value) in enumerate(iter_json_items(rest), start=1):
+        entry = {key: value} if isinstance(key, str) else value
+        yield row, json.dumps(entry, ensure_ascii=False)
+
+
+def _yaml_rows(stream):
+    """Every document of a multi-document YAML stream; list documents yield their items."""
+    row = 0
+    for data in yaml.safe_load_all(stream):
+        for entry in (data if isinstance(data, list) else [data]):
+            row += 1
+            yield row, yaml.dump(entry)
+
+
+def _group_rows(rows, source, file_name, rows_per_document):
+    batch, first = [], None
+    for row, text in rows:
+        if first is None:
+            first = row
+        batch.append(text)
+        if len(batch) >= rows_per_document:
+            yield _rows_document(batch, first, row, source, file_name)
+            batch, first = [], None
+    if batch:
+        yield _rows_document(batch, first, row, source, file_name)
+
+
+def _rows_document(texts, row_start, row_end, source, file_name):
+    return Document(
+        page_content="\n\n".join(texts),
+        metadata={
+            "source": source,
+            "file_name": file_name,
+            "row_start": row_start,
+            "row_end": row_end,
+            "citation_ref": f"{file_name} rows {row_start}-{row_end}",
+        }
+    )
+
+
+def process_logs(uploaded_log, file_type, file_name, rows_per_document=None):
+    """
+    Process logs in CSV, JSON (array, object or JSON-lines), or YAML format.
+
+    Returns a generator: the file is parsed incrementally and every
+    `rows_per_document` records become one Document, so memory is bounded
+    by one group of rows rather than by the file. Keep `uploaded_log` open
+    until the generator is exhausted.
+    """
+    rows_per_document = rows_per_document or LOG_ROWS_PER_DOCUMENT
+    suffix = os.path.splitext(file_name)[1].lower()
+
+    if file_type in CSV_TYPES or suffix == ".csv":
+        parse, source = _csv_rows, "csv"
+    elif file_type in JSON_TYPES or suffix in (".json", ".jsonl", ".ndjson"):
+        parse, source = _json_rows, "json"
+    elif file_type in YAML_TYPES or suffix in (".yaml", ".yml"):
+        parse, source = _yaml_rows, "yaml"
+    else:
+        return iter(())
+
+    return _group_rows(_parse_upload(uploaded_log, parse), source, file_name, rows_per_document)
+
+
+def _parse_upload(uploaded_log, parse):
+    """Run `parse` over the upload, decoding it lazily instead of reading it whole."""
+    if isinstance(uploaded_log, io.TextIOBase):
+        yield from parse(uploaded_log)
+        return
+    stream = io.TextIOWrapper(uploaded_log, encoding="utf-8", errors="replace", newline="")
     try:
-        if file_type in ["application/vnd.ms-excel", "text/csv"]:
-            # Using LangChain's CSVLoader
-            loader = CSVLoader(file_path=temp_file_path)
-            documents = loader.load()
-            for doc in documents:
-                doc.metadata["source"] = "csv"
-                doc.metadata["file_name"] = file_name
-
-        elif file_type == "application/json":
-            # Using temporary file path for JSON
-            data = json.loads(Path(temp_file_path).read_text())
-            documents = [
-                Document(
-                    page_content=json.dumps(entry, indent=2),
-                    metadata={"source": "json", "file_name": file_name}
-                )
-                for entry in (data if isinstance(data, list) else [data])
-            ]
-
-        elif file_type == "application/x-yaml":
-            # Using temporary file path for YAML
-            data = yaml.safe_load(Path(temp_file_path).read_text())
-            documents = [
-                Document(
-                    page_content=yaml.dump(entry),
-                    metadata={"source": "yaml", "file_name": file_name}
-                )
-                for entry in (data if isinstance(data, list) else [data])
-            ]
+        yield from parse(stream)
     finally:
-        os.remove(temp_file_path)
-
-    return documents
+        # Leave the caller's file object open
+        stream.detach()
 
 
 def load_text_documents(uploaded_file):
@@ -0,0 +1,115 @@
+import json
+
+# Incremental JSON readers.
+# A top-level array or object is decoded one element / member at a time with
+# json.JSONDecoder.raw_decode over a sliding text buffer, so memory is bounded
+# by the largest single element rather than by the file. JSON-lines files are
+# decoded line by line.
+
+READ_CHARS = 256 * 1024
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789.eE+-"
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    def __init__(self, file_obj, read_chars):
+        self.file_obj = file_obj
+        self.base_chars = self.read_chars = read_chars
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Read more text (growing the read size while one value keeps not fitting).
+        Returns False at end of file.
+        """
+        if self.eof:
+            return False
+        chunk = self.file_obj.read(self.read_chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Next non-whitespace character (None at end of file), without consuming it.
+        """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError(f"Malformed JSON: expected one of {chars!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # A number touching the buffer end (or a partial one, "2." / "1e")
+                # may continue in the next read
+                if self.eof or (end < len(self.text) and self.text[end] not in _NUMBER_CHARS):
+                    self.pos = end
+                    self.read_chars = self.base_chars
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read_chars *= 2
+            self.fill()
+
+
+def iter_json_items(file_obj, read_chars=READ_CHARS):
+    """
+    Yield (key, value) for each member of a top-level object, or (index, value)
+    for each element of a top-level array. A top-level scalar is yielded as (0, value).
+    """
+    buffer = _Buffer(file_obj, read_chars)
+    opening = buffer.peek()
+    if opening is None:
+        return
+    if opening not in "[{":
+        yield 0, buffer.value()
+        return
+
+    buffer.pos += 1
+    closing = "]" if opening == "[" else "}"
+    index = 0
+    if buffer.peek() == closing:
+        return
+    while True:
+        if opening == "{":
+            key = buffer.value()
+            buffer.expect(":")
+        else:
+            key = index
+        yield key, buffer.value()
+        index += 1
+        if buffer.expect("," + closing) == closing:
+            return
+
+
+def iter_json_lines(file_obj):
+    """
+    Yield (line_number, value) for each non-empty line of a JSON-lines file.
+    """
+    for number, line in enumerate(file_obj, start=1):
+        line = line.strip()
+        if line:
+            yield number, json.loads(line)
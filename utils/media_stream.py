@@ -0,0 +1,123 @@
+import io
+import shutil
+import subprocess
+import tempfile
+import wave
+import numpy as np
+
+# Streams the audio track of a media file as fixed-size PCM windows.
+# ffmpeg decodes straight into a pipe, so no intermediate MP3/WAV is written and
+# peak memory is bounded by one window (plus the pipe buffer). Each window is
+# cut at the quietest point of its last part and the remainder is carried into
+# the next window, so words are rarely split across windows.
+
+SAMPLE_RATE = 16000  # Whisper and Google STT both work at 16 kHz mono
+SAMPLE_WIDTH = 2  # s16le
+CUT_SEARCH_FRACTION = 0.2  # look for a pause in the last 20% of a window
+CUT_WINDOW_MS = 20
+PAUSE_ENERGY_RATIO = 0.01  # 20 dB below the window's median RMS (energy ratio)
+STDERR_TAIL_BYTES = 2000  # ffmpeg error output kept in exception messages
+
+
+def ffmpeg_binary():
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        binary = shutil.which("ffmpeg")
+        if binary is None:
+            raise RuntimeError("ffmpeg not found (install imageio-ffmpeg or add ffmpeg to PATH)")
+        return binary
+
+
+def _quiet_cut(pcm, sample_rate):
+    """
+    Byte offset of the quietest 20 ms block in the last part of `pcm`, or the
+    end of `pcm` if that part has no pause.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    block = int(sample_rate * CUT_WINDOW_MS / 1000)
+    n_blocks = len(samples) // block
+    first = int(n_blocks * (1 - CUT_SEARCH_FRACTION))
+    if n_blocks - first < 2:
+        return len(pcm)
+    energy = np.mean(samples[:n_blocks * block].reshape(-1, block) ** 2, axis=1)
+    tail = energy[first:]
+    if tail.min() > PAUSE_ENERGY_RATIO * np.median(energy):
+        return len(pcm)  # no pause to cut at
+    quietest = first + int(np.argmin(tail))
+    return (quietest * block + block // 2) * SAMPLE_WIDTH
+
+
+def _has_no_audio(file_path):
+    """
+    True if ffmpeg can open the file and lists its streams, but none is audio
+    (e.g. a silent screen recording). Unreadable files are not "silent".
+    """
+    probe = subprocess.run([ffmpeg_binary(), "-nostdin", "-hide_banner", "-i", file_path],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    streams = [line for line in probe.stderr.decode("utf-8", errors="replace").splitlines()
+               if line.strip().startswith("Stream #")]
+    return bool(streams) and not any(" Audio:" in line for line in streams)
+
+
+def iter_audio_windows(file_path, window_seconds=60, sample_rate=SAMPLE_RATE):
+    """
+    Yield (start_sec, end_sec, pcm_bytes) windows of 16-bit mono audio as ffmpeg
+    decodes them. Stops early (and kills ffmpeg) if the consumer stops.
+    A file without an audio track yields nothing. Raises RuntimeError with
+    ffmpeg's error output if decoding fails (missing codec, corrupt file), after
+    yielding whatever was decoded before.
+    """
+    window_bytes = int(window_seconds * sample_rate) * SAMPLE_WIDTH
+    command = [
+        ffmpeg_binary(), "-nostdin", "-loglevel", "error",
+        "-i", file_path, "-map", "0:a:0?", "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "pipe:1",
+    ]
+    # stderr goes to a file: an unread pipe could fill up and stall ffmpeg
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+    bytes_per_second = sample_rate * SAMPLE_WIDTH
+    position = 0  # bytes emitted so far
+    carry = b""
+    try:
+        while True:
+            data = process.stdout.read(window_bytes - len(carry))
+            pcm = carry + data
+            if not data:
+                if pcm:
+                    yield position / bytes_per_second, (position + len(pcm)) / bytes_per_second, pcm
+                break
+            cut = _quiet_cut(pcm, sample_rate) if len(pcm) >= window_bytes else len(pcm)
+            window, carry = pcm[:cut], pcm[cut:]
+            yield position / bytes_per_second, (position + len(window)) / bytes_per_second, window
+            position += len(window)
+
+        if process.wait() != 0:
+            if position == 0 and _has_no_audio(file_path):
+                return  # ffmpeg refuses to write an output without streams
+            errors.seek(0)
+            message = errors.read()[-STDERR_TAIL_BYTES:].decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with code {process.returncode} decoding audio of "
+                               f"{file_path}: {message or 'no error output'}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        errors.close()
+
+
+def pcm_to_wav(pcm, sample_rate=SAMPLE_RATE):
+    """
+    Wrap raw 16-bit mono PCM in an in-memory WAV file.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    buffer.seek(0)
+    return buffer
@@ -1,9 +1,12 @@
+import os
 from pymilvus import MilvusClient
 
+# Milvus connections. A local file path runs Milvus Lite in-process; an
+# http(s):// URI connects to a Milvus server (authenticated with MILVUS_TOKEN).
+# Nothing is created on import: collections are managed by
+# backend/vector_backends.py.
 
-client = MilvusClient("milvus_database.db")
 
-client.create_collection(
-    collection_name="my_collection",
-    dimension=768
-)
+def connect(uri, token=None):
+    token = token if token is not None else os.getenv("MILVUS_TOKEN", "")
+    return MilvusClient(uri, token=token)
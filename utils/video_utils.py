@@ -1,31 +1,33 @@
 import tempfile
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from utils.audio_utils import extract_audio_text
+from backend.frames import map_bounded
+from utils.audio_utils import transcribe_audio, TRANSCRIBE_WORKERS
+from utils.media_stream import iter_audio_windows, pcm_to_wav
 import os
 
+# Google STT rejects long requests, so windows stay well under a minute
+AUDIO_WINDOW_SECONDS = 30
+
+def _transcribe_window(window):
+    _, _, pcm = window
+    return transcribe_audio(pcm_to_wav(pcm))
+
 def extract_video_text(uploaded_video):
     with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
         temp_video.write(uploaded_video.read())
         temp_video_path = temp_video.name
 
     try:
-        clip = VideoFileClip(temp_video_path)
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-            temp_audio_path = temp_audio.name
-        clip.audio.write_audiofile(temp_audio_path)
-        clip.audio.close()
-
-        # Extract text
-        with open(temp_audio_path, "rb") as audio_file:
-            text = extract_audio_text(audio_file)
+        # Audio is decoded straight from the container into in-memory windows;
+        # each window is transcribed while ffmpeg keeps decoding the next ones.
+        windows = iter_audio_windows(temp_video_path, AUDIO_WINDOW_SECONDS)
+        transcribed = map_bounded(_transcribe_window, windows, TRANSCRIBE_WORKERS)
+        text = " ".join(text for _, text in transcribed)
 
     except Exception as e:
         print(f"Error processing video: {e}")
         text = None
 
     finally:
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
         if os.path.exists(temp_video_path):
             os.remove(temp_video_path)
 